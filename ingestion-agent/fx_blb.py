@@ -1,52 +1,101 @@
-from azure.storage.blob import BlobServiceClient
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient, ContainerClient
 import os
-from typing import Union, BinaryIO
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Optional, Union, BinaryIO
 from dotenv import load_dotenv
 
+_blb_service_clients = {}
+_blb_container_clients = {}
+_blb_clients_lock = threading.Lock()
+
+def blb_get_service_client(account_name: Optional[str] = None) -> BlobServiceClient:
+    """
+    Returns the BlobServiceClient for a storage account, built once and shared by all threads.
+
+    Each client gets its own HTTP transport with a connection pool of BLOB_TRANSPORT_POOL_SIZE, so
+    back-to-back uploads reuse open connections instead of re-reading the environment and handshaking again.
+    """
+    client = _blb_service_clients.get(account_name or os.getenv('BLOB_STORAGE_ACCOUNT_NAME'))
+    if client is not None:
+        return client
+    with _blb_clients_lock:
+        load_dotenv()
+
+        # Get the storage account credentials from environment variables
+        account_name = account_name or os.getenv('BLOB_STORAGE_ACCOUNT_NAME')
+        if not account_name:
+            raise ValueError("BLOB_STORAGE_ACCOUNT_NAME not found in environment variables")
+        client = _blb_service_clients.get(account_name)
+        if client is None:
+            account_key = os.getenv('BLOB_STORAGE_ACCOUNT_KEY')
+            if not account_key:
+                raise ValueError("BLOB_STORAGE_ACCOUNT_KEY not found in environment variables")
+            pool_size = int(os.getenv('BLOB_TRANSPORT_POOL_SIZE', '20'))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            # Create BlobServiceClient using account key
+            client = BlobServiceClient(
+                account_url=f"https://{account_name}.blob.core.windows.net",
+                credential=account_key,
+                transport=RequestsTransport(session=session, session_owner=False)
+            )
+            _blb_service_clients[account_name] = client
+    return client
+
+def blb_get_container_client(container_name: str, account_name: Optional[str] = None) -> ContainerClient:
+    if not container_name:
+        raise ValueError("Container name must be provided")
+    service_client = blb_get_service_client(account_name)
+    key = (service_client.account_name, container_name)
+    client = _blb_container_clients.get(key)
+    if client is None:
+        with _blb_clients_lock:
+            client = _blb_container_clients.get(key)
+            if client is None:
+                client = service_client.get_container_client(container_name)
+                _blb_container_clients[key] = client
+    return client
+
 def blb_upload_file_to_blob(
-    file_path_or_stream: Union[str, BinaryIO],
+    file_path_or_stream: Union[str, bytes, BinaryIO],
     # account_name: str,
     # account_key: str,
     container_name: str,
     blob_name: str,
     overwrite: bool = True
 ) -> str:
-    
-    load_dotenv()
-
-    # Get the subscription key from environment variables
-    account_name = os.getenv('BLOB_STORAGE_ACCOUNT_NAME')
-    if not account_name:
-        raise ValueError("BLOB_STORAGE_ACCOUNT_NAME not found in environment variables")
-    account_key = os.getenv('BLOB_STORAGE_ACCOUNT_KEY')
-    if not account_key:
-        raise ValueError("BLOB_STORAGE_ACCOUNT_KEY not found in environment variables")
+
     if not container_name:
         raise ValueError("Container name must be provided")
     if not blob_name:
         raise ValueError("Blob name must be provided")
 
+    # Get blob client from the shared container client
+    blob_client = blb_get_container_client(container_name).get_blob_client(blob_name)
+
     try:
-        # Create BlobServiceClient using account key
-        blob_service_client = BlobServiceClient(
-            account_url=f"https://{account_name}.blob.core.windows.net",
-            credential=account_key
-        )
-        
-        # Get blob client
-        blob_client = blob_service_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        )
-        
         # Upload the file
         if isinstance(file_path_or_stream, str):
             # Upload from file path
             with open(file_path_or_stream, "rb") as data:
                 blob_client.upload_blob(data, overwrite=overwrite)
-        else:
-            # Upload from file-like object
+        elif isinstance(file_path_or_stream, (bytes, bytearray)):
+            # Upload from an in-memory buffer
             blob_client.upload_blob(file_path_or_stream, overwrite=overwrite)
+        else:
+            # Upload from file-like object; telling the SDK the length of a seekable stream
+            # (e.g. a BytesIO) lets it send small blobs in a single request read straight from the stream
+            length = None
+            if hasattr(file_path_or_stream, "seekable") and file_path_or_stream.seekable():
+                position = file_path_or_stream.tell()
+                length = file_path_or_stream.seek(0, os.SEEK_END) - position
+                file_path_or_stream.seek(position)
+            blob_client.upload_blob(file_path_or_stream, length=length, overwrite=overwrite)
         
         return blob_client.url
         
@@ -58,33 +107,15 @@ def blb_get_blob_size(
     blob_name: str
 ) -> int:
 
-    load_dotenv()
-
-    # Get the subscription key from environment variables
-    account_name = os.getenv('BLOB_STORAGE_ACCOUNT_NAME')
-    if not account_name:
-        raise ValueError("BLOB_STORAGE_ACCOUNT_NAME not found in environment variables")
-    account_key = os.getenv('BLOB_STORAGE_ACCOUNT_KEY')
-    if not account_key:
-        raise ValueError("BLOB_STORAGE_ACCOUNT_KEY not found in environment variables")
     if not container_name:
         raise ValueError("Container name must be provided")
     if not blob_name:
         raise ValueError("Blob name must be provided")
 
+    # Get blob client from the shared container client
+    blob_client = blb_get_container_client(container_name).get_blob_client(blob_name)
+
     try:
-        # Create BlobServiceClient using account key
-        blob_service_client = BlobServiceClient(
-            account_url=f"https://{account_name}.blob.core.windows.net",
-            credential=account_key
-        )
-        
-        # Get blob client
-        blob_client = blob_service_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        )
-        
         # Get blob properties
         blob_properties = blob_client.get_blob_properties()
         
@@ -93,6 +124,28 @@ def blb_get_blob_size(
     except Exception as e:
         raise Exception(f"Failed to get blob size: {str(e)}")
 
+def blb_download_blob_bytes(
+    container_name: str,
+    blob_name: str
+) -> Optional[bytes]:
+
+    if not container_name:
+        raise ValueError("Container name must be provided")
+    if not blob_name:
+        raise ValueError("Blob name must be provided")
+
+    # Get blob client from the shared container client
+    blob_client = blb_get_container_client(container_name).get_blob_client(blob_name)
+
+    try:
+        # Download the blob contents; a missing blob is not an error
+        return blob_client.download_blob().readall()
+
+    except ResourceNotFoundError:
+        return None
+    except Exception as e:
+        raise Exception(f"Failed to download blob: {str(e)}")
+
 # if __name__ == "__main__":
 #     # Example usage
 #     try:
@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+from dotenv import load_dotenv
+from fx_selenium_utilities import create_selenium_client
+
+
+class BrowserLease:
+    """A driver checked out of a BrowserPool. Call release() (not driver.quit()) when the page is done."""
+
+    def __init__(self, pool, driver, wait_ms: float):
+        self.driver = driver
+        self.wait_ms = wait_ms
+        self._pool = pool
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._pool._release(self.driver)
+
+
+class BrowserPool:
+    """
+    Keeps up to `size` headless Chrome drivers warm and lends them out one page at a time. Drivers are
+    started on first checkout rather than up front (call warm() to start them early).
+
+    A driver handed back is reset before its next use - extra tabs closed, cookies, cache and the last
+    page's local/session storage cleared, and parked on about:blank - so one site never sees another's
+    state. It is quit and replaced after max_pages_per_driver pages, or straight away when it no longer
+    answers (crashed renderer, dead chromedriver). checkout() waits up to checkout_timeout seconds when
+    every driver is busy.
+    """
+
+    def __init__(self, create_driver: Callable[[], object] = create_selenium_client, size: int = 4,
+                 max_pages_per_driver: int = 50, checkout_timeout: float = 300.0):
+        self.create_driver = create_driver
+        self.size = size
+        self.max_pages_per_driver = max_pages_per_driver
+        self.checkout_timeout = checkout_timeout
+        self._idle = deque()
+        self._pages = {}  # id(driver) -> pages served
+        self._total = 0
+        self._closed = False
+        self._started = time.monotonic()
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "create_failures": 0,
+            "recycled": 0,
+            "crashed": 0,
+            "in_use": 0,
+            "busy_seconds_total": 0.0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+        self._checked_out_at = {}
+
+    def warm(self, count: Optional[int] = None):
+        """Starts drivers ahead of the first checkout so the first pages do not pay for browser startup."""
+        for _ in range(min(count or self.size, self.size)):
+            with self._cond:
+                if self._total >= self.size:
+                    return
+                self._total += 1
+            driver = self._create()
+            with self._cond:
+                if driver is None:
+                    self._total -= 1
+                else:
+                    self._idle.append(driver)
+                self._cond.notify()
+
+    def _create(self):
+        driver = self.create_driver()
+        with self._cond:
+            if driver is None:
+                self._stats["create_failures"] += 1
+            else:
+                self._stats["created"] += 1
+                self._pages[id(driver)] = 0
+        return driver
+
+    def checkout(self) -> BrowserLease:
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        driver = None
+        create = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                if self._idle:
+                    driver = self._idle.popleft()
+                    break
+                if self._total < self.size:
+                    self._total += 1
+                    create = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise TimeoutError(f"Timed out after {self.checkout_timeout}s waiting for a browser")
+                self._cond.wait(timeout=remaining)
+        if create:
+            driver = self._create()
+            if driver is None:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+        wait_ms = (time.monotonic() - started) * 1000
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["wait_ms_total"] += wait_ms
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+            if driver is not None:
+                self._stats["in_use"] += 1
+                self._checked_out_at[id(driver)] = time.monotonic()
+        return BrowserLease(self, driver, wait_ms)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error closing browser: {e}")
+
+    @staticmethod
+    def _reset(driver) -> bool:
+        # Returns False when the driver no longer responds and has to be replaced
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            try:
+                driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+            except Exception:
+                pass
+            try:
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+                driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            except Exception:
+                driver.delete_all_cookies()
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            print(f"Browser did not respond to reset, replacing it: {e}")
+            return False
+
+    def _release(self, driver):
+        if driver is None:
+            return
+        with self._cond:
+            self._stats["in_use"] -= 1
+            checked_out_at = self._checked_out_at.pop(id(driver), None)
+            if checked_out_at is not None:
+                self._stats["busy_seconds_total"] += time.monotonic() - checked_out_at
+            self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+            worn_out = self._pages[id(driver)] >= self.max_pages_per_driver
+            closed = self._closed
+        healthy = not worn_out and not closed and self._reset(driver)
+        if healthy:
+            with self._cond:
+                self._idle.append(driver)
+                self._cond.notify()
+            return
+        # Replaced lazily: the next checkout starts a fresh driver in the freed slot
+        self._quit(driver)
+        with self._cond:
+            self._pages.pop(id(driver), None)
+            self._total -= 1
+            if worn_out:
+                self._stats["recycled"] += 1
+            elif not closed:
+                self._stats["crashed"] += 1
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._total
+            stats["idle"] = len(self._idle)
+            busy_seconds = stats["busy_seconds_total"] + sum(time.monotonic() - t for t in self._checked_out_at.values())
+        elapsed = time.monotonic() - self._started
+        stats["utilisation"] = round(busy_seconds / (self.size * elapsed), 3) if elapsed > 0 else 0.0
+        stats["wait_ms_avg"] = round(stats["wait_ms_total"] / stats["checkouts"], 3) if stats["checkouts"] else 0.0
+        return stats
+
+    def close(self):
+        """Quits idle drivers now; drivers still checked out are quit when they are released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for driver in idle:
+            self._quit(driver)
+
+
+_browser_pool = None
+_browser_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    global _browser_pool
+    if _browser_pool is None:
+        with _browser_pool_lock:
+            if _browser_pool is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                _browser_pool = BrowserPool(
+                    # Each headless Chrome takes hundreds of MB and most homepages are served by the static fetch,
+                    # so one browser is shared by all crawl workers (checkout waits) unless configured otherwise
+                    size=int(os.getenv('BROWSER_POOL_SIZE', '1')),
+                    max_pages_per_driver=int(os.getenv('BROWSER_POOL_MAX_PAGES_PER_DRIVER', '50')),
+                    checkout_timeout=float(os.getenv('BROWSER_POOL_CHECKOUT_TIMEOUT_SECONDS', '300')),
+                )
+    return _browser_pool
+
+def browser_checkout() -> BrowserLease:
+    """Borrows a warm driver from the shared pool; lease.driver is None if Chrome could not be started."""
+    return get_browser_pool().checkout()
+
+def get_browser_pool_stats() -> dict:
+    return get_browser_pool().stats()
@@ -0,0 +1,224 @@
+import heapq
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+
+def crawl_domain(url: str) -> str:
+    """Politeness key for a URL: its host without a leading www."""
+    if "://" not in url:
+        url = "http://" + url
+    host = (urlparse(url).hostname or url).lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class HomepageCrawlScheduler:
+    """
+    Runs a crawl function over many URLs on a fixed set of worker threads.
+
+    - submit() puts a URL on a bounded queue and blocks while it is full, so the producer never gets
+      more than queue_size URLs ahead of the workers.
+    - At most per_domain_concurrency crawls of one domain run at once, and successive crawls of a domain
+      start at least per_domain_delay_seconds apart. A URL whose domain is not ready yet is parked and
+      the worker moves on to another URL instead of sleeping.
+    - shutdown() stops accepting work; with cancel_pending it also drops queued URLs and gives the crawls
+      already running shutdown_grace_seconds to finish. A homepage run (CU polling, LLM calls, location
+      pages) can outlast the container's grace period, so anything still running at the deadline is
+      abandoned; the upserts are idempotent, so the next run completes those homepages.
+    """
+
+    def __init__(self, crawl: Callable[[str], object], max_workers: int = 4, queue_size: int = 100,
+                 per_domain_concurrency: int = 1, per_domain_delay_seconds: float = 2.0,
+                 shutdown_grace_seconds: Optional[float] = None):
+        self.crawl = crawl
+        self.max_workers = max_workers
+        self.per_domain_concurrency = per_domain_concurrency
+        self.per_domain_delay_seconds = per_domain_delay_seconds
+        self.shutdown_grace_seconds = shutdown_grace_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._deferred = []  # heap of (ready_at, sequence, url)
+        self._sequence = itertools.count()
+        self._domains = {}   # domain -> {"active": n, "next_start": t}
+        self._outstanding = 0
+        self._accepting = True
+        self._stopping = False
+        self._cancel_pending = False
+        self._deadline = None
+        self._cond = threading.Condition()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "deferred": 0, "run_seconds_total": 0.0}
+        self._workers = [threading.Thread(target=self._work, name=f"crawl-worker-{i}", daemon=True) for i in range(max_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, url: str, timeout: Optional[float] = None) -> bool:
+        """Queues a URL; returns False if the scheduler is shutting down or the queue stayed full for timeout seconds."""
+        with self._cond:
+            if not self._accepting:
+                return False
+            self._outstanding += 1
+            self._stats["submitted"] += 1
+        try:
+            self._queue.put(url, timeout=timeout)
+            return True
+        except queue.Full:
+            self._finish(None)
+            with self._cond:
+                self._stats["submitted"] -= 1
+            return False
+
+    def _finish(self, stat: Optional[str], run_seconds: float = 0.0):
+        with self._cond:
+            self._outstanding -= 1
+            if stat:
+                self._stats[stat] += 1
+            self._stats["run_seconds_total"] += run_seconds
+            self._cond.notify_all()
+
+    def _reserve(self, domain: str) -> float:
+        # Returns 0 once a crawl slot for the domain is taken, otherwise how long to park the URL
+        with self._cond:
+            state = self._domains.setdefault(domain, {"active": 0, "next_start": 0.0})
+            now = time.monotonic()
+            if state["active"] >= self.per_domain_concurrency:
+                return max(self.per_domain_delay_seconds, 0.1)
+            if now < state["next_start"]:
+                return state["next_start"] - now
+            state["active"] += 1
+            state["next_start"] = now + self.per_domain_delay_seconds
+            return 0.0
+
+    def _release(self, domain: str):
+        with self._cond:
+            state = self._domains[domain]
+            state["active"] -= 1
+            if not state["active"] and time.monotonic() >= state["next_start"]:
+                del self._domains[domain]
+            self._cond.notify_all()
+
+    def _next_url(self) -> Optional[str]:
+        with self._cond:
+            if self._deferred:
+                ready_at = self._deferred[0][0]
+                wait = ready_at - time.monotonic()
+                if wait <= 0:
+                    return heapq.heappop(self._deferred)[2]
+                if len(self._deferred) >= self.max_workers * 4:
+                    # Enough parked work already - wait for it rather than pulling the whole queue in
+                    self._cond.wait(timeout=min(wait, 0.5))
+                    return None
+            else:
+                wait = 0.5
+        try:
+            return self._queue.get(timeout=min(wait, 0.5))
+        except queue.Empty:
+            return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                if self._stopping and not self._outstanding:
+                    return
+            url = self._next_url()
+            if url is None:
+                continue
+            with self._cond:
+                cancelled = self._cancel_pending
+            if cancelled:
+                self._finish("cancelled")
+                continue
+            domain = crawl_domain(url)
+            delay = self._reserve(domain)
+            if delay > 0:
+                with self._cond:
+                    heapq.heappush(self._deferred, (time.monotonic() + delay, next(self._sequence), url))
+                    self._stats["deferred"] += 1
+                continue
+            started = time.monotonic()
+            stat = "completed"
+            try:
+                self.crawl(url)
+            except Exception as e:
+                stat = "failed"
+                print(f"Crawl of {url} failed: {e}")
+            finally:
+                self._release(domain)
+                self._finish(stat, time.monotonic() - started)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every submitted URL has been crawled or cancelled."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._outstanding, timeout=timeout)
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        Stops accepting URLs and, with wait, returns once the workers have finished (or dropped) the rest.
+        A timeout (shutdown_grace_seconds by default with cancel_pending) bounds every wait, including one
+        already in progress. Returns False if crawls were still running when the deadline passed.
+        """
+        if timeout is None and cancel_pending:
+            timeout = self.shutdown_grace_seconds
+        with self._cond:
+            if timeout is not None:
+                deadline = time.monotonic() + timeout
+                self._deadline = deadline if self._deadline is None else min(self._deadline, deadline)
+            self._accepting = False
+            self._stopping = True
+            self._cancel_pending = self._cancel_pending or cancel_pending
+            if self._cancel_pending:
+                # Safe to call from a signal handler: drop queued and parked URLs without waiting on anything
+                dropped = len(self._deferred)
+                self._deferred.clear()
+                while True:
+                    try:
+                        self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    dropped += 1
+                self._outstanding -= dropped
+                self._stats["cancelled"] += dropped
+            self._cond.notify_all()
+        if not wait:
+            return True
+        for worker in self._workers:
+            while worker.is_alive():
+                with self._cond:
+                    deadline = self._deadline
+                if deadline is None:
+                    worker.join(timeout=0.5)
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                worker.join(timeout=min(remaining, 0.5))
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["outstanding"] = self._outstanding
+            stats["queued"] = self._queue.qsize()
+            stats["parked"] = len(self._deferred)
+            stats["in_flight"] = sum(state["active"] for state in self._domains.values())
+        finished = stats["completed"] + stats["failed"]
+        stats["run_seconds_avg"] = round(stats["run_seconds_total"] / finished, 3) if finished else 0.0
+        return stats
+
+
+def crawl_get_scheduler(crawl: Callable[[str], object]) -> HomepageCrawlScheduler:
+    """Builds a scheduler from CRAWL_* environment variables."""
+    # Load environment variables from .env file
+    load_dotenv()
+    return HomepageCrawlScheduler(
+        crawl,
+        max_workers=int(os.getenv('CRAWL_WORKERS', '4')),
+        queue_size=int(os.getenv('CRAWL_QUEUE_SIZE', '100')),
+        per_domain_concurrency=int(os.getenv('CRAWL_PER_DOMAIN_CONCURRENCY', '1')),
+        per_domain_delay_seconds=float(os.getenv('CRAWL_PER_DOMAIN_DELAY_SECONDS', '2')),
+        # Container Apps sends SIGKILL 30 seconds after SIGTERM by default
+        shutdown_grace_seconds=float(os.getenv('CRAWL_SHUTDOWN_GRACE_SECONDS', '20')),
+    )
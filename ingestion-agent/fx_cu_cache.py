@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+import requests
+from dotenv import load_dotenv
+
+
+class CuCacheBackend(ABC):
+    """Storage interface for raw Content Understanding results, keyed by a string cache key."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, value: dict) -> None:
+        ...
+
+
+class DiskCuCache(CuCacheBackend):
+    """
+    Local disk store of raw CU JSON with a TTL and a total size limit.
+
+    Each entry is one JSON file named after the hash of its key. An in-memory index keeps entries in
+    least-recently-used order so the oldest ones are deleted once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float = 7 * 24 * 3600, max_bytes: int = 32 * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # file name -> (created_at, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _file_name(self, key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest() + ".json"
+
+    def _load_index(self):
+        # Rebuild LRU order from file modification times (bumped on every hit) so a restart keeps the warm entries
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for mtime, name, size in sorted(entries):
+            self._index[name] = (mtime, size)
+            self._total_bytes += size
+
+    def _remove_locked(self, name: str):
+        _, size = self._index.pop(name, (None, 0))
+        self._total_bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def get(self, key: str) -> Optional[dict]:
+        name = self._file_name(key)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name not in self._index:
+                return None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self._remove_locked(name)
+                return None
+            if entry.get("key") != key or time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+                self._remove_locked(name)
+                return None
+            self._index.move_to_end(name)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return entry.get("value")
+
+    def put(self, key: str, value: dict) -> None:
+        name = self._file_name(key)
+        path = os.path.join(self.directory, name)
+        data = json.dumps({"key": key, "created_at": time.time(), "value": value}).encode("utf-8")
+        with self._lock:
+            if name in self._index:
+                self._remove_locked(name)
+            # Write to a temp file and rename so a concurrent reader never sees half an entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"CU cache write failed: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+            self._index[name] = (time.time(), len(data))
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                oldest = next(iter(self._index))
+                self._remove_locked(oldest)
+
+
+class BlobCuCache(CuCacheBackend):
+    """Shared CU result store in an Azure Blob container, so every replica benefits from each analysis."""
+
+    def __init__(self, container_name: str, ttl_seconds: float = 7 * 24 * 3600):
+        self.container_name = container_name
+        self.ttl_seconds = ttl_seconds
+
+    def _blob_name(self, key: str) -> str:
+        return "cu-cache/" + hashlib.sha256(key.encode('utf-8')).hexdigest() + ".json"
+
+    def get(self, key: str) -> Optional[dict]:
+        from fx_blb import blb_download_blob_bytes
+        try:
+            data = blb_download_blob_bytes(self.container_name, self._blob_name(key))
+        except Exception as e:
+            print(f"Shared CU cache read failed: {e}")
+            return None
+        if data is None:
+            return None
+        try:
+            entry = json.loads(data)
+        except ValueError:
+            return None
+        if entry.get("key") != key or time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            return None
+        return entry.get("value")
+
+    def put(self, key: str, value: dict) -> None:
+        from fx_blb import blb_upload_file_to_blob
+        data = json.dumps({"key": key, "created_at": time.time(), "value": value}).encode("utf-8")
+        try:
+            blb_upload_file_to_blob(file_path_or_stream=data, container_name=self.container_name, blob_name=self._blob_name(key), overwrite=True)
+        except Exception as e:
+            print(f"Shared CU cache write failed: {e}")
+
+
+class CuResultCache:
+    """Local disk cache in front of an optional shared backend, with hit/miss counters."""
+
+    def __init__(self, local: CuCacheBackend, shared: Optional[CuCacheBackend] = None):
+        self.local = local
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "puts": 0, "unkeyed": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def count_unkeyed(self):
+        # Source exposed no content hash or ETag, so the analysis could not be cached
+        self._count("unkeyed")
+
+    def get(self, key: str) -> Optional[dict]:
+        value = self.local.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self._count("shared_hits")
+                self.local.put(key, value)
+                return value
+        self._count("misses")
+        return None
+
+    def put(self, key: str, value: dict) -> None:
+        self._count("puts")
+        self.local.put(key, value)
+        if self.shared is not None:
+            self.shared.put(key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+def cu_cache_source_fingerprint(content_url: str) -> Optional[str]:
+    """
+    Identify the bytes behind a URL without downloading them.
+
+    Prefers the Content-MD5 header (a true content hash, so the same photo uploaded twice under
+    different names shares one entry) and falls back to URL + ETag. Returns None when the source
+    exposes neither, in which case the result is not cached.
+    """
+    # Imported here because fx_cu imports this module; the HEAD reuses the pooled keep-alive CU client
+    from fx_cu import cu_get_http_client
+    try:
+        head_response = cu_get_http_client().head(content_url, allow_redirects=True, timeout=10)
+        head_response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Could not fingerprint {content_url} for CU cache: {e}")
+        return None
+    content_md5 = head_response.headers.get('Content-MD5')
+    if content_md5:
+        return f"md5:{content_md5}"
+    etag = head_response.headers.get('ETag')
+    if etag:
+        return f"etag:{content_url}#{etag}"
+    return None
+
+def cu_cache_key(analyzer_name: str, content_url: str) -> Optional[str]:
+    fingerprint = cu_cache_source_fingerprint(content_url)
+    if fingerprint is None:
+        return None
+    return f"{analyzer_name}|{fingerprint}"
+
+
+_cu_cache = None
+_cu_cache_initialized = False
+_cu_cache_lock = threading.Lock()
+
+def get_cu_cache() -> Optional[CuResultCache]:
+    """Returns the process-wide CU result cache, or None when CU_CACHE_ENABLED is false."""
+    global _cu_cache, _cu_cache_initialized
+    if not _cu_cache_initialized:
+        with _cu_cache_lock:
+            if not _cu_cache_initialized:
+                # Load environment variables from .env file
+                load_dotenv()
+                if os.getenv('CU_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+                    ttl_seconds = float(os.getenv('CU_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+                    try:
+                        local = DiskCuCache(
+                            os.getenv('CU_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'cu-cache')),
+                            ttl_seconds=ttl_seconds,
+                            max_bytes=int(os.getenv('CU_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+                        )
+                        shared_container = os.getenv('CU_CACHE_SHARED_CONTAINER')
+                        shared = BlobCuCache(shared_container, ttl_seconds=ttl_seconds) if shared_container else None
+                        _cu_cache = CuResultCache(local, shared)
+                    except OSError as e:
+                        print(f"CU cache disabled: {e}")
+                _cu_cache_initialized = True
+    return _cu_cache
+
+def get_cu_cache_stats() -> dict:
+    cache = get_cu_cache()
+    if cache is None:
+        return {"enabled": False}
+    stats = cache.stats()
+    stats["enabled"] = True
+    return stats
@@ -2,40 +2,50 @@ import pyodbc
 import os
 import json
 from fx_geo_utilities import get_lat_lon
+from fx_ref_cache import get_ref_cache, ref_cache_invalidate
 from dotenv import load_dotenv
 from datetime import datetime
+from contextlib import contextmanager
+import threading
+import time
+
+def _db_query_establishment_name(establishment: str):
+    with db_get_connection() as wifild_conn:
+        gtvnu_cursor = wifild_conn.cursor()
+        gtvnu_cursor.execute("SELECT establishment_name FROM Establishments.Establishment WHERE Establishment = ?", establishment)
+        establishment_name = gtvnu_cursor.fetchone()
+        wifild_conn.commit()
+    if establishment_name:
+        return establishment_name[0]
+    return None
 
 def db_get_establishment_name(establishment: str):
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as wifild_conn:
-            gtvnu_cursor = wifild_conn.cursor()
-            gtvnu_cursor.execute("SELECT establishment_name FROM Establishments.Establishment WHERE Establishment = ?", establishment)
-            establishment_name = gtvnu_cursor.fetchone()
-            wifild_conn.commit()
-        if establishment_name:
-            return establishment_name[0]
+        # Served from the reference data cache; the upserts below invalidate the entries they write
+        return get_ref_cache("establishment_name").get(establishment, _db_query_establishment_name)
     except Exception as db_exc:
         print(f"Database error: {db_exc}")
 
+def _db_query_venue_name(venue: str):
+    with db_get_connection() as wifild_conn:
+        gtvnu_cursor = wifild_conn.cursor()
+        gtvnu_cursor.execute("SELECT venue_name FROM Establishments.Venue WHERE venue = ?", venue)
+        venue_name = gtvnu_cursor.fetchone()
+        wifild_conn.commit()
+    if venue_name:
+        return venue_name[0]
+    return None
+
 def db_get_venue_name(venue: str):
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as wifild_conn:
-            gtvnu_cursor = wifild_conn.cursor()
-            gtvnu_cursor.execute("SELECT venue_name FROM Establishments.Venue WHERE venue = ?", venue)
-            venue_name = gtvnu_cursor.fetchone()
-            wifild_conn.commit()
-        if venue_name:
-            return venue_name[0]
+        return get_ref_cache("venue_name").get(venue, _db_query_venue_name)
     except Exception as db_exc:
         print(f"Database error: {db_exc}")
 
 def db_get_homepage_process_list():
-    conn_str = db_get_connection_string()
     process_list = []
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""EXEC [Establishments].[get_homepage_process_list]""")
             for row in cursor.fetchall():
@@ -57,8 +67,7 @@ def db_establishment_upsert(establishment: dict) -> dict:
     modified_datetime = datetime.now()
     modified_by = "system"
     try:
-        conn_str = db_get_connection_string()
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             # Build the base SQL for venue and content
             cursor.execute(""" IF NOT EXISTS (SELECT 1 FROM [Establishments].[Establishment] WHERE Establishment = ?)
@@ -73,6 +82,7 @@ def db_establishment_upsert(establishment: dict) -> dict:
                         ,[Modified_By])
                     VALUES (?, ?, ?, ?, ?, ?, ?)
                 END""", establishment_code, establishment_code, establishment_name, is_active, create_datetime, created_by, modified_datetime, modified_by)
+        ref_cache_invalidate("establishment_name", establishment_code)
     except Exception as e:
         print(f"Error occurred: {e}")
     return "Establishment added to Database"
@@ -127,8 +137,7 @@ def db_venue_upsert(venue: dict) -> dict:
     modified_by = None
 
     try:
-        conn_str = db_get_connection_string()
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             # Build the base SQL for venue and content
             base_sql = """
@@ -246,6 +255,7 @@ def db_venue_upsert(venue: dict) -> dict:
             cursor.execute(final_sql, *all_params)
             
             conn.commit()
+            ref_cache_invalidate("venue_name", venue_id)
             return {"message": "Upsert operation completed successfully.", "status_code": 200}
     except pyodbc.Error as e:
         print(f"Database error: {e}")
@@ -279,7 +289,6 @@ def db_venue_page_upsert(venues: list[dict]) -> list[dict]:
             venue_url = homepage_url.rstrip('/') + venue_url
         trimmed_venue_url = venue_url.replace('https://', '').replace('http://', '')
 
-        conn_str = db_get_connection_string()
         content = trimmed_venue_url + '#web'
         venue = 'VNU#' + trimmed_venue_url + '#web'
         venue_to_content = 'VNU#' + trimmed_venue_url + '#' + venue_url + '#web'
@@ -297,7 +306,7 @@ def db_venue_page_upsert(venues: list[dict]) -> list[dict]:
         modified_by = None
 
         try:
-            with pyodbc.connect(conn_str) as conn:
+            with db_get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -348,8 +357,6 @@ def db_venue_page_upsert(venues: list[dict]) -> list[dict]:
 
 
 def db_mastodon_page_upsert(mastodon_url, homepage_url):
-    conn_str = db_get_connection_string()
-
     content = mastodon_url + '#web'
     establishment = homepage_url + '#web'
     establishment_to_content = homepage_url + '#MASTODONHOMEPAGE#' + mastodon_url + '#web'
@@ -367,7 +374,7 @@ def db_mastodon_page_upsert(mastodon_url, homepage_url):
     modified_by = None
 
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -416,8 +423,6 @@ def db_mastodon_page_upsert(mastodon_url, homepage_url):
         return {"message": f"Database error: {db_exc}", "status_code": 500}
 
 def db_bluesky_page_upsert(bluesky_url, homepage_url):
-    conn_str = db_get_connection_string()
-
     content = bluesky_url + '#web'
     establishment = homepage_url + '#web'
     establishment_to_content = homepage_url + '#BLUESKYHOMEPAGE#' + bluesky_url + '#web'
@@ -435,7 +440,7 @@ def db_bluesky_page_upsert(bluesky_url, homepage_url):
     modified_by = None
 
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -485,8 +490,6 @@ def db_bluesky_page_upsert(bluesky_url, homepage_url):
 
 
 def db_x_page_upsert(x_url, homepage_url):
-    conn_str = db_get_connection_string()
-
     content = x_url + '#web'
     establishment = homepage_url + '#web'
     establishment_to_content = homepage_url + '#XHOMEPAGE#' + x_url + '#web'
@@ -504,7 +507,7 @@ def db_x_page_upsert(x_url, homepage_url):
     modified_by = None
 
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -554,8 +557,6 @@ def db_x_page_upsert(x_url, homepage_url):
 
 
 def db_instagram_page_upsert(instagram_url, homepage_url):
-    conn_str = db_get_connection_string()
-
     content = instagram_url + '#web'
     establishment = homepage_url + '#web'
     establishment_to_content = homepage_url + '#INSTAGRAMHOMEPAGE#' + instagram_url + '#web'
@@ -573,7 +574,7 @@ def db_instagram_page_upsert(instagram_url, homepage_url):
     modified_by = None
 
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -622,8 +623,6 @@ def db_instagram_page_upsert(instagram_url, homepage_url):
         return {"message": f"Database error: {db_exc}", "status_code": 500}
 
 def db_facebook_business_page_upsert(facebook_url, homepage_url):
-    conn_str = db_get_connection_string()
-
     content = facebook_url + '#web'
     establishment = homepage_url + '#web'
     establishment_to_content = homepage_url + '#FACEBOOKPAGE#' + facebook_url + '#web'
@@ -641,7 +640,7 @@ def db_facebook_business_page_upsert(facebook_url, homepage_url):
     modified_by = None
 
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -690,8 +689,6 @@ def db_facebook_business_page_upsert(facebook_url, homepage_url):
         return {"message": f"Database error: {db_exc}", "status_code": 500}
 
 def db_logo_url_upsert(image_url, homepage_url):
-    conn_str = db_get_connection_string()
-
     content = image_url + '#img'
     establishment = homepage_url + '#web'
     establishment_to_content = homepage_url + '#LOGOIMAGE#' + image_url + '#web'
@@ -709,7 +706,7 @@ def db_logo_url_upsert(image_url, homepage_url):
     modified_by = None
 
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -778,11 +775,261 @@ def db_get_connection_string():
         f"PWD={pwd};"
         "Encrypt=yes;"
         "TrustServerCertificate=yes;"
+        # Pooled connections can be handed back while a caller's cursor still holds a result set
+        "MARS_Connection=yes;"
         "Connection Timeout=60;"
         "LoginTimeout=60;"
     )
     return conn_str
 
+class DbConnectionPool:
+    """
+    Process-wide pool of warm pyodbc connections to Azure SQL.
+
+    Connections are handed out by checkout() and returned to the pool when the
+    with-block exits, so callers skip the TLS + login handshake that a fresh
+    pyodbc.connect() pays. Idle connections past idle_timeout are closed down to
+    min_size, connections that have been idle longer than health_check_interval
+    are probed with SELECT 1 before reuse, and the pool never opens more than
+    max_size connections at once.
+    """
+
+    def __init__(self, conn_str: str, min_size: int = 1, max_size: int = 10, timeout: float = 30.0,
+                 idle_timeout: float = 300.0, health_check_interval: float = 30.0):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.conn_str = conn_str
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._size = 0   # open connections, idle plus checked out
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "connects": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "evicted": 0,
+            "discarded": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "held_ms_total": 0.0,
+            "held_ms_max": 0.0,
+        }
+
+    def warm(self):
+        # Open min_size connections up front so the first requests don't pay the handshake
+        opened = []
+        try:
+            while len(opened) < self.min_size:
+                with self._cond:
+                    if self._size >= self.min_size:
+                        break
+                    self._size += 1
+                try:
+                    opened.append(self._connect())
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                    raise
+        finally:
+            with self._cond:
+                now = time.monotonic()
+                self._idle.extend((conn, now) for conn in opened)
+                self._cond.notify_all()
+
+    def _connect(self):
+        conn = pyodbc.connect(self.conn_str)
+        with self._cond:
+            self._stats["connects"] += 1
+        return conn
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle_locked(self) -> list:
+        # Caller holds the lock; returns the connections to close once it is released
+        now = time.monotonic()
+        expired = []
+        keep = []
+        # Oldest entries sit at the front of the list, so they are evicted first
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout and self._size - len(expired) > self.min_size:
+                expired.append(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+        self._size -= len(expired)
+        self._stats["evicted"] += len(expired)
+        return expired
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            last_used = None
+            expired = []
+            timed_out = False
+            with self._cond:
+                while True:
+                    expired.extend(self._evict_idle_locked())
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        timed_out = True
+                        break
+                    self._cond.wait(remaining)
+            for stale in expired:
+                self._close(stale)
+            if timed_out:
+                raise TimeoutError(f"Timed out after {self.timeout}s waiting for a database connection (max_size={self.max_size})")
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            if time.monotonic() - last_used < self.health_check_interval or self._is_healthy(conn):
+                return conn
+
+            # Stale connection failed its probe - drop it and try again
+            self._close(conn)
+            with self._cond:
+                self._size -= 1
+                self._stats["health_check_failures"] += 1
+                self._cond.notify()
+
+    def _release(self, conn, discard: bool = False):
+        with self._cond:
+            if discard:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    @contextmanager
+    def checkout(self):
+        """
+        Borrow a connection for the duration of a with-block.
+
+        Mirrors pyodbc's own connection context manager: the transaction is
+        committed when the block exits cleanly and rolled back when it raises.
+        A connection whose rollback fails is assumed broken and is discarded
+        instead of going back to the pool.
+        """
+        wait_start = time.monotonic()
+        conn = self._acquire()
+        acquired = time.monotonic()
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            released = time.monotonic()
+            self._release(conn, discard)
+            wait_ms = (acquired - wait_start) * 1000
+            held_ms = (released - acquired) * 1000
+            with self._cond:
+                self._stats["checkouts"] += 1
+                self._stats["wait_ms_total"] += wait_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+                self._stats["held_ms_total"] += held_ms
+                self._stats["held_ms_max"] = max(self._stats["held_ms_max"], held_ms)
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["min_size"] = self.min_size
+            stats["max_size"] = self.max_size
+        checkouts = stats["checkouts"] or 1
+        stats["wait_ms_avg"] = round(stats["wait_ms_total"] / checkouts, 3)
+        stats["held_ms_avg"] = round(stats["held_ms_total"] / checkouts, 3)
+        return stats
+
+    def close(self):
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._size -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def db_get_pool() -> DbConnectionPool:
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                pool = DbConnectionPool(
+                    db_get_connection_string(),
+                    min_size=int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+                    max_size=int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                    timeout=float(os.getenv('DB_POOL_TIMEOUT_SECONDS', '30')),
+                    idle_timeout=float(os.getenv('DB_POOL_IDLE_TIMEOUT_SECONDS', '300')),
+                    health_check_interval=float(os.getenv('DB_POOL_HEALTH_CHECK_SECONDS', '30')),
+                )
+                try:
+                    pool.warm()
+                except Exception as db_exc:
+                    # Not fatal - connections will be opened on demand
+                    print(f"Database pool warm-up failed: {db_exc}")
+                _db_pool = pool
+    return _db_pool
+
+def db_get_connection():
+    """
+    Returns a context manager yielding a pooled pyodbc connection.
+
+    Use in place of pyodbc.connect(conn_str): `with db_get_connection() as conn:`.
+    """
+    return db_get_pool().checkout()
+
+def db_get_pool_stats() -> dict:
+    return db_get_pool().stats()
+
 # if __name__ == '__main__':
 #     resp = db_get_homepage_process_list()
 #     print(resp)
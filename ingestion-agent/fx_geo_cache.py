@@ -0,0 +1,291 @@
+import json
+import os
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+from dotenv import load_dotenv
+from geopy.exc import GeocoderRateLimited
+from geopy.geocoders import Nominatim
+from fx_geo_offline import geo_offline_reverse
+from fx_rate_limit import RateLimitedError, get_rate_limiter
+
+
+class GeocodeCache:
+    """
+    Persistent SQLite cache of Nominatim lookups, local to one container.
+
+    Threads and worker processes in the same container share the file; WAL lets them read while another
+    writes. The ingestion agent and the MCP server each keep their own file - SQLite WAL relies on shared
+    memory, so it cannot be shared between containers over a network mount. If GEO_CACHE_PATH does point
+    at a network mount, set journal_mode (GEO_CACHE_JOURNAL_MODE) to DELETE and keep one writer.
+
+    Forward lookups are keyed by a normalised address string and store latitude, longitude and the
+    resolved address. Reverse lookups are keyed by the coordinates rounded to reverse_precision decimal
+    places (4 places is roughly 11 m) and store the resolved address together with the raw Nominatim
+    payload, so callers that pick apart the address components work from cached entries too. Lookups
+    that found nothing are cached for negative_ttl_seconds so a bad address is not retried on every crawl.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 30 * 24 * 3600, negative_ttl_seconds: float = 24 * 3600,
+                 reverse_precision: int = 4, journal_mode: str = "WAL"):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.reverse_precision = reverse_precision
+        self._lock = threading.Lock()
+        self._stats = {"forward_hits": 0, "forward_misses": 0, "reverse_hits": 0, "reverse_misses": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if journal_mode.upper() not in ("WAL", "DELETE", "TRUNCATE", "PERSIST"):
+            raise ValueError(f"Unsupported geocoding cache journal mode: {journal_mode}")
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode.upper()}")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS geocode_forward (
+            address_key TEXT PRIMARY KEY, latitude REAL, longitude REAL, address TEXT, created_at REAL NOT NULL)""")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS geocode_reverse (
+            cell_key TEXT PRIMARY KEY, address TEXT, raw_json TEXT, created_at REAL NOT NULL)""")
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_address(address_string: str) -> str:
+        # "12 King St., , Groveland, MA, 01834, USA" and "12 king st, groveland, ma, 01834, usa" share one entry
+        parts = [re.sub(r"[^\w\s#-]", "", part).strip().lower() for part in address_string.split(",")]
+        return ", ".join(re.sub(r"\s+", " ", part) for part in parts if part)
+
+    def cell_key(self, latitude: float, longitude: float) -> str:
+        return f"{round(latitude, self.reverse_precision):.{self.reverse_precision}f},{round(longitude, self.reverse_precision):.{self.reverse_precision}f}"
+
+    def _fresh(self, address, created_at) -> bool:
+        ttl = self.ttl_seconds if address is not None else self.negative_ttl_seconds
+        return time.time() - created_at <= ttl
+
+    def get_forward(self, address_string: str):
+        """Returns (found, result) where result is {"latitude", "longitude", "address"} or None for a cached miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT latitude, longitude, address, created_at FROM geocode_forward WHERE address_key = ?",
+                (self.normalize_address(address_string),)).fetchone()
+            found = row is not None and self._fresh(row[2], row[3])
+            self._stats["forward_hits" if found else "forward_misses"] += 1
+        if not found:
+            return False, None
+        if row[2] is None:
+            return True, None
+        return True, {"latitude": row[0], "longitude": row[1], "address": row[2]}
+
+    def put_forward(self, address_string: str, result: Optional[dict]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode_forward (address_key, latitude, longitude, address, created_at) VALUES (?, ?, ?, ?, ?)",
+                (self.normalize_address(address_string),
+                 result.get("latitude") if result else None,
+                 result.get("longitude") if result else None,
+                 result.get("address") if result else None,
+                 time.time()))
+            self._conn.commit()
+
+    def get_reverse(self, latitude: float, longitude: float):
+        """Returns (found, result) where result is {"address", "raw"} or None for a cached miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT address, raw_json, created_at FROM geocode_reverse WHERE cell_key = ?",
+                (self.cell_key(latitude, longitude),)).fetchone()
+            found = row is not None and self._fresh(row[0], row[2])
+            self._stats["reverse_hits" if found else "reverse_misses"] += 1
+        if not found:
+            return False, None
+        if row[0] is None:
+            return True, None
+        return True, {"address": row[0], "raw": json.loads(row[1]) if row[1] else {}}
+
+    def put_reverse(self, latitude: float, longitude: float, result: Optional[dict]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode_reverse (cell_key, address, raw_json, created_at) VALUES (?, ?, ?, ?)",
+                (self.cell_key(latitude, longitude),
+                 result.get("address") if result else None,
+                 json.dumps(result.get("raw", {})) if result else None,
+                 time.time()))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["forward_entries"] = self._conn.execute("SELECT COUNT(*) FROM geocode_forward").fetchone()[0]
+            stats["reverse_entries"] = self._conn.execute("SELECT COUNT(*) FROM geocode_reverse").fetchone()[0]
+        return stats
+
+
+_geo_cache = None
+_geo_cache_initialized = False
+_geo_cache_lock = threading.Lock()
+_geo_geocoder = None
+
+def geo_get_cache() -> Optional[GeocodeCache]:
+    """Returns the process-wide geocoding cache, or None when GEO_CACHE_ENABLED is false or the file cannot be opened."""
+    global _geo_cache, _geo_cache_initialized
+    if not _geo_cache_initialized:
+        with _geo_cache_lock:
+            if not _geo_cache_initialized:
+                # Load environment variables from .env file
+                load_dotenv()
+                if os.getenv('GEO_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+                    try:
+                        _geo_cache = GeocodeCache(
+                            os.getenv('GEO_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'geocode-cache.sqlite3')),
+                            ttl_seconds=float(os.getenv('GEO_CACHE_TTL_SECONDS', str(30 * 24 * 3600))),
+                            negative_ttl_seconds=float(os.getenv('GEO_CACHE_NEGATIVE_TTL_SECONDS', str(24 * 3600))),
+                            reverse_precision=int(os.getenv('GEO_CACHE_REVERSE_PRECISION', '4')),
+                            journal_mode=os.getenv('GEO_CACHE_JOURNAL_MODE', 'WAL'),
+                        )
+                    except (sqlite3.Error, ValueError) as e:
+                        print(f"Geocoding cache disabled: {e}")
+                _geo_cache_initialized = True
+    return _geo_cache
+
+def geo_get_geocoder() -> Nominatim:
+    # One client for the process instead of a new one per lookup
+    global _geo_geocoder
+    if _geo_geocoder is None:
+        with _geo_cache_lock:
+            if _geo_geocoder is None:
+                _geo_geocoder = Nominatim(user_agent="Geopy Library")
+    return _geo_geocoder
+
+def _geo_nominatim(method, *args):
+    # Every Nominatim request in the process goes through the shared limiter; a 429 pauses all of them
+    try:
+        return method(*args)
+    except GeocoderRateLimited as e:
+        raise RateLimitedError("nominatim", e.retry_after)
+
+def _geo_lookup_forward(address_string: str, cache: Optional[GeocodeCache]) -> Optional[dict]:
+    def lookup():
+        location = _geo_nominatim(geo_get_geocoder().geocode, address_string)
+        result = {"latitude": location.latitude, "longitude": location.longitude, "address": location.address} if location else None
+        if cache is not None:
+            cache.put_forward(address_string, result)
+        return result
+    # Identical addresses already being looked up share that request
+    return get_rate_limiter("nominatim").call(("geocode", GeocodeCache.normalize_address(address_string)), lookup)
+
+def geo_geocode(address_string: str) -> Optional[dict]:
+    """Forward geocode through the cache: {"latitude", "longitude", "address"}, or None if Nominatim found nothing."""
+    cache = geo_get_cache()
+    if cache is not None:
+        found, result = cache.get_forward(address_string)
+        if found:
+            return result
+    return _geo_lookup_forward(address_string, cache)
+
+def geo_reverse(latitude: float, longitude: float) -> Optional[dict]:
+    """Reverse geocode locally, then through the cache: {"address", "raw"}, or None if Nominatim found nothing."""
+    # The offline index answers most lookups from memory; only coordinates it has no address near go out
+    result = geo_offline_reverse(latitude, longitude)
+    if result is not None:
+        return result
+    cache = geo_get_cache()
+    if cache is not None:
+        found, result = cache.get_reverse(latitude, longitude)
+        if found:
+            return result
+    def lookup():
+        location = _geo_nominatim(geo_get_geocoder().reverse, (latitude, longitude))
+        result = {"address": location.address, "raw": location.raw} if location else None
+        if cache is not None:
+            cache.put_reverse(latitude, longitude, result)
+        return result
+    key = cache.cell_key(latitude, longitude) if cache is not None else f"{latitude:.6f},{longitude:.6f}"
+    return get_rate_limiter("nominatim").call(("reverse", key), lookup)
+
+
+class GeocodeBatchQueue:
+    """
+    Background queue that drains forward geocoding requests at Nominatim's allowed rate.
+
+    submit() returns a Future right away; one worker thread works through the queue, and the shared
+    rate limiter paces it, so a large import can hand over every address at once without tripping
+    429s or holding request threads. The same address submitted twice while queued shares one Future.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, address_string: str) -> Future:
+        key = GeocodeCache.normalize_address(address_string)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                self._queue.put((key, address_string, future))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._drain, name="geocode-batch", daemon=True)
+                self._worker.start()
+        return future
+
+    def _drain(self):
+        while True:
+            key, address_string, future = self._queue.get()
+            try:
+                future.set_result(_geo_lookup_forward(address_string, geo_get_cache()))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+
+_geo_batch_queue = None
+
+def geo_get_batch_queue() -> GeocodeBatchQueue:
+    global _geo_batch_queue
+    if _geo_batch_queue is None:
+        with _geo_cache_lock:
+            if _geo_batch_queue is None:
+                _geo_batch_queue = GeocodeBatchQueue()
+    return _geo_batch_queue
+
+def geo_geocode_batch(address_strings: List[str], timeout: Optional[float] = None) -> List[Optional[dict]]:
+    """Geocodes many addresses at the allowed rate; results are in input order, None where nothing was found or the lookup failed."""
+    cache = geo_get_cache()
+    futures = []
+    for address_string in address_strings:
+        if cache is not None:
+            found, result = cache.get_forward(address_string)
+            if found:
+                future = Future()
+                future.set_result(result)
+                futures.append(future)
+                continue
+        futures.append(geo_get_batch_queue().submit(address_string))
+    results = []
+    for address_string, future in zip(address_strings, futures):
+        try:
+            results.append(future.result(timeout=timeout))
+        except Exception as e:
+            print(f"Geocoding failed for {address_string}: {e}")
+            results.append(None)
+    return results
+
+def geo_get_cache_stats() -> dict:
+    cache = geo_get_cache()
+    if cache is None:
+        return {"enabled": False}
+    stats = cache.stats()
+    stats["enabled"] = True
+    stats["batch_pending"] = geo_get_batch_queue().pending()
+    return stats
@@ -0,0 +1,242 @@
+import csv
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Optional
+from dotenv import load_dotenv
+
+# Index file layout (little endian):
+#   header  - magic, point count, offset of the record table, offset of the string blob
+#   points  - count x (x, y, z) doubles: unit vectors on the sphere, laid out as an implicit KD-tree
+#             (the node of [lo, hi) is at (lo + hi) // 2, split on axis depth % 3)
+#   records - count x (offset, length) into the string blob, in the same order as the points
+#   strings - UTF-8 JSON address components, one object per point
+_GEO_INDEX_MAGIC = b"GEOKD001"
+_GEO_HEADER = struct.Struct("<8sQQQ")
+_GEO_POINT = struct.Struct("<3d")
+_GEO_RECORD = struct.Struct("<QI")
+_EARTH_RADIUS_METERS = 6371008.8
+
+# OpenAddresses column names, matched case-insensitively
+_GEO_CSV_FIELDS = {
+    "house_number": "number",
+    "road": "street",
+    "unit": "unit",
+    "city": "city",
+    "county": "district",
+    "state": "region",
+    "postcode": "postcode",
+}
+
+
+def _geo_unit_vector(latitude: float, longitude: float):
+    # On unit vectors the straight-line (chord) distance grows with the great-circle distance,
+    # so a plain Euclidean KD-tree finds the true nearest address anywhere on the globe
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+def _geo_chord_for_meters(meters: float) -> float:
+    return 2 * math.sin(min(meters / _EARTH_RADIUS_METERS, math.pi) / 2)
+
+def _geo_format_address(components: dict) -> str:
+    street = " ".join(part for part in (components.get("house_number"), components.get("road")) if part)
+    if components.get("unit"):
+        street = f"{street} {components['unit']}".strip()
+    region = " ".join(part for part in (components.get("state"), components.get("postcode")) if part)
+    return ", ".join(part for part in (street, components.get("city"), region, components.get("country")) if part)
+
+
+class OfflineReverseGeocoder:
+    """
+    Nearest-address lookup against a local address extract, with no network round trip.
+
+    The index file is built once by geo_build_offline_index() and memory-mapped at startup, so opening
+    it costs nothing regardless of size and the pages a query touches are shared between processes.
+    reverse() walks the implicit KD-tree stored in the file and returns the closest address within
+    max_distance_meters in the same {"address", "raw"} shape as geo_reverse(), or None so the caller
+    can fall back to Nominatim.
+    """
+
+    def __init__(self, path: str, max_distance_meters: float = 75.0):
+        self.path = path
+        self.max_distance_meters = max_distance_meters
+        self._max_chord_sq = _geo_chord_for_meters(max_distance_meters) ** 2
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "lookup_ms_total": 0.0}
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._records_offset, self._strings_offset = _GEO_HEADER.unpack_from(self._mmap, 0)
+        if magic != _GEO_INDEX_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not an offline geocoding index")
+        self._points_offset = _GEO_HEADER.size
+
+    def _point(self, index: int):
+        return _GEO_POINT.unpack_from(self._mmap, self._points_offset + index * _GEO_POINT.size)
+
+    def _components(self, index: int) -> dict:
+        offset, length = _GEO_RECORD.unpack_from(self._mmap, self._records_offset + index * _GEO_RECORD.size)
+        start = self._strings_offset + offset
+        return json.loads(self._mmap[start:start + length].decode("utf-8"))
+
+    def nearest(self, latitude: float, longitude: float):
+        """(index, distance in meters) of the closest indexed address within max_distance_meters, or None."""
+        query = _geo_unit_vector(latitude, longitude)
+        best_index, best_sq = -1, self._max_chord_sq
+        stack = [(0, self.count, 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            point = self._point(mid)
+            dx, dy, dz = query[0] - point[0], query[1] - point[1], query[2] - point[2]
+            distance_sq = dx * dx + dy * dy + dz * dz
+            if distance_sq <= best_sq:
+                best_index, best_sq = mid, distance_sq
+            axis = depth % 3
+            diff = query[axis] - point[axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            # Only cross the splitting plane if the best match so far could be on the other side
+            if diff * diff <= best_sq:
+                stack.append((far[0], far[1], depth + 1))
+            stack.append((near[0], near[1], depth + 1))
+        if best_index < 0:
+            return None
+        return best_index, 2 * _EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(best_sq) / 2))
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[dict]:
+        started = time.monotonic()
+        match = self.nearest(latitude, longitude)
+        result = None
+        if match is not None:
+            index, distance = match
+            components = self._components(index)
+            result = {"address": _geo_format_address(components),
+                      "raw": {"address": components, "distance_meters": round(distance, 1), "source": "offline"}}
+        with self._lock:
+            self._stats["hits" if result else "misses"] += 1
+            self._stats["lookup_ms_total"] += (time.monotonic() - started) * 1000
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["lookup_ms_avg"] = round(stats.pop("lookup_ms_total") / lookups, 3) if lookups else 0.0
+        stats["addresses"] = self.count
+        stats["max_distance_meters"] = self.max_distance_meters
+        return stats
+
+    def close(self):
+        self._mmap.close()
+
+
+def geo_build_offline_index(csv_paths, output_path: str, country: Optional[str] = None) -> int:
+    """
+    Builds an index file from one or more OpenAddresses-style CSV extracts
+    (LON, LAT, NUMBER, STREET, UNIT, CITY, DISTRICT, REGION, POSTCODE) and returns the number of addresses.
+    """
+    if isinstance(csv_paths, str):
+        csv_paths = [csv_paths]
+    points, records = [], []
+    for csv_path in csv_paths:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+                try:
+                    latitude, longitude = float(row["lat"]), float(row["lon"])
+                except (KeyError, ValueError):
+                    continue
+                components = {name: row[column] for name, column in _GEO_CSV_FIELDS.items() if row.get(column)}
+                if not components.get("road"):
+                    continue
+                if country:
+                    components["country"] = country
+                points.append(_geo_unit_vector(latitude, longitude))
+                records.append(json.dumps(components, separators=(",", ":")).encode("utf-8"))
+
+    # Lay the points out as an implicit KD-tree: the median of each range on the current axis goes in the middle
+    order = list(range(len(points)))
+    stack = [(0, len(order), 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if hi - lo <= 1:
+            continue
+        axis = depth % 3
+        order[lo:hi] = sorted(order[lo:hi], key=lambda i: points[i][axis])
+        mid = (lo + hi) // 2
+        stack.append((lo, mid, depth + 1))
+        stack.append((mid + 1, hi, depth + 1))
+
+    records_offset = _GEO_HEADER.size + len(order) * _GEO_POINT.size
+    strings_offset = records_offset + len(order) * _GEO_RECORD.size
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_GEO_HEADER.pack(_GEO_INDEX_MAGIC, len(order), records_offset, strings_offset))
+        for i in order:
+            f.write(_GEO_POINT.pack(*points[i]))
+        offset = 0
+        for i in order:
+            f.write(_GEO_RECORD.pack(offset, len(records[i])))
+            offset += len(records[i])
+        for i in order:
+            f.write(records[i])
+    os.replace(tmp_path, output_path)
+    return len(order)
+
+
+_offline_geocoder = None
+_offline_geocoder_initialized = False
+_offline_geocoder_lock = threading.Lock()
+
+def geo_get_offline_geocoder() -> Optional[OfflineReverseGeocoder]:
+    """Returns the shared offline reverse geocoder, or None when GEO_OFFLINE_INDEX_PATH is unset or unreadable."""
+    global _offline_geocoder, _offline_geocoder_initialized
+    if not _offline_geocoder_initialized:
+        with _offline_geocoder_lock:
+            if not _offline_geocoder_initialized:
+                # Load environment variables from .env file
+                load_dotenv()
+                index_path = os.getenv('GEO_OFFLINE_INDEX_PATH')
+                if index_path:
+                    try:
+                        _offline_geocoder = OfflineReverseGeocoder(
+                            index_path,
+                            max_distance_meters=float(os.getenv('GEO_OFFLINE_MAX_DISTANCE_METERS', '75')),
+                        )
+                        print(f"Offline reverse geocoder loaded {_offline_geocoder.count:,} addresses from {index_path}")
+                    except (OSError, ValueError, struct.error) as e:
+                        print(f"Offline reverse geocoder disabled: {e}")
+                _offline_geocoder_initialized = True
+    return _offline_geocoder
+
+def geo_offline_reverse(latitude: float, longitude: float) -> Optional[dict]:
+    geocoder = geo_get_offline_geocoder()
+    if geocoder is None:
+        return None
+    return geocoder.reverse(latitude, longitude)
+
+def geo_get_offline_stats() -> dict:
+    geocoder = geo_get_offline_geocoder()
+    if geocoder is None:
+        return {"enabled": False}
+    stats = geocoder.stats()
+    stats["enabled"] = True
+    return stats
+
+
+if __name__ == "__main__":
+    # python fx_geo_offline.py output.geokd extract1.csv [extract2.csv ...]
+    if len(sys.argv) < 3:
+        print("Usage: python fx_geo_offline.py <output index> <OpenAddresses csv> [<csv> ...]")
+        sys.exit(1)
+    started = time.monotonic()
+    address_count = geo_build_offline_index(sys.argv[2:], sys.argv[1], country=os.getenv('GEO_OFFLINE_COUNTRY'))
+    print(f"Indexed {address_count:,} addresses into {sys.argv[1]} in {time.monotonic() - started:.1f}s")
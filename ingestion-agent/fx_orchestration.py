@@ -1,5 +1,9 @@
+import signal
 from fx_db import db_get_homepage_process_list
 from fx_homepage_processing import homepage_processing_main
+from fx_crawl_scheduler import crawl_get_scheduler
+from fx_browser_pool import get_browser_pool
+from fx_page_fetch import get_page_fetcher
 
 
 def process_homepage(url: str):
@@ -21,7 +25,25 @@ def process_gmail_messages():
 if __name__ == "__main__":
     process_list = db_get_homepage_process_list()
     print(process_list)
+    # Homepages are crawled concurrently (CRAWL_WORKERS) with per-domain politeness limits
+    scheduler = crawl_get_scheduler(homepage_processing_main)
+
+    def stop_crawl(signum, frame):
+        print(f"Received signal {signum} - giving in-flight homepages {scheduler.shutdown_grace_seconds}s and dropping the rest")
+        scheduler.shutdown(wait=False, cancel_pending=True)
+
+    signal.signal(signal.SIGINT, stop_crawl)
+    signal.signal(signal.SIGTERM, stop_crawl)
     for url in process_list:
         submit_url = url[0] if isinstance(url, list) else url
         print(submit_url)
-        hp_response = homepage_processing_main(submit_url)
+        if not scheduler.submit(submit_url):
+            break
+    if not scheduler.shutdown(wait=True):
+        print("Shutdown deadline reached - abandoning homepages still in flight")
+    print(f"Homepage crawl finished: {scheduler.stats()}")
+    print(f"Page fetch strategies: {get_page_fetcher().stats()}")
+    print(f"Browser pool: {get_browser_pool().stats()}")
+    get_browser_pool().close()
+    # Keep what this run learned about which sites need a browser for the next run
+    get_page_fetcher().memory.save()
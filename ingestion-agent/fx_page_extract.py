@@ -0,0 +1,92 @@
+from typing import Optional
+from fx_page_fetch import StaticPage
+
+# Collects every image and link on the page in one WebDriver round trip; ranking happens in Python so the
+# browser and static paths pick the same logo and links
+_HOMEPAGE_EXTRACT_SCRIPT = """
+var images = [];
+document.querySelectorAll('img').forEach(function (img) {
+    images.push({
+        src: img.currentSrc || img.src || '',
+        cls: img.getAttribute('class') || '',
+        alt: img.getAttribute('alt') || '',
+        id: img.getAttribute('id') || '',
+        itemprop: img.getAttribute('itemprop') || '',
+        inHeader: !!img.closest('header, nav')
+    });
+});
+var links = [];
+document.querySelectorAll('a[href]').forEach(function (a) {
+    links.push({raw: a.getAttribute('href') || '', href: a.href || ''});
+});
+return {images: images, links: links};
+"""
+
+# (result key, substrings matched against the raw href) in the order the homepage is processed
+SOCIAL_PLATFORMS = [
+    ("facebook", ("facebook.com",)),
+    ("instagram", ("instagram.com",)),
+    ("x", ("twitter.com", "x.com")),
+    ("bluesky", ("bsky.app",)),
+    ("mastodon", ("mastodon",)),
+]
+
+
+def _logo_tier(image: dict) -> Optional[int]:
+    # Same precedence as the original XPath searches: explicit "logo", then "brand", then company/identity
+    cls, alt, element_id = image["cls"].lower(), image["alt"].lower(), image["id"].lower()
+    if "logo" in cls or "logo" in alt or "logo" in element_id or image["itemprop"] == "logo":
+        return 0
+    if "brand" in cls or "brand" in alt or "brand" in element_id:
+        return 1
+    if "company" in alt or "identity" in cls or "identity" in alt:
+        return 2
+    return None
+
+def rank_logo_candidates(images: list) -> list:
+    """
+    Logo candidates best first: by tier, then itemprop="logo", then images inside <header>/<nav>,
+    then document order. Images without a src are dropped.
+    """
+    ranked = []
+    for position, image in enumerate(images):
+        tier = _logo_tier(image)
+        if tier is None or not image["src"]:
+            continue
+        ranked.append(((tier, image["itemprop"] != "logo", not image["inHeader"], position), image))
+    ranked.sort(key=lambda entry: entry[0])
+    return [image for _, image in ranked]
+
+def _static_page_elements(page: StaticPage) -> dict:
+    images = [{
+        "src": element.get_attribute("src") if element.attrs.get("src") else "",
+        "cls": element.attrs.get("class", ""),
+        "alt": element.attrs.get("alt", ""),
+        "id": element.attrs.get("id", ""),
+        "itemprop": element.attrs.get("itemprop", ""),
+        "inHeader": element.in_header,
+    } for element in page.find_elements("tag name", "img")]
+    links = [{"raw": element.attrs["href"], "href": element.get_attribute("href")}
+             for element in page.find_elements("tag name", "a") if "href" in element.attrs]
+    return {"images": images, "links": links}
+
+def homepage_extract_links(driver) -> dict:
+    """
+    Logo and social links of the loaded page in one pass:
+    {"logo_url", "logo_candidates", "facebook", "instagram", "x", "bluesky", "mastodon"}, None where not found.
+    """
+    if isinstance(driver, StaticPage):
+        elements = _static_page_elements(driver)
+    else:
+        elements = driver.execute_script(_HOMEPAGE_EXTRACT_SCRIPT) or {}
+    candidates = rank_logo_candidates(elements.get("images", []))
+    result = {
+        "logo_url": candidates[0]["src"] if candidates else None,
+        "logo_candidates": [candidate["src"] for candidate in candidates],
+    }
+    links = elements.get("links", [])
+    for platform, needles in SOCIAL_PLATFORMS:
+        # First matching link in document order, as find_element would return
+        url = next((link["href"] for link in links if any(needle in link["raw"] for needle in needles)), None)
+        result[platform] = url.rstrip('/') if url else None
+    return result
@@ -0,0 +1,393 @@
+import json
+import os
+import re
+import threading
+import time
+from html.parser import HTMLParser
+from typing import Optional
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from selenium.common.exceptions import NoSuchElementException
+from dotenv import load_dotenv
+from fx_browser_pool import browser_checkout
+from fx_crawl_scheduler import crawl_domain
+
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+_HIDDEN_TEXT_TAGS = {"script", "style", "noscript", "template"}
+_SOCIAL_HOSTS = ("facebook.com", "instagram.com", "twitter.com", "x.com", "bsky.app", "mastodon")
+_LOGO_WORDS = ("logo", "brand")
+_ADDRESS_PATTERN = re.compile(
+    r"\b\d{1,6}\s+(?:[A-Za-z0-9.'-]+\s+){0,5}(?:St|Street|Ave|Avenue|Rd|Road|Blvd|Boulevard|Dr|Drive|Ln|Lane|Way|Hwy|Highway|Pl|Place|Ct|Court|Pkwy|Parkway|Sq|Square|Route|Rte)\b\.?"
+    r"|\b[A-Z]{2}\s+\d{5}(?:-\d{4})?\b")
+# Mount points of client-rendered apps that are empty until JavaScript runs
+_SPA_ROOT_IDS = {"root", "app", "__next", "__nuxt", "___gatsby", "svelte"}
+_XPATH_PATTERN = re.compile(r"^//([\w*]+)\[(.+)\]$")
+_XPATH_CONDITION = re.compile(r"^\s*(?:contains\(@([\w:-]+),\s*'([^']*)'\)|@([\w:-]+)\s*=\s*'([^']*)')\s*$")
+_CSS_PATTERN = re.compile(r"^([\w*]*)\[([\w:-]+)(?:([*^$]?=)\"([^\"]*)\")?\]$")
+# Dead links - a browser would get the same answer
+_GONE_STATUSES = (404, 410)
+# Bot protection that a real browser usually gets past
+_REFUSED_STATUSES = (403, 429)
+
+
+class StaticElement:
+    """The few WebElement methods homepage processing uses, over an element of fetched HTML."""
+
+    def __init__(self, page, tag: str, attrs: dict):
+        self._page = page
+        self.tag_name = tag
+        self.attrs = attrs
+        self.in_header = False
+        self._text = []
+
+    @property
+    def text(self) -> str:
+        return re.sub(r"\s+", " ", "".join(self._text)).strip()
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        value = self.attrs.get(name)
+        # Like the browser's src/href properties, links come back absolute
+        if value is not None and name in ("src", "href"):
+            return urljoin(self._page.current_url, value)
+        return value
+
+    def is_displayed(self) -> bool:
+        # Without layout there is nothing to see or dismiss
+        return False
+
+    def click(self):
+        pass
+
+
+class _StaticTreeBuilder(HTMLParser):
+    def __init__(self, page):
+        super().__init__(convert_charrefs=True)
+        self.page = page
+        self.elements = []
+        self._open = []
+        self._hidden = 0
+
+    def _element(self, tag, attrs) -> StaticElement:
+        element = StaticElement(self.page, tag, {name: value or "" for name, value in attrs})
+        element.in_header = any(parent.tag_name in ("header", "nav") for parent in self._open)
+        self.elements.append(element)
+        return element
+
+    def handle_starttag(self, tag, attrs):
+        element = self._element(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self._open.append(element)
+            if tag in _HIDDEN_TEXT_TAGS:
+                self._hidden += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._element(tag, attrs)
+
+    def handle_endtag(self, tag):
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i].tag_name == tag:
+                for element in self._open[i:]:
+                    if element.tag_name in _HIDDEN_TEXT_TAGS:
+                        self._hidden -= 1
+                del self._open[i:]
+                return
+
+    def handle_data(self, data):
+        if self._hidden:
+            return
+        for element in self._open:
+            element._text.append(data)
+
+
+class StaticPage:
+    """
+    Stand-in for a WebDriver over HTML fetched with a plain GET: page_source, current_url and
+    find_element(s) by tag name, attribute CSS selectors and the //tag[contains(@attr, '...') or @attr='...']
+    XPath form used by homepage processing.
+    """
+
+    def __init__(self, url: str, html: str, status_code: int = 200):
+        self.current_url = url
+        self.page_source = html
+        self.status_code = status_code
+        builder = _StaticTreeBuilder(self)
+        builder.feed(html)
+        builder.close()
+        self._elements = builder.elements
+
+    def get(self, url: str):
+        if url != self.current_url:
+            raise ValueError("A static page cannot navigate; fetch the new URL with page_checkout()")
+
+    def _match_xpath(self, selector: str):
+        match = _XPATH_PATTERN.match(selector)
+        if not match:
+            raise ValueError(f"Unsupported XPath for a static page: {selector}")
+        tag, expression = match.groups()
+        conditions = []
+        for part in expression.split(" or "):
+            condition = _XPATH_CONDITION.match(part)
+            if not condition:
+                raise ValueError(f"Unsupported XPath condition for a static page: {part}")
+            contains_attr, contains_value, equals_attr, equals_value = condition.groups()
+            if contains_attr:
+                conditions.append(lambda e, a=contains_attr, v=contains_value: a in e.attrs and v in e.attrs[a])
+            else:
+                conditions.append(lambda e, a=equals_attr, v=equals_value: e.attrs.get(a) == v)
+        return [e for e in self._elements if (tag == "*" or e.tag_name == tag) and any(c(e) for c in conditions)]
+
+    def _match_css(self, selector: str):
+        match = _CSS_PATTERN.match(selector.strip())
+        if not match:
+            raise ValueError(f"Unsupported CSS selector for a static page: {selector}")
+        tag, attr, operator, value = match.groups()
+        tests = {
+            None: lambda actual: True,
+            "=": lambda actual: actual == value,
+            "*=": lambda actual: value in actual,
+            "^=": lambda actual: actual.startswith(value),
+            "$=": lambda actual: actual.endswith(value),
+        }
+        return [e for e in self._elements
+                if (not tag or tag == "*" or e.tag_name == tag) and attr in e.attrs and tests[operator](e.attrs[attr])]
+
+    def find_elements(self, by: str, selector: str):
+        if by == "xpath":
+            return self._match_xpath(selector)
+        if by == "css selector":
+            return self._match_css(selector)
+        if by == "tag name":
+            return [e for e in self._elements if e.tag_name == selector.lower()]
+        raise ValueError(f"Unsupported locator for a static page: {by}")
+
+    def find_element(self, by: str, selector: str):
+        elements = self.find_elements(by, selector)
+        if not elements:
+            raise NoSuchElementException(f"No element matches {selector}")
+        return elements[0]
+
+    def body_text(self) -> str:
+        bodies = self.find_elements("tag name", "body")
+        return bodies[0].text if bodies else ""
+
+    def usability(self, min_text_chars: int = 200):
+        """(usable, reason): usable pages have real text and at least one of a logo, a social link or a street address."""
+        text = self.body_text()
+        if len(text) < min_text_chars:
+            return False, f"only {len(text)} characters of text"
+        for element in self._elements:
+            if element.attrs.get("id") in _SPA_ROOT_IDS and not element.text:
+                return False, f"empty #{element.attrs['id']} application root"
+        if any(e.tag_name == "img" and any(word in (e.attrs.get(attr) or "").lower() for word in _LOGO_WORDS for attr in ("class", "alt", "id", "src"))
+               for e in self._elements):
+            return True, "logo"
+        if any(e.tag_name == "a" and any(host in e.attrs.get("href", "") for host in _SOCIAL_HOSTS) for e in self._elements):
+            return True, "social link"
+        if _ADDRESS_PATTERN.search(text):
+            return True, "address"
+        return False, "no logo, social link or address"
+
+
+class FetchStrategyMemory:
+    """
+    Per-domain record of whether a plain GET was good enough ("static") or the page needed a browser
+    ("browser"), saved as JSON so the next crawl starts with what this one learned. A "browser" verdict
+    expires after ttl_seconds so sites that move to server rendering get another static try.
+
+    path must be on storage that outlives the container (a mounted volume or file share) for the
+    verdicts to carry over; with no path the memory lasts only as long as the process.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._domains = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._domains = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Could not read fetch strategy memory {path}: {e}")
+
+    def get(self, domain: str) -> Optional[str]:
+        with self._lock:
+            entry = self._domains.get(domain)
+        if entry is None or time.time() - entry["updated"] > self.ttl_seconds:
+            return None
+        return entry["strategy"]
+
+    def record(self, domain: str, strategy: str):
+        with self._lock:
+            self._domains[domain] = {"strategy": strategy, "updated": time.time()}
+
+    def counts(self) -> dict:
+        with self._lock:
+            strategies = [entry["strategy"] for entry in self._domains.values()]
+        return {strategy: strategies.count(strategy) for strategy in ("static", "browser")}
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = dict(self._domains)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+class PageLease:
+    """The page to process: a StaticPage already loaded, or a pooled browser the caller navigates itself."""
+
+    def __init__(self, driver, strategy: str, browser_lease=None):
+        self.driver = driver
+        self.strategy = strategy
+        self._browser_lease = browser_lease
+
+    @property
+    def rendered(self) -> bool:
+        return self.strategy == "browser"
+
+    @property
+    def gone(self) -> bool:
+        """True when the static fetch got a 404/410 - there is no page to process."""
+        return getattr(self.driver, "status_code", None) in _GONE_STATUSES
+
+    def release(self):
+        if self._browser_lease is not None:
+            self._browser_lease.release()
+
+
+class PageFetcher:
+    """
+    Chooses between a plain pooled HTTP GET and the browser pool for each page.
+
+    Domains with no "browser" verdict in memory get a static fetch first; when the HTML is usable
+    (see StaticPage.usability) the page is processed from it and the browser is never involved. A
+    404/410 comes back as a static lease marked gone. Pages that fail the usability check or are
+    refused with a 403/429 escalate to a browser from the pool and the domain is remembered so its other
+    pages skip the static attempt; other errors and non-HTML responses escalate for that page only.
+    """
+
+    def __init__(self, memory: FetchStrategyMemory, static_enabled: bool = True, timeout: float = 15.0,
+                 max_bytes: int = 5 * 1024 * 1024, pool_size: int = 16, min_text_chars: int = 200):
+        self.memory = memory
+        self.static_enabled = static_enabled
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.min_text_chars = min_text_chars
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Same content the browser would be served
+        self.session.headers["User-Agent"] = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                                              "(KHTML, like Gecko) Chrome/126.0 Safari/537.36")
+        self._lock = threading.Lock()
+        self._stats = {"static": 0, "gone": 0, "escalated": 0, "remembered_browser": 0, "fetch_errors": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def fetch_static(self, url: str) -> Optional[StaticPage]:
+        with self.session.get(url, timeout=self.timeout, stream=True, allow_redirects=True) as response:
+            if response.status_code >= 400:
+                print(f"Static fetch of {url} returned {response.status_code}")
+                # The status decides what happens next, the error page itself is not read
+                return StaticPage(response.url, "", response.status_code)
+            if "html" not in response.headers.get("Content-Type", "html").lower():
+                return None
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                body.extend(chunk)
+                if len(body) > self.max_bytes:
+                    print(f"Static fetch of {url} exceeded {self.max_bytes:,} bytes")
+                    return None
+            encoding = response.encoding if "charset" in response.headers.get("Content-Type", "").lower() else None
+            html = bytes(body).decode(encoding or response.apparent_encoding or "utf-8", errors="replace")
+            return StaticPage(response.url, html)
+
+    def checkout(self, url: str) -> PageLease:
+        domain = crawl_domain(url)
+        if not self.static_enabled:
+            return self._browser(url, domain, remember=False)
+        if self.memory.get(domain) == "browser":
+            self._count("remembered_browser")
+            return self._browser(url, domain, remember=False)
+        try:
+            page = self.fetch_static(url)
+        except requests.RequestException as e:
+            print(f"Static fetch of {url} failed: {e}")
+            self._count("fetch_errors")
+            page = None
+        if page is None:
+            # Nothing learned about the domain - try this page in the browser but leave the memory alone
+            return self._browser(url, domain, remember=False)
+        if page.status_code in _GONE_STATUSES:
+            self._count("gone")
+            return PageLease(page, "static")
+        if page.status_code in _REFUSED_STATUSES:
+            print(f"Static fetch of {url} was refused, using the browser")
+            return self._browser(url, domain, remember=True)
+        if page.status_code >= 400:
+            return self._browser(url, domain, remember=False)
+        usable, reason = page.usability(self.min_text_chars)
+        if usable:
+            print(f"Using static HTML for {url} ({reason})")
+            self.memory.record(domain, "static")
+            self._count("static")
+            return PageLease(page, "static")
+        print(f"Static HTML for {url} is not enough ({reason}), using the browser")
+        return self._browser(url, domain, remember=True)
+
+    def _browser(self, url: str, domain: str, remember: bool) -> PageLease:
+        if remember:
+            self.memory.record(domain, "browser")
+            self._count("escalated")
+        lease = browser_checkout()
+        return PageLease(lease.driver, "browser", lease)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["domains"] = self.memory.counts()
+        return stats
+
+
+_page_fetcher = None
+_page_fetcher_lock = threading.Lock()
+
+def get_page_fetcher() -> PageFetcher:
+    global _page_fetcher
+    if _page_fetcher is None:
+        with _page_fetcher_lock:
+            if _page_fetcher is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                # Persistent storage only - a path inside an ephemeral container is lost with it
+                strategy_path = os.getenv('PAGE_FETCH_STRATEGY_PATH')
+                if not strategy_path:
+                    print("PAGE_FETCH_STRATEGY_PATH is not set - fetch strategies are kept for this process only")
+                memory = FetchStrategyMemory(
+                    strategy_path,
+                    ttl_seconds=float(os.getenv('PAGE_FETCH_STRATEGY_TTL_SECONDS', str(7 * 24 * 3600))),
+                )
+                _page_fetcher = PageFetcher(
+                    memory,
+                    static_enabled=os.getenv('PAGE_FETCH_STATIC_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+                    timeout=float(os.getenv('PAGE_FETCH_TIMEOUT_SECONDS', '15')),
+                    max_bytes=int(os.getenv('PAGE_FETCH_MAX_BYTES', str(5 * 1024 * 1024))),
+                    pool_size=int(os.getenv('PAGE_FETCH_POOL_SIZE', '16')),
+                    min_text_chars=int(os.getenv('PAGE_FETCH_MIN_TEXT_CHARS', '200')),
+                )
+    return _page_fetcher
+
+def page_checkout(url: str) -> PageLease:
+    """Returns a lease on the page at url - static HTML when that is enough, a pooled browser otherwise."""
+    return get_page_fetcher().checkout(url)
+
+def get_page_fetch_stats() -> dict:
+    return get_page_fetcher().stats()
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from typing import Optional
+from dotenv import load_dotenv
+
+# One round trip per poll: load state, how recently the last resource finished, and a cheap DOM fingerprint
+_PAGE_READY_PROBE = """
+var resources = (window.performance && performance.getEntriesByType) ? performance.getEntriesByType('resource') : [];
+var lastEnd = 0;
+for (var i = 0; i < resources.length; i++) {
+    if (resources[i].responseEnd > lastEnd) { lastEnd = resources[i].responseEnd; }
+}
+var body = document.body;
+return {
+    readyState: document.readyState,
+    resources: resources.length,
+    sinceLastResourceMs: window.performance ? performance.now() - lastEnd : 0,
+    elements: document.getElementsByTagName('*').length,
+    textLength: body ? body.innerText.length : 0,
+    height: body ? body.scrollHeight : 0
+};
+"""
+
+
+class PageReadiness:
+    """
+    Waits for a page to be usable instead of sleeping for a fixed time.
+
+    A page counts as ready when document.readyState is "complete", no resource has finished loading
+    for network_idle_ms (performance resource entries stand in for network idle, since in-flight
+    requests are not visible to the page) and the element count, text length and height have not changed
+    for dom_stable_ms. Whatever the page does, wait() gives up after max_wait seconds and returns, so a
+    page that never settles (tickers, carousels, long polling) costs at most that much.
+    """
+
+    def __init__(self, max_wait: float = 10.0, network_idle_ms: float = 500, dom_stable_ms: float = 500,
+                 poll_interval_ms: float = 100, settle_max_wait: float = 2.0):
+        self.max_wait = max_wait
+        self.network_idle_ms = network_idle_ms
+        self.dom_stable_ms = dom_stable_ms
+        self.poll_interval_ms = poll_interval_ms
+        self.settle_max_wait = settle_max_wait
+        self._lock = threading.Lock()
+        self._stats = {"waits": 0, "ready": 0, "timed_out": 0, "errors": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+    def wait(self, driver, max_wait: Optional[float] = None) -> bool:
+        """Blocks until the page is ready or max_wait seconds pass; returns True if it became ready."""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        started = time.monotonic()
+        deadline = started + max_wait
+        fingerprint = None
+        stable_since = started
+        ready = False
+        try:
+            while True:
+                now = time.monotonic()
+                probe = driver.execute_script(_PAGE_READY_PROBE) or {}
+                current = (probe.get("elements"), probe.get("textLength"), probe.get("height"), probe.get("resources"))
+                if current != fingerprint:
+                    fingerprint = current
+                    stable_since = now
+                if (probe.get("readyState") == "complete"
+                        and (probe.get("sinceLastResourceMs") or 0) >= self.network_idle_ms
+                        and (now - stable_since) * 1000 >= self.dom_stable_ms):
+                    ready = True
+                    break
+                if now >= deadline:
+                    break
+                time.sleep(min(self.poll_interval_ms / 1000, max(0.0, deadline - now)))
+        except Exception as e:
+            # A page that cannot be probed (navigation in progress, dead renderer) is left to the caller
+            print(f"Page readiness check failed: {e}")
+            with self._lock:
+                self._stats["errors"] += 1
+        wait_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            self._stats["waits"] += 1
+            self._stats["ready" if ready else "timed_out"] += 1
+            self._stats["wait_ms_total"] += wait_ms
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+        return ready
+
+    def settle(self, driver) -> bool:
+        """Shorter wait for the page to react to a click or scroll."""
+        return self.wait(driver, max_wait=self.settle_max_wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_ms_avg"] = round(stats["wait_ms_total"] / stats["waits"], 3) if stats["waits"] else 0.0
+        return stats
+
+
+_page_readiness = None
+_page_readiness_lock = threading.Lock()
+
+def get_page_readiness() -> PageReadiness:
+    global _page_readiness
+    if _page_readiness is None:
+        with _page_readiness_lock:
+            if _page_readiness is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                _page_readiness = PageReadiness(
+                    max_wait=float(os.getenv('PAGE_READY_MAX_WAIT_SECONDS', '10')),
+                    network_idle_ms=float(os.getenv('PAGE_READY_NETWORK_IDLE_MS', '500')),
+                    dom_stable_ms=float(os.getenv('PAGE_READY_DOM_STABLE_MS', '500')),
+                    poll_interval_ms=float(os.getenv('PAGE_READY_POLL_INTERVAL_MS', '100')),
+                    settle_max_wait=float(os.getenv('PAGE_READY_SETTLE_MAX_WAIT_SECONDS', '2')),
+                )
+    return _page_readiness
+
+def page_wait_until_ready(driver, max_wait: Optional[float] = None) -> bool:
+    """Use after driver.get(): returns once the page has loaded and stopped changing (or the ceiling is hit)."""
+    return get_page_readiness().wait(driver, max_wait=max_wait)
+
+def page_wait_to_settle(driver) -> bool:
+    """Use after a click or scroll: the same readiness test with PAGE_READY_SETTLE_MAX_WAIT_SECONDS as the ceiling."""
+    return get_page_readiness().settle(driver)
+
+def get_page_ready_stats() -> dict:
+    return get_page_readiness().stats()
@@ -4,6 +4,7 @@ import markdownify
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 import sys
+from fx_page_ready import page_wait_until_ready, page_wait_to_settle
 
 def create_selenium_client():
 # Setup headless Chrome
@@ -173,7 +174,7 @@ def capture_page(url, username, pwd):
     driver = create_selenium_client()
     try:
         driver.get(url)
-        time.sleep(2)  # Wait for page to load
+        page_wait_until_ready(driver)  # Wait for the page to load and settle
         
         # Clear any popups/modals
         try:
@@ -188,7 +189,7 @@ def capture_page(url, username, pwd):
                 for element in elements:
                     if element.is_displayed():
                         element.click()
-                        time.sleep(0.5)
+                        page_wait_to_settle(driver)
                         break
         except:
             pass  # Ignore errors if no popups found
@@ -202,7 +203,7 @@ def capture_page(url, username, pwd):
         try:
             # Scroll back to top
             driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(1)
+            page_wait_to_settle(driver)
             # Get HTML
             html = driver.page_source
 
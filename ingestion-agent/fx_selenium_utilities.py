@@ -8,6 +8,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from dotenv import load_dotenv
 import time
+from fx_page_ready import page_wait_until_ready, page_wait_to_settle
 
 def create_selenium_client():
 # Setup headless Chrome
@@ -50,7 +51,7 @@ def capture_page_without_pwd(url):
     driver = create_selenium_client()
     try:
         driver.get(url)
-        time.sleep(2)  # Wait for page to load
+        page_wait_until_ready(driver)  # Wait for the page to load and settle
         
         # Clear any popups/modals
         try:
@@ -65,7 +66,7 @@ def capture_page_without_pwd(url):
                 for element in elements:
                     if element.is_displayed():
                         element.click()
-                        time.sleep(0.5)
+                        page_wait_to_settle(driver)
                         break
         except:
             pass  # Ignore errors if no popups found
@@ -79,7 +80,7 @@ def capture_page_without_pwd(url):
         try:
             # Scroll back to top
             driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(1)
+            page_wait_to_settle(driver)
             # Get HTML
             html = driver.page_source
 
@@ -141,7 +142,7 @@ def capture_page_with_pwd(url, username, pwd):
     driver = create_selenium_client()
     try:
         driver.get(url)
-        time.sleep(2)  # Wait for page to load
+        page_wait_until_ready(driver)  # Wait for the page to load and settle
         
         # Clear any popups/modals
         try:
@@ -156,7 +157,7 @@ def capture_page_with_pwd(url, username, pwd):
                 for element in elements:
                     if element.is_displayed():
                         element.click()
-                        time.sleep(0.5)
+                        page_wait_to_settle(driver)
                         break
         except:
             pass  # Ignore errors if no popups found
@@ -170,7 +171,7 @@ def capture_page_with_pwd(url, username, pwd):
         try:
             # Scroll back to top
             driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(1)
+            page_wait_to_settle(driver)
             # Get HTML
             html = driver.page_source
 
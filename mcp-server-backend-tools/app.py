@@ -1,7 +1,17 @@
 from fx_orchestration import process_wifi_password_image, process_confirm_commit_hil, initial_image_process
 from fx_db import db_image_to_content_upsert, db_get_business_list_by_lat_lon, db_create_new_business_from_image, db_get_business_types
+from fx_db import db_get_pool_stats, db_get_venue_index_stats
+from fx_jobs import job_submit, job_get_status, job_get_result, job_get_stats
+from fx_concurrency import run_blocking, get_blocking_executor_stats
 from fx_blb import blb_upload_file_to_blob, blb_get_blob_size
-from fx_cu import cu_analyzer_main
+from fx_cu import cu_analyzer_main, cu_get_latency_stats
+from fx_cu_cache import get_cu_cache_stats
+from fx_image_workers import img_get_transcode_stats
+from fx_image_dedup import img_get_dedup_stats
+from fx_geo_cache import geo_get_cache_stats
+from fx_geo_offline import geo_get_offline_stats
+from fx_rate_limit import get_rate_limiter_stats
+from fx_ref_cache import get_ref_cache_stats
 from fastapi import FastAPI, HTTPException
 from fastapi_mcp import FastApiMCP
 from fastapi.responses import PlainTextResponse
@@ -42,13 +52,122 @@ async def api_initial_image_process(data: ImageData):
         if image_url_str is None or image_url_str.strip() == "":
             image_url_str = None
         if image_url_str is not None:
-            resp = initial_image_process(image_url_str, venue_str)
+            resp = await run_blocking("initial_image_process", initial_image_process, image_url_str, venue_str)
             return resp
         else:
             return {"error": "Invalid input parameters."}
     except Exception as e:
         return {"error": f"Database error: {str(e)}"}
 
+@app.post("/api_initial_image_process_submit", operation_id="initial_image_process_submit")
+async def api_initial_image_process_submit(data: ImageData):
+    """
+    Queues an image for initial processing and returns a job id immediately.
+
+    Runs the same pipeline as initial_image_process on a background worker instead of holding the request open while the image is downloaded, converted, analyzed and staged. Poll get_job_status with the returned job_id until the status is "succeeded" or "failed", then call get_job_result to retrieve the findings for confirmation.
+
+    Args:
+        image_url (str): The URL of the image to be processed.
+        venue (Optional[str]): The venue associated with the image, if known.
+
+    Returns:
+        dict: The job_id and its initial status ("queued").
+    """
+    image_url_str = data.image_url
+    venue_str = data.venue
+    if venue_str is not None and venue_str.strip() == "":
+        venue_str = None
+    if image_url_str is None or image_url_str.strip() == "":
+        return {"error": "Invalid input parameters."}
+    resp = job_submit("initial_image_process", initial_image_process, image_url_str, venue_str)
+    if resp.get("status_code") == 429:
+        raise HTTPException(status_code=429, detail=resp["error"])
+    return resp
+
+@app.get("/api_job_status", operation_id="get_job_status")
+async def api_job_status(job_id: str):
+    """
+    Returns the current status of a background job.
+
+    Args:
+        job_id (str): The job id returned when the job was submitted.
+
+    Returns:
+        dict: The job status ("queued", "running", "succeeded" or "failed") with submission, start and finish timestamps and any error message.
+    """
+    resp = job_get_status(job_id)
+    if resp.get("status_code") == 404:
+        raise HTTPException(status_code=404, detail=resp["error"])
+    return resp
+
+@app.get("/api_job_result", operation_id="get_job_result")
+async def api_job_result(job_id: str):
+    """
+    Returns the result of a finished background job.
+
+    While the job is still queued or running only the status is returned. Once finished, the result contains the same response initial_image_process would have returned.
+
+    Args:
+        job_id (str): The job id returned when the job was submitted.
+
+    Returns:
+        dict: The job status, and once finished its result and any error message.
+    """
+    resp = job_get_result(job_id)
+    if resp.get("status_code") == 404:
+        raise HTTPException(status_code=404, detail=resp["error"])
+    return resp
+
+@app.get("/api_job_stats")
+def api_job_stats():
+    """Get worker pool limits and job counts by status for the background job runner."""
+    return job_get_stats()
+
+@app.get("/api_executor_stats")
+def api_executor_stats():
+    """Get worker pool size, queue depth and per-endpoint concurrency counters for offloaded blocking work."""
+    return get_blocking_executor_stats()
+
+@app.get("/api_cu_latency_stats")
+def api_cu_latency_stats():
+    """Get observed Content Understanding latency (p50/p90/mean) and average poll count per analyzer."""
+    return cu_get_latency_stats()
+
+@app.get("/api_cu_cache_stats")
+def api_cu_cache_stats():
+    """Get Content Understanding result cache hit/miss counts."""
+    return get_cu_cache_stats()
+
+@app.get("/api_image_transcode_stats")
+def api_image_transcode_stats():
+    """Get image transcode process pool queue depth and timing."""
+    return img_get_transcode_stats()
+
+@app.get("/api_image_dedup_stats")
+def api_image_dedup_stats():
+    """Get near-duplicate image detection hit/miss counts."""
+    return img_get_dedup_stats()
+
+@app.get("/api_geo_cache_stats")
+def api_geo_cache_stats():
+    """Get geocoding cache hit/miss counts and entry counts."""
+    return geo_get_cache_stats()
+
+@app.get("/api_geo_offline_stats")
+def api_geo_offline_stats():
+    """Get offline reverse geocoder hit/miss counts and lookup latency."""
+    return geo_get_offline_stats()
+
+@app.get("/api_rate_limit_stats")
+def api_rate_limit_stats():
+    """Get external provider rate limiter wait times, throttling and coalescing counts."""
+    return get_rate_limiter_stats()
+
+@app.get("/api_ref_cache_stats")
+def api_ref_cache_stats():
+    """Get reference data cache (venue names, business types) hit/miss counts."""
+    return get_ref_cache_stats()
+
 @app.post("/api_confirm_commit_hil", operation_id="confirm_commit_hil")
 async def api_confirm_commit_hil(session_uid: str, process_hil: str):
     """
@@ -62,7 +181,7 @@ async def api_confirm_commit_hil(session_uid: str, process_hil: str):
     Returns:
         dict: The response from the processing operation.
     """
-    resp = process_confirm_commit_hil(session_uid, process_hil)
+    resp = await run_blocking("confirm_commit_hil", process_confirm_commit_hil, session_uid, process_hil)
     return resp
 
 
@@ -80,7 +199,7 @@ async def api_process_wifi_password_image(blob_url: str, venue: str):
     Returns:
         dict: The response from the processing operation.
     """
-    return process_wifi_password_image(blob_url, venue)
+    return await run_blocking("process_wifi_password_image", process_wifi_password_image, blob_url, venue)
 
 @app.get("/api_process_hours_of_operation_image", operation_id="process_hours_of_operation_image")
 async def api_process_hours_of_operation_image(blob_url: str, venue: Optional[str] = None, latitude: Optional[float] = None, longitude: Optional[float] = None):
@@ -98,7 +217,7 @@ async def api_process_hours_of_operation_image(blob_url: str, venue: Optional[st
     Returns:
         dict: The response from the processing operation.
     """
-    return process_wifi_password_image(blob_url, venue)
+    return await run_blocking("process_hours_of_operation_image", process_wifi_password_image, blob_url, venue)
 
 @app.post("/api_db_get_business_types", operation_id="db_get_business_types")
 async def api_db_get_business_types():
@@ -121,7 +240,7 @@ async def api_db_get_business_types():
 
     # Ensure parameter order and types match the SQL procedure/query expectations
     try:
-        resp = db_get_business_types()
+        resp = await run_blocking("db_get_business_types", db_get_business_types)
         return resp
     except Exception as e:
         return {"error": f"Database error: {str(e)}"}
@@ -160,7 +279,9 @@ async def api_db_create_new_business_from_image(data: CreateNewBusinessFromImage
 
     # Ensure parameter order and types match the SQL procedure/query expectations
     try:
-        resp = db_create_new_business_from_image(
+        resp = await run_blocking(
+            "db_create_new_business_from_image",
+            db_create_new_business_from_image,
             category,
             latitude,
             longitude,
@@ -219,7 +340,9 @@ async def api_db_get_business_list_by_lat_lon(data: BusinessListByLatLonRequest)
         return_count=None
     # Ensure parameter order and types match the SQL procedure/query expectations
     try:
-        resp = db_get_business_list_by_lat_lon(
+        resp = await run_blocking(
+            "db_get_business_list_by_lat_lon",
+            db_get_business_list_by_lat_lon,
             category,
             latitude,
             longitude,
@@ -252,7 +375,7 @@ async def api_image_to_content_upsert(data: ImageToContentUpsertRequest):
     Returns:
         The result of the upsert operation as returned by the database function.
     """
-    resp = db_image_to_content_upsert(data.image_url, data.image_type, data.homepage_url)
+    resp = await run_blocking("db_image_to_content_upsert", db_image_to_content_upsert, data.image_url, data.image_type, data.homepage_url)
     return resp
 
 class UploadFileToBlobRequest(BaseModel):
@@ -302,9 +425,18 @@ def api_blb_get_blob_size(container_name: str, blob_name: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting blob size: {str(e)}")
 
+@app.get("/api_db_pool_stats")
+def api_db_pool_stats():
+    """Get connection pool size, checkout counts and wait/held timings for the database pool."""
+    return db_get_pool_stats()
+
+@app.get("/api_venue_index_stats")
+def api_venue_index_stats():
+    """Get in-memory venue index size, freshness and hit/fallback counts."""
+    return db_get_venue_index_stats()
 
 if __name__ == '__main__':
-    mcp = FastApiMCP(app, include_operations=["initial_image_process", "db_get_business_list_by_lat_lon", "db_image_to_content_upsert", "blb_upload_file_to_blob", "confirm_commit_hil"],auth_config=None)
+    mcp = FastApiMCP(app, include_operations=["initial_image_process", "initial_image_process_submit", "get_job_status", "get_job_result", "db_get_business_list_by_lat_lon", "db_image_to_content_upsert", "blb_upload_file_to_blob", "confirm_commit_hil"],auth_config=None)
     # Mount the MCP server directly to your FastAPI app
     mcp.mount_http()
     uvicorn.run(app, host='0.0.0.0', port=80)
\ No newline at end of file
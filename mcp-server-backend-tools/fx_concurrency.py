@@ -0,0 +1,164 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from dotenv import load_dotenv
+
+
+class BlockingExecutor:
+    """
+    Bounded thread pool for the synchronous requests / pyodbc / time.sleep work behind the async endpoints.
+
+    Each endpoint name gets its own asyncio.Semaphore so one slow tool cannot take every worker,
+    and the counters below report how deep the queues are at any moment:
+      - waiting: calls parked on their endpoint's concurrency limit
+      - queued:  calls handed to the pool but not yet picked up by a worker thread
+      - active:  calls currently running on a worker thread
+    """
+
+    def __init__(self, max_workers: int = 16, default_limit: int = None, endpoint_limits: dict = None):
+        self.max_workers = max_workers
+        self.default_limit = default_limit or max_workers
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking-worker")
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._endpoints = {}
+
+    def _endpoint_stats_locked(self, endpoint: str) -> dict:
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = {
+                "limit": self.endpoint_limits.get(endpoint, self.default_limit),
+                "waiting": 0,
+                "in_flight": 0,
+                "completed": 0,
+                "failed": 0,
+                "wait_ms_total": 0.0,
+                "wait_ms_max": 0.0,
+                "run_ms_total": 0.0,
+                "run_ms_max": 0.0,
+            }
+        return self._endpoints[endpoint]
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        with self._lock:
+            if endpoint not in self._semaphores:
+                self._semaphores[endpoint] = asyncio.Semaphore(self.endpoint_limits.get(endpoint, self.default_limit))
+            return self._semaphores[endpoint]
+
+    def _call(self, fn: Callable, args: tuple, kwargs: dict):
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _finish(self, endpoint: str, loop, semaphore: asyncio.Semaphore, wait_start: float, run_start: float, future):
+        # Runs once the worker thread is done with the call, or when the call is cancelled before it starts,
+        # so the endpoint's slot is only given back when no thread is still working on it
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+        failed = future.cancelled() or future.exception() is not None
+        finished = time.monotonic()
+        wait_ms = (run_start - wait_start) * 1000
+        run_ms = (finished - run_start) * 1000
+        with self._lock:
+            stats = self._endpoint_stats_locked(endpoint)
+            stats["in_flight"] -= 1
+            stats["failed" if failed else "completed"] += 1
+            stats["wait_ms_total"] += wait_ms
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+            stats["run_ms_total"] += run_ms
+            stats["run_ms_max"] = max(stats["run_ms_max"], run_ms)
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # Event loop already closed (shutdown) - nothing is waiting on the semaphore any more
+            pass
+
+    async def run(self, endpoint: str, fn: Callable, *args, **kwargs):
+        semaphore = self._semaphore(endpoint)
+        wait_start = time.monotonic()
+        with self._lock:
+            self._endpoint_stats_locked(endpoint)["waiting"] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            with self._lock:
+                self._endpoint_stats_locked(endpoint)["waiting"] -= 1
+        run_start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            with self._lock:
+                self._endpoint_stats_locked(endpoint)["in_flight"] += 1
+                self._queued += 1
+            future = self._executor.submit(self._call, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                stats = self._endpoint_stats_locked(endpoint)
+                stats["in_flight"] -= 1
+                stats["failed"] += 1
+                self._queued -= 1
+            semaphore.release()
+            raise
+        future.add_done_callback(functools.partial(self._finish, endpoint, loop, semaphore, wait_start, run_start))
+        # Cancelling the awaiting request cancels the call only if it has not started yet
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "active": self._active,
+                "endpoints": {name: dict(stats) for name, stats in self._endpoints.items()},
+            }
+
+
+def _parse_endpoint_limits(raw: str) -> dict:
+    # "initial_image_process=4,confirm_commit_hil=8" -> {"initial_image_process": 4, "confirm_commit_hil": 8}
+    limits = {}
+    for entry in (raw or "").split(","):
+        if "=" not in entry:
+            continue
+        name, value = entry.split("=", 1)
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            print(f"Ignoring invalid endpoint concurrency limit: {entry}")
+    return limits
+
+_blocking_executor = None
+_blocking_executor_lock = threading.Lock()
+
+def get_blocking_executor() -> BlockingExecutor:
+    global _blocking_executor
+    if _blocking_executor is None:
+        with _blocking_executor_lock:
+            if _blocking_executor is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                max_workers = int(os.getenv('BLOCKING_POOL_MAX_WORKERS', '16'))
+                default_limit = os.getenv('ENDPOINT_CONCURRENCY_DEFAULT')
+                _blocking_executor = BlockingExecutor(
+                    max_workers=max_workers,
+                    default_limit=int(default_limit) if default_limit else None,
+                    endpoint_limits=_parse_endpoint_limits(os.getenv('ENDPOINT_CONCURRENCY_LIMITS', '')),
+                )
+    return _blocking_executor
+
+async def run_blocking(endpoint: str, fn: Callable, *args, **kwargs):
+    """Run a synchronous function on the bounded worker pool without blocking the event loop."""
+    return await get_blocking_executor().run(endpoint, fn, *args, **kwargs)
+
+def get_blocking_executor_stats() -> dict:
+    return get_blocking_executor().stats()
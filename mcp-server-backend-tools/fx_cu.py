@@ -1,8 +1,15 @@
 import time
+import random
+import threading
+import statistics
+from collections import deque
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import os
 from dotenv import load_dotenv
+from fx_cu_cache import get_cu_cache, cu_cache_key
 
 
 def cu_analyzer_main(blob_url, analyzer_name):
@@ -18,45 +25,126 @@ def cu_analyzer_main(blob_url, analyzer_name):
     content_url = blob_url
     # print(f"Using analyzer: {content_understanding_analyzer}")
 
-    request_id_from_post = cu_api_post_request(content_understanding_endpoint, content_understanding_analyzer, content_url, subscription_key)
-    # print(f"Request ID: {request_id_from_post}")
+    # Identical bytes sent to the same analyzer give the same result, so reuse the raw CU JSON when we have it
+    cu_cache = get_cu_cache()
+    cache_key = cu_cache_key(content_understanding_analyzer, content_url) if cu_cache else None
+    if cu_cache and not cache_key:
+        cu_cache.count_unkeyed()
+    cu_result = cu_cache.get(cache_key) if cache_key else None
 
-    if request_id_from_post:
+    if cu_result is None:
+        submitted_at = time.monotonic()
+        request_id_from_post, operation_location = _cu_api_post(content_understanding_endpoint, content_understanding_analyzer, content_url, subscription_key)
         # print(f"Request ID: {request_id_from_post}")
-        cu_result = cu_api_get_result_request(content_understanding_endpoint, subscription_key, content_url, request_id_from_post)
-        if analyzer_name == "test":
-            return "test placeholder"
-        elif analyzer_name == "cu-initial-image-analyzer":
-            classify_response = extract_cu_json_classify_response(cu_result)
-            return classify_response
-        elif analyzer_name == "cu-wifi-password-analyzer":
-            wifi_response = extract_cu_json_wifi_response(cu_result)
-            return wifi_response
-        elif analyzer_name == "cu-hours-of-operation":
-            hoursofoperation_response = extract_cu_json_hours_of_operation_response(cu_result)
-            return hoursofoperation_response
-        elif analyzer_name == "cu-product-offering-analyzer":
-            product_offering_response = extract_cu_product_offering(cu_result)
-            return product_offering_response
-        elif analyzer_name == "cu-business-type-classifier":
-            classify_response = extract_cu_json_classify_response(cu_result)
-            return classify_response
-        elif analyzer_name == "cua-beer-list":
-            beerlist_response = extract_cu_json_output_list(cu_result, content_url)
-            return beerlist_response
-        elif analyzer_name == "cua-web-directory-page":
-            webdir_response = extract_cu_json_output_list(cu_result, content_url)
-            return webdir_response
-        elif analyzer_name == "cua-untappd-checkin-list":
-            untappd_checkin_response = extract_cu_json_output_list(cu_result, content_url)
-            return untappd_checkin_response
-        else:
-            return "Failed to retrieve results."
+
+        if not request_id_from_post:
+            return "Failed to get back request ID."
+        cu_result = cu_api_get_result_request(content_understanding_endpoint, subscription_key, content_url, request_id_from_post,
+                                              analyzer_name=analyzer_name, operation_location=operation_location, submitted_at=submitted_at)
+        if cache_key and isinstance(cu_result, dict) and cu_result.get("status") == "Succeeded":
+            cu_cache.put(cache_key, cu_result)
+
+    if analyzer_name == "test":
+        return "test placeholder"
+    elif analyzer_name == "cu-initial-image-analyzer":
+        classify_response = extract_cu_json_classify_response(cu_result)
+        return classify_response
+    elif analyzer_name == "cu-wifi-password-analyzer":
+        wifi_response = extract_cu_json_wifi_response(cu_result)
+        return wifi_response
+    elif analyzer_name == "cu-hours-of-operation":
+        hoursofoperation_response = extract_cu_json_hours_of_operation_response(cu_result)
+        return hoursofoperation_response
+    elif analyzer_name == "cu-product-offering-analyzer":
+        product_offering_response = extract_cu_product_offering(cu_result)
+        return product_offering_response
+    elif analyzer_name == "cu-business-type-classifier":
+        classify_response = extract_cu_json_classify_response(cu_result)
+        return classify_response
+    elif analyzer_name == "cua-beer-list":
+        beerlist_response = extract_cu_json_output_list(cu_result, content_url)
+        return beerlist_response
+    elif analyzer_name == "cua-web-directory-page":
+        webdir_response = extract_cu_json_output_list(cu_result, content_url)
+        return webdir_response
+    elif analyzer_name == "cua-untappd-checkin-list":
+        untappd_checkin_response = extract_cu_json_output_list(cu_result, content_url)
+        return untappd_checkin_response
     else:
-        return "Failed to get back request ID."
+        return "Failed to retrieve results."
+
+
+class CuHttpClient:
+    """
+    Keep-alive HTTP client for the Content Understanding endpoint, shared by every thread.
+
+    One requests.Session holds a urllib3 connection pool, so the POST and each poll GET reuse an
+    open TLS connection instead of handshaking again. Every call gets a (connect, read) timeout,
+    and transient failures are retried with backoff: connection errors on any method, and
+    502/503/504 responses on GET only so an analysis is never submitted twice after the
+    service has accepted it. 429 is left to the callers: the analyze POST is resubmitted and
+    the result poll waits, each for as long as Retry-After asks.
+    """
+
+    def __init__(self, pool_size: int = 20, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 max_retries: int = 3, backoff_factor: float = 0.5):
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self._session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self._session.post(url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self._session.head(url, **kwargs)
+
+    def close(self):
+        self._session.close()
+
+_cu_http_client = None
+_cu_http_client_lock = threading.Lock()
+
+def cu_get_http_client() -> CuHttpClient:
+    global _cu_http_client
+    if _cu_http_client is None:
+        with _cu_http_client_lock:
+            if _cu_http_client is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                _cu_http_client = CuHttpClient(
+                    pool_size=int(os.getenv('CU_HTTP_POOL_SIZE', '20')),
+                    connect_timeout=float(os.getenv('CU_HTTP_CONNECT_TIMEOUT_SECONDS', '5')),
+                    read_timeout=float(os.getenv('CU_HTTP_READ_TIMEOUT_SECONDS', '30')),
+                    max_retries=int(os.getenv('CU_HTTP_MAX_RETRIES', '3')),
+                    backoff_factor=float(os.getenv('CU_HTTP_RETRY_BACKOFF_SECONDS', '0.5')),
+                )
+    return _cu_http_client
 
 
 def cu_api_post_request(cu_endpoint, analyzer_name, content_url, subscription_key):
+    request_id, _ = _cu_api_post(cu_endpoint, analyzer_name, content_url, subscription_key)
+    return request_id
+
+def _cu_api_post(cu_endpoint, analyzer_name, content_url, subscription_key):
+    # Returns (request_id, operation_location); the Operation-Location header, when present, is the URL to poll
     # print(f"Using endpoint: {cu_endpoint}")
     print(f"Using analyzer: {analyzer_name}")
     # print(f"Using content URL: {content_url}")
@@ -71,41 +159,137 @@ def cu_api_post_request(cu_endpoint, analyzer_name, content_url, subscription_ke
         "url": content_url
     }
 
+    # A throttled POST was rejected, not accepted, so it is safe to submit again once the service allows it
+    max_throttle_retries = int(os.getenv('CU_POST_MAX_THROTTLE_RETRIES', '3'))
+    max_retry_after = float(os.getenv('CU_POST_MAX_RETRY_AFTER_SECONDS', '30'))
     try:
-        post_response = requests.post(post_api_url, headers=header_data, json=body_data)
-        if post_response is None:
-            print("No response received.")
+        throttle_count = 0
+        while True:
+            post_response = cu_get_http_client().post(post_api_url, headers=header_data, json=body_data)
+            if post_response is None:
+                print("No response received.")
+            if post_response.status_code != 429 or throttle_count >= max_throttle_retries:
+                break
+            throttle_count += 1
+            retry_after = _cu_retry_after_seconds(post_response)
+            delay = min(retry_after if retry_after is not None else 2 ** throttle_count, max_retry_after)
+            print(f"Throttled submitting to {analyzer_name}, retrying in {delay:.1f}s ({throttle_count}/{max_throttle_retries})")
+            time.sleep(delay)
         post_response.raise_for_status()
         post_response_data = post_response.json()
         request_id = post_response_data.get('id')
-        return request_id
+        operation_location = post_response.headers.get('Operation-Location')
+        return request_id, operation_location
     except requests.exceptions.RequestException as e:
         print(f"Error making API request: {e}")
+        return None, None
+
+
+class CuLatencyStats:
+    """
+    Rolling record of how long each analyzer takes from POST to a Succeeded result.
+
+    Used to pick the first poll delay: rather than always sleeping a fixed interval, the first GET is
+    timed for just before the analyzer usually finishes, so fast analyses come back in one or two polls.
+    """
+
+    def __init__(self, window: int = 50):
+        self._latencies = {}
+        self._polls = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, analyzer_name: str, latency_seconds: float, poll_count: int):
+        with self._lock:
+            self._latencies.setdefault(analyzer_name, deque(maxlen=self._window)).append(latency_seconds)
+            self._polls.setdefault(analyzer_name, deque(maxlen=self._window)).append(poll_count)
+
+    def first_poll_delay(self, analyzer_name: str, default: float, max_delay: float) -> float:
+        with self._lock:
+            latencies = list(self._latencies.get(analyzer_name, ()))
+        if len(latencies) < 3:
+            return default
+        # Aim a little under the median so the typical request is caught on the first or second poll
+        return min(max(statistics.median(latencies) * 0.8, default), max_delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = {name: (list(values), list(self._polls.get(name, ()))) for name, values in self._latencies.items()}
+        result = {}
+        for name, (latencies, polls) in snapshot.items():
+            ordered = sorted(latencies)
+            result[name] = {
+                "samples": len(ordered),
+                "p50_seconds": round(statistics.median(ordered), 3),
+                "p90_seconds": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))], 3),
+                "mean_seconds": round(statistics.mean(ordered), 3),
+                "avg_polls": round(statistics.mean(polls), 2) if polls else None,
+            }
+        return result
+
+_cu_latency_stats = CuLatencyStats()
+
+def cu_get_latency_stats() -> dict:
+    return _cu_latency_stats.stats()
+
+def _cu_retry_after_seconds(response):
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
         return None
 
-def cu_api_get_result_request(cu_endpoint, subscription_key, content_url, request_id):
-    get_api_request_result_url = f"{cu_endpoint}/contentunderstanding/analyzerResults/{request_id}?api-version=2025-05-01-preview"
+def cu_api_get_result_request(cu_endpoint, subscription_key, content_url, request_id, analyzer_name=None, operation_location=None, submitted_at=None):
+    get_api_request_result_url = operation_location or f"{cu_endpoint}/contentunderstanding/analyzerResults/{request_id}?api-version=2025-05-01-preview"
     get_header_data = {
         'Ocp-Apim-Subscription-Key': subscription_key
     }
-    status = "Running"
+    # Poll quickly at first and back off exponentially (with jitter so concurrent requests don't poll in lockstep)
+    initial_interval = float(os.getenv('CU_POLL_INITIAL_SECONDS', '0.5'))
+    max_interval = float(os.getenv('CU_POLL_MAX_INTERVAL_SECONDS', '5'))
+    backoff_factor = float(os.getenv('CU_POLL_BACKOFF_FACTOR', '1.5'))
+    deadline_seconds = float(os.getenv('CU_POLL_DEADLINE_SECONDS', '250'))
+    started = submitted_at if submitted_at is not None else time.monotonic()
+    deadline = started + deadline_seconds
+
+    interval = initial_interval
+    next_delay = _cu_latency_stats.first_poll_delay(analyzer_name, initial_interval, max_interval) if analyzer_name else initial_interval
     iteration_count = 1
-    max_iterations = 50  # Limit to avoid infinite loop
-    while status == "Running" and iteration_count < max_iterations:
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"Gave up waiting for analyzer result after {deadline_seconds}s - Iteration: {iteration_count}")
+            return None
+        time.sleep(min(next_delay, remaining))
         try:
-            get_response = requests.get(get_api_request_result_url, headers=get_header_data)
+            get_response = cu_get_http_client().get(get_api_request_result_url, headers=get_header_data)
+            retry_after = _cu_retry_after_seconds(get_response)
+            if get_response.status_code == 429:
+                # Throttled - wait as long as the service asks and try again
+                print(f"Throttled while polling - Iteration: {iteration_count}")
+                next_delay = retry_after if retry_after is not None else interval
+                iteration_count += 1
+                continue
             get_response.raise_for_status()
-            status = get_response.json().get("status", "")
+            response_data = get_response.json()
+            status = response_data.get("status", "")
             print(f"Current status: {status} - Iteration: {iteration_count}")
             if status == "Succeeded":
+                if analyzer_name:
+                    _cu_latency_stats.record(analyzer_name, time.monotonic() - started, iteration_count)
                 # Extract business information from the response
-                response_data = get_response.json()
                 return response_data
-            elif status != "Running":
+            elif status not in ("Running", "NotStarted"):
                 print("Request failed.")
                 return "Request Failed."
             iteration_count += 1
-            time.sleep(5)  # Wait before next check
+            if retry_after is not None:
+                next_delay = retry_after
+            else:
+                next_delay = interval * random.uniform(0.8, 1.2)
+                interval = min(interval * backoff_factor, max_interval)
         except requests.exceptions.RequestException as e:
             print(f"Error making API request: {e}")
             return None
@@ -2,13 +2,17 @@ import pyodbc
 import os
 import json
 from fx_utilities import get_street_address_from_lat_lon
+from fx_venue_index import VenueSpatialIndex
+from fx_ref_cache import get_ref_cache, ref_cache_invalidate
 from dotenv import load_dotenv
 from datetime import datetime
+from contextlib import contextmanager
+import threading
+import time
 
 def db_upsert_wifi_network_password(Venue: str, Wifi_Network: str, Wifi_Password: str, is_primary: bool, is_active: bool, Process_user: str):
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""EXEC [Establishments].[upsert_Venue_Wifi_Password] ?, ?, ?, ?, ?, ?"""
                 , Venue, Wifi_Network, Wifi_Password, is_primary, is_active, Process_user)
@@ -21,20 +25,26 @@ def db_upsert_wifi_network_password(Venue: str, Wifi_Network: str, Wifi_Password
     return "WiFi Network Password Upserted to Database Successfully"
 
 def db_create_new_business_from_image(category: str, latitude: float, longitude: float, full_address_string: str, image_url: str, business_name: str = None):
-    conn_str = db_get_connection_string()
-    if conn_str is None:
-        return {"error": "Database connection string is not available"}
     address_from_lat_lon = get_street_address_from_lat_lon(latitude, longitude)
     if address_from_lat_lon is None:
         return {"error": "Unable to retrieve address from latitude/longitude"}
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""EXEC [mbl].[new_business_create_off_image] ?, ?, ?, ?, ?, ?""",
                            category, latitude, longitude, full_address_string, image_url, business_name)
             rows = cursor.fetchall()
             print(rows)
-            return [{"venue": row.Venue} for row in rows]
+        # A new venue may carry a business type that was not listed before
+        ref_cache_invalidate("business_types")
+        for row in rows:
+            ref_cache_invalidate("venue_name", row.Venue)
+        venue_index = db_get_venue_index()
+        if venue_index is not None:
+            for row in rows:
+                venue_index.add_venue_category(row.Venue, category, image_url)
+            venue_index.mark_stale()
+        return [{"venue": row.Venue} for row in rows]
     except pyodbc.Error as e:
         print(f"Database error: {e}")
         return {"error": f"Database error: {e}"}
@@ -43,9 +53,14 @@ def db_create_new_business_from_image(category: str, latitude: float, longitude:
         return {"error": f"Database error: {db_exc}"}
 
 def db_get_business_list_by_lat_lon(category: str, latitude: float, longitude: float, radius_miles: float, return_count: int):
-    conn_str = db_get_connection_string()
+    # Answered from the in-memory venue index when it is enabled and knows the category
+    venue_index = db_get_venue_index()
+    if venue_index is not None:
+        venue_list = venue_index.query(category, latitude, longitude, radius_miles, return_count)
+        if venue_list is not None:
+            return venue_list
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""EXEC [mbl].[business_list_by_lat_lon] ?, ?, ?, ?, ?""",
                 category, latitude, longitude, radius_miles, return_count)
@@ -58,14 +73,17 @@ def db_get_business_list_by_lat_lon(category: str, latitude: float, longitude: f
         print(f"Database error: {db_exc}")
         return {"error": f"Database error: {db_exc}"}
 
+def _db_query_business_types(_key=None):
+    with db_get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""EXEC [mbl].[business_types] """)
+        rows = cursor.fetchall()
+        return [{"business_type": row.Tag_Category} for row in rows]
+
 def db_get_business_types():
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""EXEC [mbl].[business_types] """)
-            rows = cursor.fetchall()
-            return [{"business_type": row.Tag_Category} for row in rows]
+        # Served from the reference data cache; the procedure only runs once per TTL
+        return list(get_ref_cache("business_types").get("all", _db_query_business_types))
     except pyodbc.Error as e:
         print(f"Database error: {e}")
         return {"error": f"Database error: {e}"}
@@ -77,9 +95,8 @@ def db_image_to_establishment_content_upsert(content, content_type, content_grou
                                      , content_url, is_active, last_scraped_datetime, create_date
                                      , created_by, modified_datetime, modified_by, establishment_to_content
                                      , establishment):
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             estcursor = conn.cursor()
             estcursor.execute("""
                 IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -121,9 +138,8 @@ def db_image_to_venue_content_upsert(content, content_type, content_group, conte
                                      , content_url, is_active, is_validated, last_scraped_datetime, create_date
                                      , created_by, modified_datetime, modified_by, venue_to_content
                                      , venue, venue_to_content_type):
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             estcursor = conn.cursor()
             estcursor.execute("""
                     IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -215,8 +231,6 @@ def db_image_to_content_upsert(image_url, image_type, target_entity_link_type, h
     return db_response
 
 def db_facebook_business_page_upsert(facebook_url, homepage_url):
-    conn_str = db_get_connection_string()
-
     content = facebook_url + '#web'
     establishment = homepage_url + '#web'
     establishment_to_content = homepage_url + '#' + facebook_url + '#web'
@@ -232,7 +246,7 @@ def db_facebook_business_page_upsert(facebook_url, homepage_url):
     modified_by = None
 
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 IF NOT EXISTS (SELECT 1 FROM [Content].[Content] WHERE Content = ?)
@@ -276,38 +290,48 @@ def db_facebook_business_page_upsert(facebook_url, homepage_url):
         print(f"Database error: {db_exc}")
         return {"message": f"Database error: {db_exc}", "status_code": 500}
 
-def db_output_list_to_stage(output_list, analyzer_name):
-    conn_str = db_get_connection_string()
+def db_output_list_to_stage(output_list, analyzer_name, batch_size: int = None):
+    # Load environment variables from .env file
+    load_dotenv()
+    if batch_size is None:
+        batch_size = int(os.getenv('DB_STAGE_BATCH_SIZE', '500'))
+    batch_size = max(1, batch_size)
     list_ct = 0
-    if output_list:   
-        list_ct = len(output_list)
-        try:
-            with pyodbc.connect(conn_str) as oltrunc_conn:
-                oltrunc_cursor = oltrunc_conn.cursor()
-                oltrunc_cursor.execute("TRUNCATE TABLE [Stage].[CU_Output_List]")
-                oltrunc_conn.commit()
-            print(f"Stage.CU_Output_List truncated.")
-        except Exception as db_exc:
-            print(f"Database error: {db_exc}")
-            pass
+    if output_list:
+        # Build the parameter rows up front so raw_item_json is serialised exactly once per item
+        current_datetime = datetime.now()
+        rows = []
+        for item in output_list:
+            # Ensure item is a dictionary and has the required keys
+            if not isinstance(item, dict):
+                print(f"Warning: Item is not a dictionary: {type(item)} - {item}")
+                continue
+
+            if 'raw_item_json' not in item or 'source' not in item or 'pull_datetime' not in item:
+                print(f"Warning: Item missing required keys: {item}")
+                continue
+
+            raw_item_json_str = item['raw_item_json'] if isinstance(item['raw_item_json'], str) else json.dumps(item['raw_item_json'])
+            rows.append((raw_item_json_str, item['source'], item['pull_datetime'], current_datetime, analyzer_name, None, None))
+        list_ct = len(rows)
         try:
-            with pyodbc.connect(conn_str) as olload_conn:
-                for item in output_list:
-                    # Ensure item is a dictionary and has the required keys
-                    if not isinstance(item, dict):
-                        print(f"Warning: Item is not a dictionary: {type(item)} - {item}")
-                        continue
-                    
-                    if 'raw_item_json' not in item or 'source' not in item or 'pull_datetime' not in item:
-                        print(f"Warning: Item missing required keys: {item}")
-                        continue
-                    
-                    current_datetime = datetime.now()
-                    raw_item_json_str = json.dumps(item['raw_item_json']) if isinstance(item['raw_item_json'], dict) else item['raw_item_json']
-                    olload_cursor = olload_conn.cursor()
-                    olload_cursor.execute("INSERT INTO [Stage].[CU_Output_List] ([Raw_Item_Json],[Source],[Pull_Datetime],[Create_Date],[Created_By],[Modified_Datetime],[Modified_By]) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                          (raw_item_json_str, item['source'], item['pull_datetime'], current_datetime, analyzer_name, None, None))
-                olload_conn.commit()
+            # Truncate and load on the same pooled connection
+            with db_get_connection() as ol_conn:
+                oltrunc_cursor = ol_conn.cursor()
+                try:
+                    oltrunc_cursor.execute("TRUNCATE TABLE [Stage].[CU_Output_List]")
+                    ol_conn.commit()
+                    print(f"Stage.CU_Output_List truncated.")
+                except pyodbc.Error as db_exc:
+                    print(f"Database error: {db_exc}")
+                    ol_conn.rollback()
+                olload_cursor = ol_conn.cursor()
+                # Send each batch as one parameter array instead of one round trip per row
+                olload_cursor.fast_executemany = True
+                for batch_start in range(0, len(rows), batch_size):
+                    olload_cursor.executemany("INSERT INTO [Stage].[CU_Output_List] ([Raw_Item_Json],[Source],[Pull_Datetime],[Create_Date],[Created_By],[Modified_Datetime],[Modified_By]) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                              rows[batch_start:batch_start + batch_size])
+                ol_conn.commit()
             print(f"Database load complete.")
         except Exception as db_exc:
             print(f"Database error: {db_exc}")
@@ -318,10 +342,8 @@ def db_output_list_to_stage(output_list, analyzer_name):
     return f"Success. Loaded {list_ct} items to Stage.CU_Output_List."
 
 def db_pull_homepage_list():
-    conn_str = db_get_connection_string()
-
     try:
-        with pyodbc.connect(conn_str) as phl_conn:
+        with db_get_connection() as phl_conn:
             phl_cursor = phl_conn.cursor()
             phl_cursor.execute("SELECT top 500 content_url FROM Content.Content WHERE Is_Active = 1 AND Content_Type = 'Homepage' AND ISNULL(Modified_datetime, '1900-01-01') < CONVERT(DATE, GETDATE())")
             hp_list = [row[0] for row in phl_cursor.fetchall()]
@@ -519,10 +541,8 @@ def db_stage_hours_of_operation_data(session_uid: str, venue: str,
         Venue_hours_of_Operation = "TEMP#" + start_date_formatted + "#" + venue_str
     gnrtd_datetime = datetime.now()
 
-    conn_str = db_get_connection_string()
-
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO [Stage].[Mobile_Venue_Hours_of_Operation_Document]
@@ -577,8 +597,6 @@ def db_stage_hours_of_operation_data(session_uid: str, venue: str,
 
 def db_stage_wifi_data(session_uid: str, venue, wifi_network: str = None, wifi_password: str = None, content_url: str = None):
     print("Staging WiFi data...")
-    conn_str = db_get_connection_string()
-
     # If venue is a dict, extract the string value (adjust the key as needed)
     if isinstance(venue, dict):
         venue_str = venue.get('venue') or venue.get('venue_name') or next(iter(venue.values()), '')
@@ -592,7 +610,7 @@ def db_stage_wifi_data(session_uid: str, venue, wifi_network: str = None, wifi_p
     modified_by = None
 
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO [Stage].[Mobile_Venue_Wifi_Image]
@@ -621,8 +639,6 @@ def db_stage_product_offering_data(session_uid: str, is_new_business: bool, busi
                                     latitude: float, longitude: float, full_address_string: str, venue: str,
                                     product_list: list, content_url: str, stage_datetime: datetime):
     print("Staging product offering data...")
-    conn_str = db_get_connection_string()
-
     # If venue is a dict, extract the string value (adjust the key as needed)
     if isinstance(venue, dict):
         venue_str = venue.get('venue') or venue.get('venue_name') or next(iter(venue.values()), '')
@@ -653,7 +669,7 @@ def db_stage_product_offering_data(session_uid: str, is_new_business: bool, busi
     modified_by = None
 
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with db_get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO [Stage].[Mobile_Venue_Product_Offerings_Document]
@@ -680,9 +696,8 @@ def db_stage_product_offering_data(session_uid: str, is_new_business: bool, busi
         return {"message": f"Database error: {db_exc}", "status_code": 500}
 
 def db_load_stage_to_wifi(session_uid: str):
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as wifild_conn:
+        with db_get_connection() as wifild_conn:
             wifild_cursor = wifild_conn.cursor()
             wifild_cursor.execute("EXEC [Establishments].[mbl_upsert_Venue_Wifi_Password] ?", session_uid)
             wifild_conn.commit()
@@ -692,9 +707,8 @@ def db_load_stage_to_wifi(session_uid: str):
         print(f"Database error: {db_exc}")
 
 def db_load_stage_to_hours_of_operation(session_uid: str):
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as wifild_conn:
+        with db_get_connection() as wifild_conn:
             wifild_cursor = wifild_conn.cursor()
             wifild_cursor.execute("EXEC [Establishments].[mbl_upsert_Venue_Hours_Of_Operation] ?", session_uid)
             wifild_conn.commit()
@@ -704,9 +718,8 @@ def db_load_stage_to_hours_of_operation(session_uid: str):
         print(f"Database error: {db_exc}")
 
 def db_load_stage_to_product_offering(session_uid: str):
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as pold_conn:
+        with db_get_connection() as pold_conn:
             pold_cursor = pold_conn.cursor()
             pold_cursor.execute("EXEC [Establishments].[mbl_upsert_Venue_Product_Offerings] ?", session_uid)
             pold_conn.commit()
@@ -715,16 +728,19 @@ def db_load_stage_to_product_offering(session_uid: str):
     except Exception as db_exc:
         print(f"Database error: {db_exc}")
 
+def _db_query_venue_name(venue: str):
+    with db_get_connection() as wifild_conn:
+        gtvnu_cursor = wifild_conn.cursor()
+        gtvnu_cursor.execute("SELECT venue_name FROM Establishments.Venue WHERE venue = ?", venue)
+        venue_name = gtvnu_cursor.fetchone()
+        wifild_conn.commit()
+    if venue_name:
+        return venue_name[0]
+    return None
+
 def db_get_venue_name(venue: str):
-    conn_str = db_get_connection_string()
     try:
-        with pyodbc.connect(conn_str) as wifild_conn:
-            gtvnu_cursor = wifild_conn.cursor()
-            gtvnu_cursor.execute("SELECT venue_name FROM Establishments.Venue WHERE venue = ?", venue)
-            venue_name = gtvnu_cursor.fetchone()
-            wifild_conn.commit()
-        if venue_name:
-            return venue_name[0]
+        return get_ref_cache("venue_name").get(venue, _db_query_venue_name)
     except Exception as db_exc:
         print(f"Database error: {db_exc}")
 
@@ -747,11 +763,341 @@ def db_get_connection_string():
         f"PWD={pwd};"
         "Encrypt=yes;"
         "TrustServerCertificate=yes;"
+        # Pooled connections can be handed back while a caller's cursor still holds a result set
+        "MARS_Connection=yes;"
         "Connection Timeout=60;"
         "LoginTimeout=60;"
     )
     return conn_str
 
+class DbConnectionPool:
+    """
+    Process-wide pool of warm pyodbc connections to Azure SQL.
+
+    Connections are handed out by checkout() and returned to the pool when the
+    with-block exits, so callers skip the TLS + login handshake that a fresh
+    pyodbc.connect() pays. Idle connections past idle_timeout are closed down to
+    min_size, connections that have been idle longer than health_check_interval
+    are probed with SELECT 1 before reuse, and the pool never opens more than
+    max_size connections at once.
+    """
+
+    def __init__(self, conn_str: str, min_size: int = 1, max_size: int = 10, timeout: float = 30.0,
+                 idle_timeout: float = 300.0, health_check_interval: float = 30.0):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.conn_str = conn_str
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._size = 0   # open connections, idle plus checked out
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "connects": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "evicted": 0,
+            "discarded": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "held_ms_total": 0.0,
+            "held_ms_max": 0.0,
+        }
+
+    def warm(self):
+        # Open min_size connections up front so the first requests don't pay the handshake
+        opened = []
+        try:
+            while len(opened) < self.min_size:
+                with self._cond:
+                    if self._size >= self.min_size:
+                        break
+                    self._size += 1
+                try:
+                    opened.append(self._connect())
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                    raise
+        finally:
+            with self._cond:
+                now = time.monotonic()
+                self._idle.extend((conn, now) for conn in opened)
+                self._cond.notify_all()
+
+    def _connect(self):
+        conn = pyodbc.connect(self.conn_str)
+        with self._cond:
+            self._stats["connects"] += 1
+        return conn
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle_locked(self) -> list:
+        # Caller holds the lock; returns the connections to close once it is released
+        now = time.monotonic()
+        expired = []
+        keep = []
+        # Oldest entries sit at the front of the list, so they are evicted first
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout and self._size - len(expired) > self.min_size:
+                expired.append(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+        self._size -= len(expired)
+        self._stats["evicted"] += len(expired)
+        return expired
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            last_used = None
+            expired = []
+            timed_out = False
+            with self._cond:
+                while True:
+                    expired.extend(self._evict_idle_locked())
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        timed_out = True
+                        break
+                    self._cond.wait(remaining)
+            for stale in expired:
+                self._close(stale)
+            if timed_out:
+                raise TimeoutError(f"Timed out after {self.timeout}s waiting for a database connection (max_size={self.max_size})")
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            if time.monotonic() - last_used < self.health_check_interval or self._is_healthy(conn):
+                return conn
+
+            # Stale connection failed its probe - drop it and try again
+            self._close(conn)
+            with self._cond:
+                self._size -= 1
+                self._stats["health_check_failures"] += 1
+                self._cond.notify()
+
+    def _release(self, conn, discard: bool = False):
+        with self._cond:
+            if discard:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    @contextmanager
+    def checkout(self):
+        """
+        Borrow a connection for the duration of a with-block.
+
+        Mirrors pyodbc's own connection context manager: the transaction is
+        committed when the block exits cleanly and rolled back when it raises.
+        A connection whose rollback fails is assumed broken and is discarded
+        instead of going back to the pool.
+        """
+        wait_start = time.monotonic()
+        conn = self._acquire()
+        acquired = time.monotonic()
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            released = time.monotonic()
+            self._release(conn, discard)
+            wait_ms = (acquired - wait_start) * 1000
+            held_ms = (released - acquired) * 1000
+            with self._cond:
+                self._stats["checkouts"] += 1
+                self._stats["wait_ms_total"] += wait_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+                self._stats["held_ms_total"] += held_ms
+                self._stats["held_ms_max"] = max(self._stats["held_ms_max"], held_ms)
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["min_size"] = self.min_size
+            stats["max_size"] = self.max_size
+        checkouts = stats["checkouts"] or 1
+        stats["wait_ms_avg"] = round(stats["wait_ms_total"] / checkouts, 3)
+        stats["held_ms_avg"] = round(stats["held_ms_total"] / checkouts, 3)
+        return stats
+
+    def close(self):
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._size -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def db_get_pool() -> DbConnectionPool:
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                pool = DbConnectionPool(
+                    db_get_connection_string(),
+                    min_size=int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+                    max_size=int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                    timeout=float(os.getenv('DB_POOL_TIMEOUT_SECONDS', '30')),
+                    idle_timeout=float(os.getenv('DB_POOL_IDLE_TIMEOUT_SECONDS', '300')),
+                    health_check_interval=float(os.getenv('DB_POOL_HEALTH_CHECK_SECONDS', '30')),
+                )
+                try:
+                    pool.warm()
+                except Exception as db_exc:
+                    # Not fatal - connections will be opened on demand
+                    print(f"Database pool warm-up failed: {db_exc}")
+                _db_pool = pool
+    return _db_pool
+
+def db_get_connection():
+    """
+    Returns a context manager yielding a pooled pyodbc connection.
+
+    Use in place of pyodbc.connect(conn_str): `with db_get_connection() as conn:`.
+    """
+    return db_get_pool().checkout()
+
+def db_get_pool_stats() -> dict:
+    return db_get_pool().stats()
+
+# Must return venue, venue_name, full_address, latitude, longitude, is_active and modified_datetime for venues
+# changed at or after the single ? parameter (inclusive, so rows sharing the newest timestamp are not skipped).
+# A VENUE_INDEX_QUERY that also returns category and image_url - one row per venue and category - is used as is.
+# With this default, categories and images come from [mbl].[business_list_by_lat_lon] itself on every full load.
+_VENUE_INDEX_DEFAULT_QUERY = """
+    SELECT v.Venue AS venue
+        ,v.Venue_Name AS venue_name
+        ,CONCAT_WS(', ', v.Address_Line_1, v.City, v.State_or_Province_Code, v.Postal_Code) AS full_address
+        ,v.Latitude AS latitude
+        ,v.Longitude AS longitude
+        ,v.is_active AS is_active
+        ,ISNULL(v.Modified_Datetime, v.Create_Datetime) AS modified_datetime
+    FROM [Establishments].[Venue] v
+    WHERE ISNULL(v.Modified_Datetime, v.Create_Datetime) >= ?
+"""
+# Half the earth's circumference is ~12,450 miles, so this radius around any point covers every venue
+_VENUE_INDEX_GLOBE_RADIUS_MILES = 12500
+_VENUE_INDEX_ALL_ROWS = 2147483647
+
+def _db_query_venue_categories() -> dict:
+    # venue -> [(category, image_url)] exactly as the nearby-venue procedure reports them: each business type is
+    # asked for once with a radius that covers the globe, so the index and the procedure cannot disagree
+    business_types = [row["business_type"] for row in _db_query_business_types()]
+    memberships = {}
+    with db_get_connection() as conn:
+        cursor = conn.cursor()
+        for business_type in business_types:
+            cursor.execute("""EXEC [mbl].[business_list_by_lat_lon] ?, ?, ?, ?, ?""",
+                business_type, 0.0, 0.0, _VENUE_INDEX_GLOBE_RADIUS_MILES, _VENUE_INDEX_ALL_ROWS)
+            for row in cursor.fetchall():
+                memberships.setdefault(row.venue, []).append((business_type, row.image_url))
+    return memberships
+
+def db_load_venue_index_rows(since: datetime, full: bool = False) -> list:
+    custom_query = os.getenv('VENUE_INDEX_QUERY')
+    with db_get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(custom_query or _VENUE_INDEX_DEFAULT_QUERY, since)
+        columns = [column[0].lower() for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    if custom_query or not full:
+        # Incremental loads carry no category, so the index keeps the categories each venue already has
+        return rows
+    memberships = _db_query_venue_categories()
+    expanded = []
+    for row in rows:
+        for category, image_url in memberships.get(row["venue"], [(None, None)]):
+            expanded.append(dict(row, category=category, image_url=image_url))
+    return expanded
+
+_venue_index = None
+_venue_index_initialized = False
+_venue_index_lock = threading.Lock()
+
+def db_get_venue_index():
+    """Returns the shared in-memory venue index, or None when VENUE_INDEX_ENABLED is false."""
+    global _venue_index, _venue_index_initialized
+    if not _venue_index_initialized:
+        with _venue_index_lock:
+            if not _venue_index_initialized:
+                # Load environment variables from .env file
+                load_dotenv()
+                if os.getenv('VENUE_INDEX_ENABLED', 'false').lower() in ('1', 'true', 'yes'):
+                    _venue_index = VenueSpatialIndex(
+                        db_load_venue_index_rows,
+                        refresh_seconds=float(os.getenv('VENUE_INDEX_REFRESH_SECONDS', '60')),
+                        full_refresh_seconds=float(os.getenv('VENUE_INDEX_FULL_REFRESH_SECONDS', '3600')),
+                        cell_degrees=float(os.getenv('VENUE_INDEX_CELL_DEGREES', '0.01')),
+                    )
+                _venue_index_initialized = True
+    return _venue_index
+
+def db_get_venue_index_stats() -> dict:
+    venue_index = db_get_venue_index()
+    if venue_index is None:
+        return {"enabled": False}
+    stats = venue_index.stats()
+    stats["enabled"] = True
+    return stats
+
 if __name__ == '__main__':
     
     category = "Honey Stand"
@@ -1,30 +1,27 @@
-# importing geopy library and Nominatim class
+# geocoding goes through fx_geo_cache, which wraps geopy's Nominatim client
 import requests
-from geopy.geocoders import Nominatim
+from fx_geo_cache import geo_geocode, geo_reverse
+from fx_rate_limit import RateLimitedError, get_rate_limiter, parse_retry_after
 
 def get_lat_lon(address_string: str):
-    # calling the Nominatim tool and create Nominatim class
-    loc = Nominatim(user_agent="Geopy Library")
-
-    # entering the location name
-    getLoc = loc.geocode(address_string)
+    # Geocode through the persistent geocoding cache - Nominatim is only called on a miss
+    getLoc = geo_geocode(address_string)
+    if getLoc is None:
+        return {"latitude": None, "longitude": None}
 
     # printing address
-    print(getLoc.address)
-    latitude = getLoc.latitude
-    longitude = getLoc.longitude
+    print(getLoc["address"])
+    latitude = getLoc["latitude"]
+    longitude = getLoc["longitude"]
 
     return {"latitude": latitude, "longitude": longitude}
 
 def get_street_address_from_lat_lon(latitude: float, longitude: float):
-    # calling the Nominatim tool and create Nominatim class
-    loc = Nominatim(user_agent="Geopy Library")
-
-    # entering the location name
-    getLoc = loc.reverse((latitude, longitude))
+    # Reverse geocode through the persistent geocoding cache - Nominatim is only called on a miss
+    getLoc = geo_reverse(latitude, longitude)
 
     # printing address
-    print(getLoc.address)
+    print(getLoc["address"] if getLoc else "Location not found")
 
     return "Success"
 
@@ -36,8 +33,13 @@ def get_street_address(business_name: str, city: str, state: str):
         "per_page": 10  # Get multiple results to filter by city
     }
     
-    response = requests.get(url, params=params)
-    data = response.json()
+    def search():
+        response = requests.get(url, params=params)
+        if response.status_code == 429:
+            raise RateLimitedError("opencorporates", parse_retry_after(response.headers.get("Retry-After")))
+        return response.json()
+    # Throttled to OpenCorporates' allowance; concurrent searches for the same company share one request
+    data = get_rate_limiter("opencorporates").call(("companies", business_name.lower(), state.lower()), search)
 
     if "results" in data and "companies" in data["results"]:
         for company_info in data["results"]["companies"]:
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Optional
+from PIL import Image, ImageFile
+from dotenv import load_dotenv
+
+
+def img_dhash(data: bytes, hash_size: int = 8, max_decode_pixels: int = 25_000_000) -> int:
+    """
+    Difference hash of an image: 64 bits for the default hash_size, robust to re-encoding, resizing and small crops.
+
+    The image is shrunk to (hash_size + 1) x hash_size grayscale and each bit records whether a pixel is
+    brighter than its right-hand neighbour, so two photos of the same sign differ in only a few bits.
+    Formats that cannot be decoded at reduced size are not hashed above max_decode_pixels.
+    """
+    # Set flag to handle corrupted image headers
+    ImageFile.LOAD_TRUNCATED_IMAGES = True
+    with Image.open(BytesIO(data)) as img:
+        if img.format == 'JPEG':
+            # Decode at 1/8 scale - plenty for a 9x8 thumbnail
+            img.draft('L', (hash_size * 8, hash_size * 8))
+        elif img.size[0] * img.size[1] > max_decode_pixels:
+            raise ValueError(f"{img.size[0]}x{img.size[1]} {img.format} image is too large to hash")
+        pixels = list(img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+def img_dedup_scope(venue: Optional[str], lat: Optional[float], lon: Optional[float], cell_degrees: float = 0.001) -> Optional[str]:
+    """Where a duplicate may come from: the venue when known, otherwise a lat/lon grid cell (~110 m at the default size)."""
+    if venue:
+        return f"venue:{venue}"
+    if lat is None or lon is None:
+        return None
+    return f"cell:{int(lat // cell_degrees)}:{int(lon // cell_degrees)}"
+
+
+class ImageDedupIndex:
+    """
+    Perceptual hashes of recently processed images and the results they produced, grouped by scope.
+
+    lookup() returns the stored result of the closest earlier image in the same scope whose hash is within
+    max_distance bits, so a re-upload of the same storefront photo can reuse the earlier session instead
+    of running the pipeline again. Entries expire after ttl_seconds and each scope keeps at most
+    max_per_scope of the newest images.
+
+    A 9x8 difference hash cannot see text, so a wifi card or hours sign with new text would match the old
+    one. Only results whose category is in `categories` (images that carry no text) are recorded, and
+    hence only those can ever be reused.
+    """
+
+    def __init__(self, max_distance: int = 6, ttl_seconds: float = 24 * 3600, max_per_scope: int = 200, cell_degrees: float = 0.001,
+                 categories=("business_general",)):
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_per_scope = max_per_scope
+        self.cell_degrees = cell_degrees
+        self.categories = frozenset(categories)
+        self._scopes = {}  # scope -> [(hash, created_at, result)], oldest first
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "recorded": 0, "unscoped": 0, "unhashed": 0, "not_recorded": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def key_for(self, image_hash: Optional[int], venue: Optional[str], lat: Optional[float], lon: Optional[float], locate=None):
+        """
+        (scope, hash) for an image, or None when it was not hashed (passed to CU unchanged) or has no venue
+        or location to scope it by. The hash comes from img_transcode(with_hash=True); nothing is downloaded
+        or decoded here.
+        """
+        if image_hash is None:
+            self._count("unhashed")
+            return None
+        if not venue and (lat is None or lon is None) and locate is not None:
+            lat, lon = locate()
+        scope = img_dedup_scope(venue, lat, lon, self.cell_degrees)
+        if scope is None:
+            self._count("unscoped")
+            return None
+        return scope, image_hash
+
+    @staticmethod
+    def _neighbour_scopes(scope: str):
+        # GPS jitter can put two photos of the same sign either side of a cell edge, so search the 3x3 block
+        if not scope.startswith("cell:"):
+            return [scope]
+        _, row, col = scope.split(":")
+        return [f"cell:{int(row) + dr}:{int(col) + dc}" for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+
+    def lookup(self, key) -> Optional[dict]:
+        scope, image_hash = key
+        cutoff = time.time() - self.ttl_seconds
+        best = None
+        with self._lock:
+            for candidate_scope in self._neighbour_scopes(scope):
+                entries = [entry for entry in self._scopes.get(candidate_scope, []) if entry[1] >= cutoff]
+                if entries:
+                    self._scopes[candidate_scope] = entries
+                else:
+                    self._scopes.pop(candidate_scope, None)
+                for entry_hash, _, result in entries:
+                    distance = (entry_hash ^ image_hash).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, result)
+            self._stats["hits" if best else "misses"] += 1
+        if best is None:
+            return None
+        print(f"Near-duplicate image found in {scope} (distance {best[0]}), reusing session {best[1].get('session_uid')}")
+        return dict(best[1])
+
+    def record(self, key, result: dict):
+        scope, image_hash = key
+        if result.get("category") not in self.categories:
+            self._count("not_recorded")
+            return
+        with self._lock:
+            entries = self._scopes.setdefault(scope, [])
+            entries.append((image_hash, time.time(), dict(result)))
+            del entries[:-self.max_per_scope]
+            self._stats["recorded"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["scopes"] = len(self._scopes)
+            stats["images"] = sum(len(entries) for entries in self._scopes.values())
+        return stats
+
+
+_dedup_index = None
+_dedup_index_initialized = False
+_dedup_index_lock = threading.Lock()
+
+def img_get_dedup_index() -> Optional[ImageDedupIndex]:
+    """Returns the shared duplicate index, or None when IMG_DEDUP_ENABLED is false (the default)."""
+    global _dedup_index, _dedup_index_initialized
+    if not _dedup_index_initialized:
+        with _dedup_index_lock:
+            if not _dedup_index_initialized:
+                # Load environment variables from .env file
+                load_dotenv()
+                if os.getenv('IMG_DEDUP_ENABLED', 'false').lower() in ('1', 'true', 'yes'):
+                    _dedup_index = ImageDedupIndex(
+                        max_distance=int(os.getenv('IMG_DEDUP_MAX_DISTANCE', '6')),
+                        ttl_seconds=float(os.getenv('IMG_DEDUP_TTL_SECONDS', str(24 * 3600))),
+                        max_per_scope=int(os.getenv('IMG_DEDUP_MAX_PER_SCOPE', '200')),
+                        cell_degrees=float(os.getenv('IMG_DEDUP_CELL_DEGREES', '0.001')),
+                        categories=[c.strip() for c in os.getenv('IMG_DEDUP_CATEGORIES', 'business_general').split(',') if c.strip()],
+                    )
+                _dedup_index_initialized = True
+    return _dedup_index
+
+def img_get_dedup_stats() -> dict:
+    index = img_get_dedup_index()
+    if index is None:
+        return {"enabled": False}
+    stats = index.stats()
+    stats["enabled"] = True
+    return stats
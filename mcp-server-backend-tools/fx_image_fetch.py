@@ -0,0 +1,133 @@
+import os
+import threading
+from io import BytesIO
+from typing import Optional
+import requests
+from PIL import Image
+from dotenv import load_dotenv
+from fx_utilities import get_gps_coordinates_from_image
+from fx_image_normalize import ImageTooLargeError
+
+
+class ImageFetch:
+    """
+    Downloads an image at most once for the whole pipeline run and answers metadata questions from it.
+
+    gps(), dimensions() and image_format() first try a ranged GET of just the start of the file, where
+    JPEG EXIF and most HEIF metadata live, so an image that is passed to Content Understanding as-is is
+    never downloaded in full here. Anything that needs the pixels calls content(), which downloads the
+    file once and shares the bytes with every later caller, including the metadata lookups.
+
+    Downloads are streamed and abandoned with ImageTooLargeError as soon as they pass max_bytes
+    (IMG_MAX_DOWNLOAD_BYTES), or before they start when the server already reports a larger size.
+    """
+
+    def __init__(self, url: Optional[str] = None, content: Optional[bytes] = None, header_bytes: Optional[int] = None,
+                 timeout: float = 30.0, max_bytes: Optional[int] = None):
+        if url is None and content is None:
+            raise ValueError("Either url or content must be provided")
+        load_dotenv()
+        self.url = url
+        self.header_bytes = header_bytes or int(os.getenv('IMAGE_HEADER_FETCH_BYTES', str(128 * 1024)))
+        self.timeout = timeout
+        self.max_bytes = max_bytes or int(os.getenv('IMG_MAX_DOWNLOAD_BYTES', str(50 * 1024 * 1024)))
+        self._content = content
+        self._header = None
+        self._size = len(content) if content is not None else None
+        self._metadata = None
+        self._lock = threading.Lock()
+
+    def _check_size(self, size: Optional[int]):
+        if size is not None and size > self.max_bytes:
+            raise ImageTooLargeError(f"Image too large: {size:,} bytes, the limit is {self.max_bytes:,} bytes.")
+
+    def _read_limited(self, response) -> bytearray:
+        # Stream the body in chunks so an oversized file is abandoned without ever being held in full
+        declared = response.headers.get('Content-Length')
+        self._check_size(int(declared) if declared and declared.isdigit() else None)
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            buffer.extend(chunk)
+            self._check_size(len(buffer))
+        return buffer
+
+    def content(self) -> bytes:
+        """Full image bytes, downloaded on first use."""
+        with self._lock:
+            if self._content is None:
+                self._check_size(self._size)
+                with requests.get(self.url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    self._content = self._read_limited(response)
+                self._size = len(self._content)
+            return self._content
+
+    def _header_locked(self) -> bytes:
+        if self._content is not None:
+            return self._content
+        if self._header is None:
+            with requests.get(self.url, headers={'Range': f"bytes=0-{self.header_bytes - 1}"}, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                if response.status_code == 206:
+                    self._header = response.content
+                    # Content-Range: bytes 0-131071/4843520
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                    self._size = int(total) if total.isdigit() else None
+                else:
+                    # Server ignored the range and sent the whole file - keep it for conversion too
+                    self._content = self._read_limited(response)
+                    self._size = len(self._content)
+                    return self._content
+        return self._header
+
+    def _read_metadata(self, data: bytes) -> dict:
+        try:
+            image = Image.open(BytesIO(data))
+        except Image.DecompressionBombError as e:
+            raise ImageTooLargeError(f"Image too large: {e}")
+        with image:
+            lat, lon = get_gps_coordinates_from_image(image)
+            return {"lat": lat, "lon": lon, "width": image.width, "height": image.height, "format": image.format}
+
+    def metadata(self) -> dict:
+        """{"lat", "lon", "width", "height", "format"} read from the header, or from the full file if the header is not enough."""
+        with self._lock:
+            if self._metadata is not None:
+                return self._metadata
+            try:
+                data = self._header_locked()
+                metadata = self._read_metadata(data)
+            except ImageTooLargeError:
+                raise
+            except Exception as e:
+                if self._content is not None:
+                    raise
+                print(f"Image header was not enough to read metadata, downloading full image: {e}")
+                metadata = None
+        if metadata is None:
+            metadata = self._read_metadata(self.content())
+        with self._lock:
+            self._metadata = metadata
+        return metadata
+
+    def gps(self):
+        """(latitude, longitude), or (None, None) if the image has no GPS data or cannot be read."""
+        try:
+            metadata = self.metadata()
+        except Exception as e:
+            print(f"Error reading GPS data from {self.url or 'image stream'}: {e}")
+            return None, None
+        return metadata["lat"], metadata["lon"]
+
+    def dimensions(self):
+        metadata = self.metadata()
+        return metadata["width"], metadata["height"]
+
+    def image_format(self) -> Optional[str]:
+        return self.metadata()["format"]
+
+    def size(self) -> Optional[int]:
+        """Total size of the image in bytes, if known without downloading it."""
+        self.metadata()
+        with self._lock:
+            return self._size
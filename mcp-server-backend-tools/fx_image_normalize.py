@@ -0,0 +1,256 @@
+import json
+import os
+import sys
+import time
+import uuid
+from io import BytesIO
+from typing import Optional, Union, BinaryIO
+from PIL import Image, ImageFile, ImageOps
+from dotenv import load_dotenv
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image would not fit the per-request memory budget; the request is rejected instead of decoded."""
+
+
+class ImageNormalizationPolicy:
+    """
+    How an image is shrunk and re-encoded before it is sent to Content Understanding.
+
+    The image is decoded straight at reduced scale where the format allows it (JPEG draft mode),
+    resized so its long edge is at most max_long_edge, then encoded at each quality in quality_ladder
+    until the JPEG fits in target_bytes. If even the lowest quality is too large the long edge is cut
+    by a quarter and the ladder is tried again, down to min_long_edge. Categories listed in
+    grayscale_categories (text on signs and menus) are analyzed from a grayscale copy.
+
+    Before anything is decoded the header dimensions are checked against max_source_pixels and the memory
+    the decode itself would take (after any draft-mode reduction) against max_decode_bytes, so one huge
+    panorama is rejected up front instead of exhausting the container.
+    """
+
+    def __init__(self, max_long_edge: int = 2048, min_long_edge: int = 1024, target_bytes: int = 1024 * 1024,
+                 quality_ladder=(90, 85, 80, 70), draft_decode: bool = True, grayscale_categories=(),
+                 max_source_pixels: int = 100_000_000, max_decode_bytes: int = 256 * 1024 * 1024):
+        self.max_long_edge = max_long_edge
+        self.min_long_edge = min(min_long_edge, max_long_edge)
+        self.target_bytes = target_bytes
+        self.quality_ladder = tuple(quality_ladder) or (90,)
+        self.draft_decode = draft_decode
+        self.grayscale_categories = frozenset(grayscale_categories)
+        self.max_source_pixels = max_source_pixels
+        self.max_decode_bytes = max_decode_bytes
+
+    @classmethod
+    def from_env(cls):
+        # Load environment variables from .env file
+        load_dotenv()
+        return cls(
+            max_long_edge=int(os.getenv('IMG_CU_MAX_LONG_EDGE', '2048')),
+            min_long_edge=int(os.getenv('IMG_CU_MIN_LONG_EDGE', '1024')),
+            target_bytes=int(os.getenv('IMG_CU_TARGET_BYTES', str(1024 * 1024))),
+            quality_ladder=[int(q) for q in os.getenv('IMG_CU_QUALITY_LADDER', '90,85,80,70').split(',') if q.strip()],
+            draft_decode=os.getenv('IMG_CU_DRAFT_DECODE', 'true').lower() in ('1', 'true', 'yes'),
+            grayscale_categories=[c.strip() for c in os.getenv('IMG_CU_GRAYSCALE_CATEGORIES', '').split(',') if c.strip()],
+            max_source_pixels=int(os.getenv('IMG_MAX_SOURCE_PIXELS', '100000000')),
+            max_decode_bytes=int(os.getenv('IMG_MAX_DECODE_BYTES', str(256 * 1024 * 1024))),
+        )
+
+    def needs_normalization(self, width: int, height: int, size_bytes: Optional[int]) -> bool:
+        """True if an image already in a CU-readable format should still be shrunk before analysis."""
+        if max(width, height) > self.max_long_edge:
+            return True
+        return size_bytes is None or size_bytes > self.target_bytes
+
+    def draft_size(self, width: int, height: int):
+        """Size to request from Image.draft: the source scaled so its long edge is max_long_edge."""
+        long_edge = max(width, height)
+        return max(1, width * self.max_long_edge // long_edge), max(1, height * self.max_long_edge // long_edge)
+
+    def draft_scale(self, width: int, height: int, image_format: Optional[str]) -> int:
+        """The 1/2, 1/4 or 1/8 reduction libjpeg will decode at for this policy (1 when draft mode does not apply)."""
+        if not self.draft_decode or image_format != 'JPEG' or max(width, height) <= self.max_long_edge:
+            return 1
+        # Same choice Pillow's JpegImageFile.draft makes for the requested size
+        request_width, request_height = self.draft_size(width, height)
+        ratio = min(width // request_width, height // request_height)
+        for scale in (8, 4, 2):
+            if ratio >= scale:
+                return scale
+        return 1
+
+    def check_decode_budget(self, width: int, height: int, image_format: Optional[str], bands: int = 3):
+        """Raise ImageTooLargeError if decoding an image of this size would exceed the policy's memory ceiling."""
+        if width * height > self.max_source_pixels:
+            raise ImageTooLargeError(
+                f"Image too large: {width}x{height} is {width * height:,} pixels, the limit is {self.max_source_pixels:,}.")
+        scale = self.draft_scale(width, height, image_format)
+        decode_bytes = (width // scale) * (height // scale) * max(bands, 3)
+        if decode_bytes > self.max_decode_bytes:
+            raise ImageTooLargeError(
+                f"Image too large: decoding {width}x{height} {image_format or 'image'} needs about "
+                f"{decode_bytes // (1024 * 1024)} MiB, the limit is {self.max_decode_bytes // (1024 * 1024)} MiB.")
+
+    def describe(self) -> dict:
+        return {
+            "max_long_edge": self.max_long_edge,
+            "min_long_edge": self.min_long_edge,
+            "target_bytes": self.target_bytes,
+            "quality_ladder": list(self.quality_ladder),
+            "draft_decode": self.draft_decode,
+            "grayscale_categories": sorted(self.grayscale_categories),
+            "max_source_pixels": self.max_source_pixels,
+            "max_decode_bytes": self.max_decode_bytes,
+        }
+
+
+def img_normalize_for_cu(source: Union[bytes, BinaryIO], policy: Optional[ImageNormalizationPolicy] = None, grayscale: bool = False):
+    """
+    Decode, downscale and re-encode an image as the smallest JPEG the policy allows.
+
+    Returns (buffer, info): a BytesIO positioned at 0 ready for blb_upload_file_to_blob, and a dict with the
+    source and output dimensions, output size and the quality that was used.
+    """
+    policy = policy or ImageNormalizationPolicy.from_env()
+    # Set flag to handle corrupted image headers
+    ImageFile.LOAD_TRUNCATED_IMAGES = True
+    Image.ALLOW_INCORRECT_HEADERS = True
+    # Keep Pillow's own decompression-bomb check in line with the policy (it raises at twice this value)
+    Image.MAX_IMAGE_PIXELS = policy.max_source_pixels
+
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    source.seek(0)
+    # Image.open only parses the header, so the size is known before any pixels are decoded
+    try:
+        img = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(f"Image too large: {e}")
+    source_size = img.size
+    policy.check_decode_budget(img.size[0], img.size[1], img.format, len(img.getbands()))
+    if policy.draft_scale(img.size[0], img.size[1], img.format) > 1:
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale instead of inflating the full frame first
+        img.draft('L' if grayscale else 'RGB', policy.draft_size(img.size[0], img.size[1]))
+    # Phone photos are stored sideways with an orientation tag - bake it in before resizing
+    img = ImageOps.exif_transpose(img)
+
+    target_mode = 'L' if grayscale else 'RGB'
+    if img.mode != target_mode:
+        img = img.convert(target_mode)
+
+    long_edge = min(max(img.size), policy.max_long_edge)
+    best = None
+    while True:
+        if max(img.size) > long_edge:
+            img.thumbnail((long_edge, long_edge), Image.LANCZOS)
+        for quality in policy.quality_ladder:
+            output_buffer = BytesIO()
+            img.save(output_buffer, format='JPEG', quality=quality, optimize=True)
+            size_bytes = output_buffer.tell()
+            if best is None or size_bytes < best[1]:
+                best = (output_buffer, size_bytes, quality)
+            if size_bytes <= policy.target_bytes:
+                break
+        if best[1] <= policy.target_bytes or long_edge <= policy.min_long_edge:
+            break
+        long_edge = max(int(long_edge * 0.75), policy.min_long_edge)
+
+    output_buffer, size_bytes, quality = best
+    output_buffer.seek(0)
+    info = {
+        "source_width": source_size[0],
+        "source_height": source_size[1],
+        "width": img.size[0],
+        "height": img.size[1],
+        "bytes": size_bytes,
+        "quality": quality,
+        "grayscale": grayscale,
+    }
+    return output_buffer, info
+
+
+def img_benchmark_normalization(image_urls, analyzer_name: str, policies: dict, container_name: str = "directory-web-pages"):
+    """
+    Compare Content Understanding extraction on original images against normalized copies.
+
+    For each image the analyzer is run on the original URL and on a copy produced by every policy in
+    `policies` (name -> ImageNormalizationPolicy, or name -> (policy, grayscale)). A policy's accuracy is the
+    share of fields (or list entries) that come back identical to the original's, so a policy can be
+    judged on how much it shrinks uploads against how much it changes what the analyzer reads.
+    """
+    from fx_cu import cu_analyzer_main
+    from fx_blb import blb_upload_file_to_blob
+    from fx_image_fetch import ImageFetch
+
+    def agreement(baseline, candidate):
+        if isinstance(baseline, dict) and isinstance(candidate, dict):
+            keys = set(baseline) | set(candidate)
+            if not keys:
+                return 1.0
+            return sum(1 for k in keys if baseline.get(k) == candidate.get(k)) / len(keys)
+        if isinstance(baseline, list) and isinstance(candidate, list):
+            total = max(len(baseline), len(candidate))
+            if total == 0:
+                return 1.0
+            remaining = [json.dumps(item, sort_keys=True, default=str) for item in candidate]
+            matched = 0
+            for item in baseline:
+                key = json.dumps(item, sort_keys=True, default=str)
+                if key in remaining:
+                    remaining.remove(key)
+                    matched += 1
+            return matched / total
+        return 1.0 if baseline == candidate else 0.0
+
+    summary = {name: {"images": 0, "accuracy_total": 0.0, "bytes_total": 0, "source_bytes_total": 0, "cu_seconds_total": 0.0}
+               for name in policies}
+    for image_url in image_urls:
+        content = ImageFetch(image_url).content()
+        baseline = cu_analyzer_main(image_url, analyzer_name)
+        print(f"{image_url}: baseline = {baseline}")
+        for name, policy in policies.items():
+            policy, grayscale = policy if isinstance(policy, tuple) else (policy, False)
+            output_buffer, info = img_normalize_for_cu(content, policy, grayscale=grayscale)
+            normalized_url = blb_upload_file_to_blob(
+                file_path_or_stream=output_buffer,
+                container_name=container_name,
+                blob_name=f"benchmark/{uuid.uuid4()}.jpg"
+            )
+            started = time.monotonic()
+            candidate = cu_analyzer_main(normalized_url, analyzer_name)
+            cu_seconds = time.monotonic() - started
+            score = agreement(baseline, candidate)
+            print(f"  {name}: {info['width']}x{info['height']} q{info['quality']} {info['bytes']} bytes, "
+                  f"accuracy={score:.2f}, cu={cu_seconds:.1f}s")
+            stats = summary[name]
+            stats["images"] += 1
+            stats["accuracy_total"] += score
+            stats["bytes_total"] += info["bytes"]
+            stats["source_bytes_total"] += len(content)
+            stats["cu_seconds_total"] += cu_seconds
+
+    report = {}
+    for name, stats in summary.items():
+        images = stats["images"] or 1
+        report[name] = {
+            "images": stats["images"],
+            "accuracy": round(stats["accuracy_total"] / images, 3),
+            "avg_bytes": int(stats["bytes_total"] / images),
+            "size_ratio": round(stats["bytes_total"] / stats["source_bytes_total"], 3) if stats["source_bytes_total"] else None,
+            "avg_cu_seconds": round(stats["cu_seconds_total"] / images, 2),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    # python fx_image_normalize.py <analyzer-name> <image-url> [<image-url> ...]
+    analyzer_name = sys.argv[1]
+    image_urls = sys.argv[2:]
+    policies = {
+        "full_q95": ImageNormalizationPolicy(max_long_edge=100000, min_long_edge=100000, target_bytes=sys.maxsize, quality_ladder=(95,), draft_decode=False),
+        "env": ImageNormalizationPolicy.from_env(),
+        "2048_1mb": ImageNormalizationPolicy(max_long_edge=2048, target_bytes=1024 * 1024),
+        "1600_512kb": ImageNormalizationPolicy(max_long_edge=1600, min_long_edge=800, target_bytes=512 * 1024),
+        "1600_512kb_gray": (ImageNormalizationPolicy(max_long_edge=1600, min_long_edge=800, target_bytes=512 * 1024), True),
+        "1024_256kb": ImageNormalizationPolicy(max_long_edge=1024, min_long_edge=768, target_bytes=256 * 1024),
+    }
+    print(json.dumps(img_benchmark_normalization(image_urls, analyzer_name, policies), indent=2))
@@ -3,309 +3,115 @@ from fx_cu import cu_analyzer_main
 from fx_db import db_upsert_wifi_network_password, db_image_to_content_upsert, db_output_list_to_stage, db_create_new_business_from_image
 from fx_db import db_get_business_list_by_lat_lon, db_stage_wifi_data, db_get_venue_name, db_stage_hours_of_operation_data, db_stage_product_offering_data
 from fx_blb import blb_upload_file_to_blob, blb_get_blob_size
-from fx_utilities import get_gps_coordinates, get_street_address_from_lat_lon
+from fx_utilities import get_street_address_from_lat_lon
+from fx_image_fetch import ImageFetch
+from fx_image_normalize import ImageNormalizationPolicy, ImageTooLargeError
+from fx_image_workers import img_transcode
+from fx_image_dedup import img_get_dedup_index
+from fx_pipeline import StageGraph, PipelineStageError, PipelineShortCircuit
 import os
 from urllib.parse import urlparse
-from PIL import Image
-import requests
 from io import BytesIO
 import base64
-import tempfile
 import uuid
 from datetime import datetime
 
+# Category -> (analyzer that extracts its details, error returned when the analyzer gives nothing back)
+IMG_CATEGORY_ANALYZERS = {
+    "wifi_password": ("cu-wifi-password-analyzer", "Failed to extract WiFi password details."),
+    "hours_of_operation": ("cu-hours-of-operation", "Failed to extract hours of operation details."),
+    "tap_list": ("cu-tap-list-parser", "Failed to extract tap list details."),
+    "product_offerings": ("cu-product-offering-analyzer", "Failed to extract product offerings details."),
+}
+
 def img_initial_image_process_stream(image_stream: BytesIO, filename: Optional[str] = None, venue: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None):
     # Step 1 - Get Latitude and Longitude and classify the image
-    
-    venue_name = None
-    new_business_flag = None
-    full_address_string = None
-    business_name = None
-    establishment = None
-    
-    if venue is None:
-        if lat is None or lon is None:
-            # Note: GPS extraction from stream would require the stream to contain EXIF data
-            # This functionality may need to be implemented if GPS extraction from BytesIO is needed
-            print({"error": "GPS coordinates not provided and cannot extract from stream."})
-        else:
-            full_address_string = get_street_address_from_lat_lon(lat, lon)
-            print(f"Extracted GPS coordinates: Latitude={lat}, Longitude={lon}")
-    
-    if venue:
-        # If venue is provided, use it
-        print("Getting Venue Name......")
-        venue_name = db_get_venue_name(venue)
-        if venue_name:
-            new_business_flag = False
-            print(f"Using provided venue: {venue_name}")
+    if venue is None and (lat is None or lon is None):
+        # Note: GPS extraction from stream would require the stream to contain EXIF data
+        # This functionality may need to be implemented if GPS extraction from BytesIO is needed
+        print({"error": "GPS coordinates not provided and cannot extract from stream."})
 
-    # Handle image conversion and upload
-    try:
-        # Set flag to handle corrupted image headers
-        ImageFile.LOAD_TRUNCATED_IMAGES = True
-        Image.ALLOW_INCORRECT_HEADERS = True
-        Image.MAX_IMAGE_PIXELS = None
-        
-        # Reset stream position to beginning
-        image_stream.seek(0)
-        img = Image.open(image_stream)
-        
-        # Convert to RGB if necessary (for JPEG compatibility)
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-        
-        # Save as JPEG (most widely supported format)
-        output_buffer = BytesIO()
-        img.save(output_buffer, format='JPEG', quality=95)
-        output_buffer.seek(0)
-        
-        # Create a temporary file and upload to blob storage
-        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-            temp_file.write(output_buffer.getvalue())
-            temp_file_path = temp_file.name
+    normalization_policy = ImageNormalizationPolicy.from_env()
+    with_hash = img_get_dedup_index() is not None
 
-        # Upload to blob storage
+    # Handle image conversion and upload; returns (url, perceptual hash or None)
+    def prepare_image(_):
         try:
-            # Generate blob name from filename or use UUID
-            if filename:
-                original_name = os.path.splitext(filename)[0]
-                new_blob_name = f"{original_name}.jpg"
-            else:
-                new_blob_name = f"{str(uuid.uuid4())}.jpg"
-            
-            url = blb_upload_file_to_blob(
-                file_path_or_stream=temp_file_path,
-                container_name="directory-web-pages",
-                blob_name=new_blob_name
-            )
-            print(f"File converted and uploaded successfully. Blob URL: {url}")
-        except Exception as e:
-            print(f"Error: {e}")
-
-        # Clean up temporary file
-        os.unlink(temp_file_path)
-
-        # Use the blob URL as input
-        image_input = url
-    except Exception as e:
-        return {"error": f"Failed to process image stream: {str(e)}"}
-
-    # Get image category using the content understanding analyzer
-    cu_response = cu_analyzer_main(image_input, "cu-initial-image-analyzer")
-    if cu_response is None:
-        return {"error": "Failed to process image or extract initial information."}
-    
-    # Handle case where cu_response might be a string instead of dict
-    if isinstance(cu_response, str):
-        return {"error": f"CU analyzer returned string instead of dict: {cu_response}"}
-    
-    category = cu_response.get("class")
-    print(f"Image categorized as: {category}")
-
-    session_uid = str(uuid.uuid4())
+            # Downscale and re-encode (oversized images are rejected from their header before decoding) as the smallest JPEG the analyzers still read reliably
+            output_buffer, info = img_transcode(image_stream, normalization_policy, with_hash=with_hash)
+            print(f"Normalized image for CU: {info}")
 
-    # Step 2a - Analyze image according to category
-    if category is None:
-        return {"error": "Failed to determine image category."}
-    elif category == "wifi_password":
-        content_detail = cu_analyzer_main(image_input, "cu-wifi-password-analyzer")
-        if content_detail is None:
-            return {"error": "Failed to extract WiFi password details."}
-    elif category == "hours_of_operation":
-        content_detail = cu_analyzer_main(image_input, "cu-hours-of-operation")
-        if content_detail is None:
-            return {"error": "Failed to extract hours of operation details."}
-    elif category == "tap_list":
-        content_detail = cu_analyzer_main(image_input, "cu-tap-list-parser")
-        if content_detail is None:
-            return {"error": "Failed to extract tap list details."}
-    elif category == "product_offerings":
-        content_detail = cu_analyzer_main(image_input, "cu-product-offering-analyzer")
-        if content_detail is None:
-            return {"error": "Failed to extract product offerings details."}
-    elif category == "business_general":
-        # General business image - business type classification will happen for all, so not done here.
-        pass
+            # Upload the encoded buffer straight to blob storage - no temp file, no extra copy
+            try:
+                # Generate blob name from filename or use UUID
+                if filename:
+                    original_name = os.path.splitext(filename)[0]
+                    new_blob_name = f"{original_name}.jpg"
+                else:
+                    new_blob_name = f"{str(uuid.uuid4())}.jpg"
+                
+                url = blb_upload_file_to_blob(
+                    file_path_or_stream=output_buffer,
+                    container_name="directory-web-pages",
+                    blob_name=new_blob_name
+                )
+                print(f"File converted and uploaded successfully. Blob URL: {url}")
+            except Exception as e:
+                print(f"Error: {e}")
 
-    prod_list = []
-    venue_list = []
+            # Use the blob URL as input
+            return url, info.get("dhash")
+        except ImageTooLargeError as e:
+            raise PipelineStageError({"error": str(e), "status_code": 413})
+        except Exception as e:
+            raise PipelineStageError({"error": f"Failed to process image stream: {str(e)}"})
 
-    business_type = cu_analyzer_main(image_input, "cu-business-type-classifier")
-    if business_type is None:
-        return {"error": "Failed to classify business type."}
-    else:
-        business_type_string = business_type.get("business_type")
-        business_name = business_type.get("business_name")
-        print(f"Business type classified as: {business_type_string}")
-    
-    # Step 2b - If GPS coordinates are available and venue is none, find nearby venues
-    if lat is not None and lon is not None and venue is None:
-        radius_miles = .1  # default search radius
-        return_count = 3    # default number of results to return
-        print(f"inputs: {business_type_string}, {lat}, {lon}, {radius_miles}, {return_count}")
-        venue_list_data = db_get_business_list_by_lat_lon(business_type_string, lat, lon, radius_miles, return_count)
-        if venue_list_data is None and new_business_flag is None:
-            new_business_flag = True
-            venue_list = [{"venue": venue, "venue_name": venue_name}] if venue and 'venue_name' in locals() else []
-        elif venue_list_data:
-            new_business_flag = False
-            venue_list = [
-                {"venue": record.get("venue"), "venue_name": record.get("venue_name")}
-                for record in venue_list_data
-                if "venue" in record and "venue_name" in record
-            ] if venue_list_data else [{"venue": venue, "venue_name": venue_name}]
-        else:
-            new_business_flag = True
-
-    print(f"Nearby venues found: {venue_list}")
-    # Step 3 - Commit the gathered database data to Stage.
-
-    if category is None:
-        return {"error": "Failed to determine image category."}
-    elif category == "wifi_password":
-        wifi_network = content_detail.get("wifi_network")
-        wifi_password = content_detail.get("wifi_password")
-        print(f"wifi network and password: {wifi_network}, {wifi_password}")
-        if not venue_list:
-            return {"error": "No venues found to stage WiFi data."}
-        else:
-            stg_response = db_stage_wifi_data(session_uid, venue_list[0], wifi_network=wifi_network, wifi_password=wifi_password, content_url=image_input)
-    elif category == "hours_of_operation":
-        print(f"hours of operation: {content_detail}")
-        monday_summary = content_detail.get("monday_hours_summary")
-        monday_open = content_detail.get("monday_open_time")
-        monday_close = content_detail.get("monday_close_time")
-        tuesday_summary = content_detail.get("tuesday_hours_summary")
-        tuesday_open = content_detail.get("tuesday_open_time")
-        tuesday_close = content_detail.get("tuesday_close_time")
-        wednesday_summary = content_detail.get("wednesday_hours_summary")
-        wednesday_open = content_detail.get("wednesday_open_time")
-        wednesday_close = content_detail.get("wednesday_close_time")
-        thursday_summary = content_detail.get("thursday_hours_summary")
-        thursday_open = content_detail.get("thursday_open_time")
-        thursday_close = content_detail.get("thursday_close_time")
-        friday_summary = content_detail.get("friday_hours_summary")
-        friday_open = content_detail.get("friday_open_time")
-        friday_close = content_detail.get("friday_close_time")
-        saturday_summary = content_detail.get("saturday_hours_summary")
-        saturday_open = content_detail.get("saturday_open_time")
-        saturday_close = content_detail.get("saturday_close_time")
-        sunday_summary = content_detail.get("sunday_hours_summary")
-        sunday_open = content_detail.get("sunday_open_time")
-        sunday_close = content_detail.get("sunday_close_time")
-        start_date = content_detail.get("schedule_effective_start_date")
-        end_date = content_detail.get("schedule_effective_end_date")
-        
-        if not content_detail:
-            return {"error": "No content detail found to stage hours of operation data."}
-        else:
-            stg_response = db_stage_hours_of_operation_data(session_uid, venue,
-                monday_summary, monday_open, monday_close,
-                tuesday_summary, tuesday_open, tuesday_close,
-                wednesday_summary, wednesday_open, wednesday_close,
-                thursday_summary, thursday_open, thursday_close,
-                friday_summary, friday_open, friday_close,
-                saturday_summary, saturday_open, saturday_close,
-                sunday_summary, sunday_open, sunday_close,
-                start_date, end_date, image_input
-                )
-        print("placeholder")
-    elif category == "tap_list":
-        print("placeholder")
-    elif category == "product_offerings":
-        prod_list = extract_product_offering_list(content_detail) if 'content_detail' in locals() else None
-        if isinstance(prod_list, list):
-            prod_list = ', '.join(prod_list)
-        db_response = db_stage_product_offering_data(session_uid=session_uid, is_new_business=new_business_flag, business_name=business_name,
-                        business_type=business_type_string, latitude=lat, longitude=lon, full_address_string=full_address_string, venue=venue,
-                        product_list=prod_list, content_url=image_input, stage_datetime=datetime.now())
-        print(f"Extracted product offerings: {prod_list}")
-    elif category == "business_general":
-        # General business image - business type classification will happen for all, so not done here.
-        pass
-    
-    return {
-        "status": "Done",
-        "session_uid": session_uid,
-        "category": category,
-        "business_type": business_type,
-        "venue_list": venue_list,
-        "product_list": prod_list,
-        "content_detail": content_detail if 'content_detail' in locals() else None
-    }
+    return _img_run_pipeline(prepare_image, venue, lat, lon, load_image=lambda: image_stream, normalization_policy=normalization_policy)
 
 
 def img_initial_image_process(image_url: str, venue: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None):
-    # Step 1 - Get Latitude and Longitude and classify the image
-    
-    venue_name = None
-    new_business_flag = None
-    full_address_string = None
-    business_name = None
-    establishment = None
-    
-    if venue is None:
-        if lat is None or lon is None:
-            lat, lon = get_gps_coordinates(image_url)
-            if lat is None or lon is None:
-                print({"error": "Failed to extract GPS coordinates from image."})
-        else:
-            full_address_string = get_street_address_from_lat_lon(lat, lon)
-            print(f"Extracted GPS coordinates: Latitude={lat}, Longitude={lon}")
-    
-    if venue:
-        # If venue is provided, use it
-        print("Getting Venue Name......")
-        venue_name = db_get_venue_name(venue)
-        if venue_name:
-            new_business_flag = False
-            print(f"Using provided venue: {venue_name}")
-
-    # Check file extension and convert if necessary
+    # One fetch per run: the GPS lookup and the conversion share the same downloaded bytes
+    fetched_image = ImageFetch(image_url)
+    normalization_policy = ImageNormalizationPolicy.from_env()
+    with_hash = img_get_dedup_index() is not None
 
-    parsed_url = urlparse(image_url)
-    file_path = parsed_url.path
-    file_ext = os.path.splitext(file_path)[1].lower()
+    # Check file extension and convert if necessary; returns (url, perceptual hash or None)
+    def prepare_image(_):
+        parsed_url = urlparse(image_url)
+        file_path = parsed_url.path
+        file_ext = os.path.splitext(file_path)[1].lower()
 
-    if file_ext not in ['.jpg', '.jpeg', '.png', '.bmp', '.heif']:
+        blob_suffix = ""
+        if file_ext in ['.jpg', '.jpeg', '.png', '.bmp', '.heif']:
+            # Already readable by CU - only re-encode when it is larger than the policy allows
+            try:
+                width, height = fetched_image.dimensions()
+                if not normalization_policy.needs_normalization(width, height, fetched_image.size()):
+                    # Use the original image URL (not downloaded, so not hashed for duplicate detection)
+                    return image_url, None
+            except Exception as e:
+                print(f"Could not read image dimensions, using original image: {e}")
+                return image_url, None
+            # Keep the original blob intact when the normalized copy lands in the same container
+            blob_suffix = "-cu"
         try:
-            # Download the image
-            response = requests.get(image_url)
-            response.raise_for_status()
-            
-            # Open and convert the image
-            # Set flag to handle corrupted image headers
-            from PIL import ImageFile
-            ImageFile.LOAD_TRUNCATED_IMAGES = True
-            Image.ALLOW_INCORRECT_HEADERS = True
-            Image.MAX_IMAGE_PIXELS = None
-            
-            img = Image.open(BytesIO(response.content))
-            
-            # Convert to RGB if necessary (for JPEG compatibility)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            # Save as JPEG (most widely supported format)
-            output_buffer = BytesIO()
-            img.save(output_buffer, format='JPEG', quality=95)
-            output_buffer.seek(0)
-            
-            # Create a temporary file and upload to blob storage
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                temp_file.write(output_buffer.getvalue())
-                temp_file_path = temp_file.name
-
-            # Upload to blob storage
+            # Probe the header first so an oversized image is rejected before it is downloaded and decoded
+            width, height = fetched_image.dimensions()
+            normalization_policy.check_decode_budget(width, height, fetched_image.image_format())
+
+            # Downscale and re-encode as the smallest JPEG the analyzers still read reliably
+            output_buffer, info = img_transcode(fetched_image.content(), normalization_policy, with_hash=with_hash)
+            print(f"Normalized image for CU: {info}")
+
+            # Upload the encoded buffer straight to blob storage - no temp file, no extra copy
             try:
                 # Extract the original filename from the URL and change extension to .jpg
                 original_filename = os.path.basename(parsed_url.path)
                 original_name = os.path.splitext(original_filename)[0]
-                new_blob_name = f"{original_name}.jpg"
+                new_blob_name = f"{original_name}{blob_suffix}.jpg"
                 
                 url = blb_upload_file_to_blob(
-                    file_path_or_stream=temp_file_path,
+                    file_path_or_stream=output_buffer,
                     container_name="directory-web-pages",
                     blob_name=new_blob_name
                 )
@@ -313,91 +119,170 @@ def img_initial_image_process(image_url: str, venue: Optional[str] = None, lat:
             except Exception as e:
                 print(f"Error: {e}")
 
-            # Clean up temporary file
-            os.unlink(temp_file_path)
-
             # Use the blob URL as input
-            image_input = url
+            return url, info.get("dhash")
+        except ImageTooLargeError as e:
+            raise PipelineStageError({"error": str(e), "status_code": 413})
         except Exception as e:
-            return {"error": f"Failed to convert image format: {str(e)}"}
-    else:
-        # Use the original image URL
-        image_input = image_url
-
-    # Get image category using the content understanding analyzer
-    cu_response = cu_analyzer_main(image_input, "cu-initial-image-analyzer")
-    if cu_response is None:
-        return {"error": "Failed to process image or extract initial information."}
-    # print(f"CU Initial Image Processing Complete - {cu_response}")
-    
-    # Handle case where cu_response might be a string instead of dict
-    if isinstance(cu_response, str):
-        return {"error": f"CU analyzer returned string instead of dict: {cu_response}"}
-    
-    category = cu_response.get("class")
-    print(f"Image categorized as: {category}")
+            raise PipelineStageError({"error": f"Failed to convert image format: {str(e)}"})
 
-    session_uid = str(uuid.uuid4())
+    return _img_run_pipeline(prepare_image, venue, lat, lon, locate=fetched_image.gps, product_content_url=image_url,
+                              load_image=fetched_image.content, normalization_policy=normalization_policy)
 
-    # Step 2a - Analyze image according to category
-    if category is None:
-        return {"error": "Failed to determine image category."}
-    elif category == "wifi_password":
-        content_detail = cu_analyzer_main(image_input, "cu-wifi-password-analyzer")
-        if content_detail is None:
-            return {"error": "Failed to extract WiFi password details."}
-    elif category == "hours_of_operation":
-        content_detail = cu_analyzer_main(image_input, "cu-hours-of-operation")
-        if content_detail is None:
-            return {"error": "Failed to extract hours of operation details."}
-    elif category == "tap_list":
-        content_detail = cu_analyzer_main(image_input, "cu-tap-list-parser")
-        if content_detail is None:
-            return {"error": "Failed to extract tap list details."}
-    elif category == "product_offerings":
-        content_detail = cu_analyzer_main(image_input, "cu-product-offering-analyzer")
+
+def _img_run_pipeline(prepare_image, venue: Optional[str], lat: Optional[float], lon: Optional[float], locate=None, product_content_url: Optional[str] = None,
+                      load_image=None, normalization_policy: Optional[ImageNormalizationPolicy] = None):
+    # A near-duplicate of an image already processed for this venue / location reuses that session
+    dedup_index = img_get_dedup_index()
+    dedup = {"hash": None, "key": None}
+
+    def image_input_stage(deps):
+        image_url, dedup["hash"] = prepare_image(deps)
+        return image_url
+
+    def duplicate_stage(_):
+        # The hash was computed on the transcode pool from the normalized image, so nothing is downloaded or
+        # decoded here; an image handed to CU unchanged has no hash and is never treated as a duplicate
+        try:
+            dedup["key"] = dedup_index.key_for(dedup["hash"], venue, lat, lon, locate)
+        except Exception as e:
+            print(f"Could not scope image for duplicate detection: {e}")
+        previous_result = dedup_index.lookup(dedup["key"]) if dedup["key"] else None
+        if previous_result is not None:
+            previous_result["duplicate"] = True
+            raise PipelineShortCircuit(previous_result)
+        return None
+
+    # Stages only wait on what they actually need: location, venue name and image upload start together,
+    # and once the image is ready the classifier and business type classifier run side by side.
+    def location_stage(_):
+        stage_lat, stage_lon, full_address_string = lat, lon, None
+        if venue is None:
+            if stage_lat is None or stage_lon is None:
+                if locate is not None:
+                    stage_lat, stage_lon = locate()
+                    if stage_lat is None or stage_lon is None:
+                        print({"error": "Failed to extract GPS coordinates from image."})
+            else:
+                full_address_string = get_street_address_from_lat_lon(stage_lat, stage_lon)
+                print(f"Extracted GPS coordinates: Latitude={stage_lat}, Longitude={stage_lon}")
+        return stage_lat, stage_lon, full_address_string
+
+    def venue_name_stage(_):
+        if not venue:
+            return None
+        # If venue is provided, use it
+        print("Getting Venue Name......")
+        venue_name = db_get_venue_name(venue)
+        if venue_name:
+            print(f"Using provided venue: {venue_name}")
+        return venue_name
+
+    def classify_stage(deps):
+        # Get image category using the content understanding analyzer
+        cu_response = cu_analyzer_main(deps["image_input"], "cu-initial-image-analyzer")
+        if cu_response is None:
+            raise PipelineStageError({"error": "Failed to process image or extract initial information."})
+        # Handle case where cu_response might be a string instead of dict
+        if isinstance(cu_response, str):
+            raise PipelineStageError({"error": f"CU analyzer returned string instead of dict: {cu_response}"})
+        category = cu_response.get("class")
+        print(f"Image categorized as: {category}")
+        if category is None:
+            raise PipelineStageError({"error": "Failed to determine image category."})
+        return category
+
+    def content_detail_stage(deps):
+        # Step 2a - Analyze image according to category
+        analyzer_name, error_message = IMG_CATEGORY_ANALYZERS.get(deps["classify"], (None, None))
+        if analyzer_name is None:
+            # General business image - business type classification will happen for all, so not done here.
+            return None
+        detail_input = deps["image_input"]
+        if load_image is not None and normalization_policy is not None and deps["classify"] in normalization_policy.grayscale_categories:
+            # Text-heavy categories are read from a smaller grayscale copy
+            try:
+                output_buffer, info = img_transcode(load_image(), normalization_policy, grayscale=True)
+                detail_input = blb_upload_file_to_blob(
+                    file_path_or_stream=output_buffer,
+                    container_name="directory-web-pages",
+                    blob_name=f"{str(uuid.uuid4())}-gray.jpg"
+                )
+                print(f"Analyzing grayscale copy for {deps['classify']}: {info}")
+            except Exception as e:
+                print(f"Grayscale copy failed, analyzing original image: {e}")
+        content_detail = cu_analyzer_main(detail_input, analyzer_name)
         if content_detail is None:
-            return {"error": "Failed to extract product offerings details."}
-    elif category == "business_general":
-        # General business image - business type classification will happen for all, so not done here.
-        pass
+            raise PipelineStageError({"error": error_message})
+        return content_detail
 
-    prod_list = []
-    venue_list = []
+    def business_type_stage(deps):
+        business_type = cu_analyzer_main(deps["image_input"], "cu-business-type-classifier")
+        if business_type is None:
+            raise PipelineStageError({"error": "Failed to classify business type."})
+        print(f"Business type classified as: {business_type.get('business_type')}")
+        return business_type
 
-    business_type = cu_analyzer_main(image_input, "cu-business-type-classifier")
-    if business_type is None:
-        return {"error": "Failed to classify business type."}
-    else:
-        business_type_string = business_type.get("business_type")
-        business_name = business_type.get("business_name")
-        print(f"Business type classified as: {business_type_string}")
-    
-    # Step 2b - If GPS coordinates are available and venue is none, find nearby venues
-    if lat is not None and lon is not None and venue is None:
+    def nearby_venues_stage(deps):
+        # Step 2b - If GPS coordinates are available and venue is none, find nearby venues
+        stage_lat, stage_lon, _ = deps["location"]
+        if stage_lat is None or stage_lon is None or venue is not None:
+            return None
+        business_type_string = deps["business_type"].get("business_type")
         radius_miles = .1  # default search radius
         return_count = 3    # default number of results to return
-        print(f"inputs: {business_type_string}, {lat}, {lon}, {radius_miles}, {return_count}")
-        venue_list_data = db_get_business_list_by_lat_lon(business_type_string, lat, lon, radius_miles, return_count)
-        if venue_list_data is None and new_business_flag is None:
-            new_business_flag = True
-            venue_list = [{"venue": venue, "venue_name": venue_name}] if venue and 'venue_name' in locals() else []
+        print(f"inputs: {business_type_string}, {stage_lat}, {stage_lon}, {radius_miles}, {return_count}")
+        venue_list_data = db_get_business_list_by_lat_lon(business_type_string, stage_lat, stage_lon, radius_miles, return_count)
+        if venue_list_data is None:
+            return [], True
         elif venue_list_data:
-            new_business_flag = False
             venue_list = [
                 {"venue": record.get("venue"), "venue_name": record.get("venue_name")}
                 for record in venue_list_data
                 if "venue" in record and "venue_name" in record
-            ] if venue_list_data else [{"venue": venue, "venue_name": venue_name}]
+            ]
+            return venue_list, False
         else:
-            new_business_flag = True
+            return [], True
+
+    graph = StageGraph()
+    graph.add("location", location_stage)
+    graph.add("venue_name", venue_name_stage)
+    graph.add("image_input", image_input_stage)
+    image_deps = ["image_input"]
+    if dedup_index is not None:
+        # The CU analyzers wait for the duplicate check so a hit does not pay for them
+        graph.add("duplicate", duplicate_stage, deps=["image_input"])
+        image_deps.append("duplicate")
+    graph.add("classify", classify_stage, deps=image_deps)
+    graph.add("content_detail", content_detail_stage, deps=["image_input", "classify"])
+    graph.add("business_type", business_type_stage, deps=image_deps)
+    graph.add("nearby_venues", nearby_venues_stage, deps=["location", "business_type"])
+    results, errors = graph.run()
+    if results.get("duplicate") is not None:
+        return results["duplicate"]
+    if errors:
+        return next(iter(errors.values()))
+
+    lat, lon, full_address_string = results["location"]
+    image_input = results["image_input"]
+    category = results["classify"]
+    content_detail = results["content_detail"]
+    business_type = results["business_type"]
+    business_type_string = business_type.get("business_type")
+    business_name = business_type.get("business_name")
+
+    new_business_flag = False if results["venue_name"] else None
+    venue_list = []
+    if results["nearby_venues"] is not None:
+        venue_list, new_business_flag = results["nearby_venues"]
 
     print(f"Nearby venues found: {venue_list}")
-    # Step 3 - Commit the gathered database data to Stage.
+    session_uid = str(uuid.uuid4())
+    prod_list = []
 
-    if category is None:
-        return {"error": "Failed to determine image category."}
-    elif category == "wifi_password":
+    # Step 3 - Commit the gathered database data to Stage.
+    if category == "wifi_password":
         wifi_network = content_detail.get("wifi_network")
         wifi_password = content_detail.get("wifi_password")
         print(f"wifi network and password: {wifi_network}, {wifi_password}")
@@ -448,26 +333,29 @@ def img_initial_image_process(image_url: str, venue: Optional[str] = None, lat:
     elif category == "tap_list":
         print("placeholder")
     elif category == "product_offerings":
-        prod_list = extract_product_offering_list(content_detail) if 'content_detail' in locals() else None
+        prod_list = extract_product_offering_list(content_detail)
         if isinstance(prod_list, list):
             prod_list = ', '.join(prod_list)
         db_response = db_stage_product_offering_data(session_uid=session_uid, is_new_business=new_business_flag, business_name=business_name,
                         business_type=business_type_string, latitude=lat, longitude=lon, full_address_string=full_address_string, venue=venue,
-                        product_list=prod_list, content_url=image_url, stage_datetime=datetime.now())
+                        product_list=prod_list, content_url=product_content_url or image_input, stage_datetime=datetime.now())
         print(f"Extracted product offerings: {prod_list}")
     elif category == "business_general":
         # General business image - business type classification will happen for all, so not done here.
         pass
     
-    return {
+    result = {
         "status": "Done",
         "session_uid": session_uid,
         "category": category,
         "business_type": business_type,
         "venue_list": venue_list,
         "product_list": prod_list,
-        "content_detail": content_detail if 'content_detail' in locals() else None
+        "content_detail": content_detail
     }
+    if dedup["key"]:
+        dedup_index.record(dedup["key"], result)
+    return result
 
 def extract_product_offering_list(cu_response):
     found_items = []
@@ -0,0 +1,233 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Optional, Union, BinaryIO
+from dotenv import load_dotenv
+from fx_image_normalize import ImageNormalizationPolicy, img_normalize_for_cu
+from fx_image_dedup import img_dhash
+
+
+def _transcode_worker_init(memory_limit_bytes: Optional[int]):
+    # Runs once in each worker process
+    from PIL import Image, ImageFile
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    ImageFile.LOAD_TRUNCATED_IMAGES = True
+    Image.ALLOW_INCORRECT_HEADERS = True
+    if memory_limit_bytes:
+        # A worker runs one task at a time, so its address-space limit is the per-task ceiling:
+        # a decode that would exceed it fails with MemoryError instead of starving the API process
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        except (ImportError, ValueError, OSError) as e:
+            print(f"Could not set transcode worker memory limit: {e}")
+
+def _transcode(source, policy: ImageNormalizationPolicy, grayscale: bool, with_hash: bool):
+    output_buffer, info = img_normalize_for_cu(source, policy, grayscale=grayscale)
+    if with_hash:
+        # Hash the normalized JPEG rather than the upload: it is already small, so the extra decode is cheap
+        info["dhash"] = img_dhash(output_buffer.getvalue())
+    return output_buffer, info
+
+def _transcode_worker(data: bytes, policy: ImageNormalizationPolicy, grayscale: bool, with_hash: bool):
+    output_buffer, info = _transcode(BytesIO(data), policy, grayscale, with_hash)
+    return output_buffer.getvalue(), info
+
+
+class ImageTranscodePool:
+    """
+    Bounded process pool for CPU-bound image decoding and JPEG encoding (HEIC in particular).
+
+    Running the transcode in separate processes lets a burst of uploads use every core instead of
+    serialising on the GIL in the request threads. At most max_pending transcodes may be queued or
+    running; callers beyond that wait up to queue_timeout seconds for a slot. Each worker is capped at
+    memory_limit_bytes and replaced after max_tasks_per_child tasks so fragmented heaps are returned
+    to the OS.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8, queue_timeout: float = 30.0,
+                 memory_limit_bytes: Optional[int] = None, max_tasks_per_child: Optional[int] = 50,
+                 start_method: str = "spawn"):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.memory_limit_bytes = memory_limit_bytes
+        self.max_tasks_per_child = max_tasks_per_child
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stats = {
+            "waiting": 0,
+            "in_flight": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "worker_crashes": 0,
+            "run_ms_total": 0.0,
+            "run_ms_max": 0.0,
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_transcode_worker_init,
+                    initargs=(self.memory_limit_bytes,),
+                    max_tasks_per_child=self.max_tasks_per_child,
+                )
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self._stats["worker_crashes"] += 1
+        broken.shutdown(wait=False)
+
+    def transcode(self, source: Union[bytes, BinaryIO], policy: ImageNormalizationPolicy, grayscale: bool = False, with_hash: bool = False):
+        with self._lock:
+            self._stats["waiting"] += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self._stats["waiting"] -= 1
+            if not acquired:
+                self._stats["rejected"] += 1
+        if not acquired:
+            raise TimeoutError(f"Timed out after {self.queue_timeout}s waiting for an image transcode slot")
+
+        started = time.monotonic()
+        failed = False
+        try:
+            with self._lock:
+                self._stats["in_flight"] += 1
+            # The source goes to the worker as plain pickled bytes through the pool's pipe rather than a
+            # shared-memory segment: /dev/shm is often a 64 MiB tmpfs, and overfilling it kills this process
+            # with SIGBUS, while a queued submission only holds a reference to bytes already in memory
+            if isinstance(source, bytes):
+                data = source
+            elif isinstance(source, (bytearray, memoryview)):
+                data = bytes(source)
+            elif isinstance(source, BytesIO):
+                data = source.getvalue()
+            else:
+                source.seek(0)
+                data = source.read()
+
+            executor = self._get_executor()
+            try:
+                output_bytes, info = executor.submit(_transcode_worker, data, policy, grayscale, with_hash).result()
+            except BrokenProcessPool:
+                self._reset_executor(executor)
+                raise MemoryError("Image transcode worker died - the image is probably too large to decode within the worker memory limit")
+            return BytesIO(output_bytes), info
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._slots.release()
+            run_ms = (time.monotonic() - started) * 1000
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats["failed" if failed else "completed"] += 1
+                self._stats["run_ms_total"] += run_ms
+                self._stats["run_ms_max"] = max(self._stats["run_ms_max"], run_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_workers"] = self.max_workers
+        stats["max_pending"] = self.max_pending
+        # Work handed to the pool beyond what the workers can run right now is sitting in its queue
+        stats["queued"] = max(0, stats["in_flight"] - self.max_workers)
+        finished = stats["completed"] + stats["failed"]
+        stats["run_ms_avg"] = round(stats["run_ms_total"] / finished, 3) if finished else 0.0
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _img_available_cpus() -> float:
+    """CPUs this container may actually use: the cgroup CPU quota when one is set, otherwise os.cpu_count()."""
+    # os.cpu_count() reports the host's cores, not the 0.5 vCPU a container app is given
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0 and period > 0:
+                return quota / period
+        except (OSError, ValueError):
+            pass
+    return float(os.cpu_count() or 1)
+
+
+_transcode_pool = None
+_transcode_pool_initialized = False
+_transcode_pool_lock = threading.Lock()
+
+def img_get_transcode_pool() -> Optional[ImageTranscodePool]:
+    """Returns the shared transcode pool, or None when IMG_TRANSCODE_WORKERS is 0 (transcode in-thread)."""
+    global _transcode_pool, _transcode_pool_initialized
+    if not _transcode_pool_initialized:
+        with _transcode_pool_lock:
+            if not _transcode_pool_initialized:
+                # Load environment variables from .env file
+                load_dotenv()
+                # One worker per whole CPU the container is allowed, at least one and at most four
+                default_workers = min(4, max(1, int(_img_available_cpus())))
+                max_workers = int(os.getenv('IMG_TRANSCODE_WORKERS', str(default_workers)))
+                if max_workers > 0:
+                    # Address-space ceiling per worker: room for the 256 MiB decode budget plus the interpreter,
+                    # Pillow/libheif and their allocator arenas; 0 turns it off
+                    memory_limit_mb = int(os.getenv('IMG_TRANSCODE_MEMORY_LIMIT_MB', '768'))
+                    max_tasks_per_child = int(os.getenv('IMG_TRANSCODE_MAX_TASKS_PER_CHILD', '50'))
+                    _transcode_pool = ImageTranscodePool(
+                        max_workers=max_workers,
+                        max_pending=int(os.getenv('IMG_TRANSCODE_MAX_PENDING', str(max_workers * 4))),
+                        queue_timeout=float(os.getenv('IMG_TRANSCODE_QUEUE_TIMEOUT_SECONDS', '30')),
+                        memory_limit_bytes=memory_limit_mb * 1024 * 1024 if memory_limit_mb > 0 else None,
+                        max_tasks_per_child=max_tasks_per_child if max_tasks_per_child > 0 else None,
+                        start_method=os.getenv('IMG_TRANSCODE_START_METHOD', 'spawn'),
+                    )
+                _transcode_pool_initialized = True
+    return _transcode_pool
+
+def img_transcode(source: Union[bytes, BinaryIO], policy: Optional[ImageNormalizationPolicy] = None, grayscale: bool = False,
+                  with_hash: bool = False):
+    """
+    Same contract as img_normalize_for_cu, but runs on the transcode process pool when one is configured.
+    With with_hash, info also carries "dhash", the perceptual hash of the normalized output.
+    """
+    policy = policy or ImageNormalizationPolicy.from_env()
+    pool = img_get_transcode_pool()
+    if pool is None:
+        return _transcode(source, policy, grayscale, with_hash)
+    return pool.transcode(source, policy, grayscale=grayscale, with_hash=with_hash)
+
+def img_get_transcode_stats() -> dict:
+    pool = img_get_transcode_pool()
+    if pool is None:
+        return {"enabled": False}
+    stats = pool.stats()
+    stats["enabled"] = True
+    return stats
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from dotenv import load_dotenv
+
+
+class JobStore(ABC):
+    """
+    Storage interface for background job records.
+
+    A job record is a plain dict with job_id, job_type, status, submitted/started/finished
+    timestamps, result and error. Subclass this to keep jobs somewhere other than process
+    memory (e.g. a database table or a shared cache) and install it with job_set_store().
+    """
+
+    @abstractmethod
+    def create(self, job: dict) -> None:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def count_by_status(self) -> dict:
+        ...
+
+
+class InMemoryJobStore(JobStore):
+    """Keeps job records in a dict; finished jobs are dropped after ttl_seconds."""
+
+    def __init__(self, ttl_seconds: float = 3600.0):
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _purge_expired_locked(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.get("finished_at") is not None and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def create(self, job: dict) -> None:
+        with self._lock:
+            self._purge_expired_locked()
+            self._jobs[job["job_id"]] = dict(job)
+
+    def update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            self._purge_expired_locked()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def count_by_status(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+
+class JobRunner:
+    """
+    Runs submitted callables on a bounded worker pool and records their progress in a JobStore.
+
+    At most max_workers jobs execute at once and at most max_pending jobs may be queued or
+    running; submissions beyond that are rejected so a burst of uploads cannot pile up
+    unbounded work behind the pool.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = 4, max_pending: int = 50):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, job_type: str, fn: Callable, *args, **kwargs) -> Optional[dict]:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "job_type": job_type,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self.store.create(job)
+        try:
+            self._executor.submit(self._run, job_id, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            self.store.update(job_id, status="failed", error="Job could not be scheduled.", finished_at=time.time())
+            raise
+        return job
+
+    def _run(self, job_id: str, fn: Callable, args: tuple, kwargs: dict):
+        self.store.update(job_id, status="running", started_at=time.time())
+        try:
+            result = fn(*args, **kwargs)
+            # Pipeline functions report failure by returning {"error": ...} rather than raising
+            if isinstance(result, dict) and "error" in result:
+                self.store.update(job_id, status="failed", result=result, error=result.get("error"), finished_at=time.time())
+            else:
+                self.store.update(job_id, status="succeeded", result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self.store.update(job_id, status="failed", error=str(e), finished_at=time.time())
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+_job_store = None
+
+def job_set_store(store: JobStore):
+    """Install a JobStore before the first submission; later calls do not affect a running pool."""
+    global _job_store
+    _job_store = store
+
+def job_get_runner() -> JobRunner:
+    global _job_runner
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                store = _job_store or InMemoryJobStore(ttl_seconds=float(os.getenv('JOB_RESULT_TTL_SECONDS', '3600')))
+                _job_runner = JobRunner(
+                    store,
+                    max_workers=int(os.getenv('JOB_MAX_WORKERS', '4')),
+                    max_pending=int(os.getenv('JOB_MAX_PENDING', '50')),
+                )
+    return _job_runner
+
+def job_submit(job_type: str, fn: Callable, *args, **kwargs) -> dict:
+    job = job_get_runner().submit(job_type, fn, *args, **kwargs)
+    if job is None:
+        return {"error": "Too many jobs in progress. Try again later.", "status_code": 429}
+    return {"job_id": job["job_id"], "status": job["status"]}
+
+def job_get_status(job_id: str) -> dict:
+    job = job_get_runner().store.get(job_id)
+    if job is None:
+        return {"error": f"Job not found: {job_id}", "status_code": 404}
+    return {
+        "job_id": job["job_id"],
+        "job_type": job["job_type"],
+        "status": job["status"],
+        "submitted_at": job["submitted_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+    }
+
+def job_get_result(job_id: str) -> dict:
+    job = job_get_runner().store.get(job_id)
+    if job is None:
+        return {"error": f"Job not found: {job_id}", "status_code": 404}
+    if job["status"] in ("queued", "running"):
+        return {"job_id": job_id, "status": job["status"]}
+    return {"job_id": job_id, "status": job["status"], "result": job["result"], "error": job["error"]}
+
+def job_get_stats() -> dict:
+    runner = job_get_runner()
+    return {
+        "max_workers": runner.max_workers,
+        "max_pending": runner.max_pending,
+        "pending": runner.pending(),
+        "jobs_by_status": runner.store.count_by_status(),
+    }
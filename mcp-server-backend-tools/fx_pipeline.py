@@ -0,0 +1,104 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Optional
+from dotenv import load_dotenv
+
+
+class PipelineStageError(Exception):
+    """Raised by a stage to stop the pipeline with an {"error": ...} response instead of a traceback."""
+
+    def __init__(self, error):
+        if isinstance(error, str):
+            error = {"error": error}
+        super().__init__(error.get("error"))
+        self.error = error
+
+
+class PipelineShortCircuit(Exception):
+    """Raised by a stage that already has the pipeline's final answer (e.g. a stored result); stages not yet started are skipped."""
+
+    def __init__(self, result):
+        super().__init__("Pipeline short-circuited")
+        self.result = result
+
+
+class StageGraph:
+    """
+    Runs a set of dependent pipeline stages, starting each one as soon as the stages it depends on have finished.
+
+    Stages are added in order with add(name, fn, deps). Each fn is called with a dict holding the results of its
+    dependencies, so independent stages (e.g. two Content Understanding analyzers on the same image, or a
+    reverse geocode and a DB lookup) run at the same time on the shared pipeline pool. If a stage raises,
+    everything downstream of it is skipped and the error is reported by run(). A stage that raises
+    PipelineShortCircuit ends the run early: its result is recorded and no further stages are started.
+    """
+
+    def __init__(self):
+        self._stages = {}
+
+    def add(self, name: str, fn: Callable[[dict], object], deps: Iterable[str] = ()):
+        deps = tuple(deps)
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        if name in self._stages:
+            raise ValueError(f"Stage '{name}' already added")
+        self._stages[name] = (fn, deps)
+        return self
+
+    def run(self, executor: Optional[ThreadPoolExecutor] = None):
+        """
+        Returns (results, errors): stage name -> return value for stages that completed, and
+        stage name -> {"error": ...} for stages that failed, in the order the stages were added.
+        Stages skipped because an upstream stage failed appear in neither.
+        """
+        executor = executor or pipeline_get_executor()
+        results = {}
+        errors = {}
+        skipped = set()
+        pending = dict(self._stages)
+        running = {}
+        while pending or running:
+            for name, (fn, deps) in list(pending.items()):
+                if any(dep in errors or dep in skipped for dep in deps):
+                    skipped.add(name)
+                    del pending[name]
+                elif all(dep in results for dep in deps):
+                    running[executor.submit(fn, {dep: results[dep] for dep in deps})] = name
+                    del pending[name]
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except PipelineShortCircuit as e:
+                    results[name] = e.result
+                    skipped.update(pending)
+                    pending.clear()
+                except PipelineStageError as e:
+                    errors[name] = e.error
+                except Exception as e:
+                    print(f"Pipeline stage '{name}' failed: {e}")
+                    errors[name] = {"error": f"Pipeline stage '{name}' failed: {str(e)}"}
+        ordered_errors = {name: errors[name] for name in self._stages if name in errors}
+        return results, ordered_errors
+
+
+_pipeline_executor = None
+_pipeline_executor_lock = threading.Lock()
+
+def pipeline_get_executor() -> ThreadPoolExecutor:
+    global _pipeline_executor
+    if _pipeline_executor is None:
+        with _pipeline_executor_lock:
+            if _pipeline_executor is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                _pipeline_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('PIPELINE_MAX_WORKERS', '16')),
+                    thread_name_prefix="pipeline-stage",
+                )
+    return _pipeline_executor
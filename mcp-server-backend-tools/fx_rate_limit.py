@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+from dotenv import load_dotenv
+
+# Requests per second and burst size for each external provider, overridable with
+# RATE_LIMIT_<PROVIDER>_PER_SECOND and RATE_LIMIT_<PROVIDER>_BURST
+_RATE_LIMIT_DEFAULTS = {
+    # Nominatim's usage policy allows at most one request per second per application
+    "nominatim": (1.0, 1),
+    "opencorporates": (0.5, 2),
+}
+
+
+class RateLimitedError(Exception):
+    """Raised by a provider call when the provider answered 429 / rate limited."""
+
+    def __init__(self, provider: str, retry_after: Optional[float] = None):
+        super().__init__(f"{provider} rate limit exceeded" + (f", retry after {retry_after}s" if retry_after else ""))
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either delta-seconds or an HTTP date; only the former is worth honouring here
+    if value and value.strip().isdigit():
+        return float(value.strip())
+    return None
+
+
+class ProviderRateLimiter:
+    """
+    Token bucket shared by every thread that calls one external provider, with request coalescing.
+
+    acquire() hands out rate_per_second tokens with up to burst saved up, so parallel ingestion runs at
+    the provider's ceiling instead of bursting into 429s. call() also coalesces: while a lookup for a key
+    is in flight, other callers asking for the same key wait for that call's result instead of spending
+    a token of their own. When the provider still throttles (RateLimitedError), the whole bucket is
+    paused for Retry-After (or an exponential backoff) before the call is retried, up to max_retries times.
+    """
+
+    def __init__(self, name: str, rate_per_second: float, burst: int = 1, max_retries: int = 3, backoff_seconds: float = 2.0):
+        self.name = name
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, burst)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "coalesced": 0,
+            "throttled": 0,
+            "failed": 0,
+            "waiting": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+
+    def acquire(self):
+        """Blocks until a token is available."""
+        started = time.monotonic()
+        with self._lock:
+            self._stats["waiting"] += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+                    self._updated = now
+                    if now < self._paused_until:
+                        delay = self._paused_until - now
+                    elif self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    else:
+                        delay = (1 - self._tokens) / self.rate_per_second
+                time.sleep(delay)
+        finally:
+            wait_ms = (time.monotonic() - started) * 1000
+            with self._lock:
+                self._stats["waiting"] -= 1
+                self._stats["wait_ms_total"] += wait_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+
+    def throttled(self, retry_after: Optional[float] = None, attempt: int = 0):
+        """Stops every caller for retry_after seconds (or the backoff for this attempt) after a 429."""
+        delay = retry_after if retry_after is not None else self.backoff_seconds * (2 ** attempt)
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._tokens = 0.0
+            self._stats["throttled"] += 1
+        print(f"{self.name} is throttling requests, pausing for {delay:.1f}s")
+
+    def _call_with_retries(self, fn: Callable, args: tuple, kwargs: dict):
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                return fn(*args, **kwargs)
+            except RateLimitedError as e:
+                if attempt >= self.max_retries:
+                    raise
+                self.throttled(e.retry_after, attempt)
+                attempt += 1
+
+    def call(self, key, fn: Callable, *args, **kwargs):
+        """Runs fn at the allowed rate, sharing the result with concurrent callers that pass the same key."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+                self._stats["calls"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not owner:
+            return future.result()
+        try:
+            result = self._call_with_retries(fn, args, kwargs)
+        except Exception as e:
+            with self._lock:
+                self._stats["failed"] += 1
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._in_flight)
+            stats["paused_seconds"] = round(max(0.0, self._paused_until - time.monotonic()), 3)
+        stats["rate_per_second"] = self.rate_per_second
+        stats["burst"] = self.burst
+        acquired = stats["calls"] + stats["throttled"]
+        stats["wait_ms_avg"] = round(stats["wait_ms_total"] / acquired, 3) if acquired else 0.0
+        return stats
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider: str) -> ProviderRateLimiter:
+    """Returns the process-wide limiter for an external provider, e.g. "nominatim" or "opencorporates"."""
+    limiter = _rate_limiters.get(provider)
+    if limiter is None:
+        with _rate_limiters_lock:
+            limiter = _rate_limiters.get(provider)
+            if limiter is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                default_rate, default_burst = _RATE_LIMIT_DEFAULTS.get(provider, (1.0, 1))
+                prefix = f"RATE_LIMIT_{provider.upper()}"
+                limiter = ProviderRateLimiter(
+                    provider,
+                    rate_per_second=float(os.getenv(f"{prefix}_PER_SECOND", str(default_rate))),
+                    burst=int(os.getenv(f"{prefix}_BURST", str(default_burst))),
+                    max_retries=int(os.getenv('RATE_LIMIT_MAX_RETRIES', '3')),
+                    backoff_seconds=float(os.getenv('RATE_LIMIT_BACKOFF_SECONDS', '2')),
+                )
+                _rate_limiters[provider] = limiter
+    return limiter
+
+def get_rate_limiter_stats() -> dict:
+    with _rate_limiters_lock:
+        limiters = dict(_rate_limiters)
+    return {provider: limiter.stats() for provider, limiter in limiters.items()}
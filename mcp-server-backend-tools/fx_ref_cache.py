@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Optional, TypeVar
+from dotenv import load_dotenv
+
+V = TypeVar("V")
+_REF_CACHE_MISSING = object()
+
+
+class ReferenceDataCache(Generic[V]):
+    """
+    Read-through cache for small, slowly changing reference lookups (venue names, business types, ...).
+
+    get(key, loader) returns the cached value while it is younger than ttl_seconds and otherwise calls
+    loader(key) and keeps what it returns, including None for "not found". Exceptions from the loader are
+    not cached, so a failed query is retried on the next call. The functions that write the underlying
+    rows call invalidate() so their own process never serves a stale value; other processes see the
+    change once the TTL expires. At most max_entries keys are kept, least recently used first out.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float = 300.0, max_entries: int = 10000):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, loaded_at)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def _lookup_locked(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _REF_CACHE_MISSING
+        value, loaded_at = entry
+        if time.monotonic() - loaded_at > self.ttl_seconds:
+            del self._entries[key]
+            return _REF_CACHE_MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, loader: Callable[[Hashable], V]) -> V:
+        with self._lock:
+            value = self._lookup_locked(key)
+            self._stats["misses" if value is _REF_CACHE_MISSING else "hits"] += 1
+        if value is not _REF_CACHE_MISSING:
+            return value
+        value = loader(key)
+        self.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: V):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: Hashable = None):
+        """Drops one key, or every key when called without one."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+
+_ref_caches: Dict[str, ReferenceDataCache] = {}
+_ref_caches_lock = threading.Lock()
+
+def get_ref_cache(name: str) -> ReferenceDataCache:
+    """
+    Returns the named process-wide cache. REF_CACHE_TTL_SECONDS sets the default TTL and
+    REF_CACHE_<NAME>_TTL_SECONDS overrides it for one cache; a TTL of 0 turns caching off.
+    """
+    cache = _ref_caches.get(name)
+    if cache is None:
+        with _ref_caches_lock:
+            cache = _ref_caches.get(name)
+            if cache is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                default_ttl = os.getenv('REF_CACHE_TTL_SECONDS', '300')
+                cache = ReferenceDataCache(
+                    name,
+                    ttl_seconds=float(os.getenv(f"REF_CACHE_{name.upper()}_TTL_SECONDS", default_ttl)),
+                    max_entries=int(os.getenv('REF_CACHE_MAX_ENTRIES', '10000')),
+                )
+                _ref_caches[name] = cache
+    return cache
+
+def ref_cache_invalidate(name: str, key: Optional[Hashable] = None):
+    get_ref_cache(name).invalidate(key)
+
+def get_ref_cache_stats() -> dict:
+    with _ref_caches_lock:
+        caches = dict(_ref_caches)
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -1,6 +1,7 @@
-# importing geopy library and Nominatim class
+# geocoding goes through fx_geo_cache, which wraps geopy's Nominatim client
 import requests
-from geopy.geocoders import Nominatim
+from fx_geo_cache import geo_geocode, geo_reverse
+from fx_rate_limit import RateLimitedError, get_rate_limiter, parse_retry_after
 import requests
 from io import BytesIO
 from PIL import Image
@@ -11,28 +12,24 @@ from pillow_heif import register_heif_opener
 register_heif_opener()
 
 def get_lat_lon(address_string: str):
-    # calling the Nominatim tool and create Nominatim class
-    loc = Nominatim(user_agent="Geopy Library")
-
-    # entering the location name
-    getLoc = loc.geocode(address_string)
+    # Geocode through the persistent geocoding cache - Nominatim is only called on a miss
+    getLoc = geo_geocode(address_string)
+    if getLoc is None:
+        return {"latitude": None, "longitude": None}
 
     # printing address
-    print(getLoc.address)
-    latitude = getLoc.latitude
-    longitude = getLoc.longitude
+    print(getLoc["address"])
+    latitude = getLoc["latitude"]
+    longitude = getLoc["longitude"]
 
     return {"latitude": latitude, "longitude": longitude}
 
 def get_street_address_from_lat_lon(latitude: float, longitude: float):
-    # calling the Nominatim tool and create Nominatim class
-    loc = Nominatim(user_agent="Geopy Library")
-
-    # entering the location name
-    getLoc = loc.reverse((latitude, longitude))
+    # Reverse geocode through the persistent geocoding cache - Nominatim is only called on a miss
+    getLoc = geo_reverse(latitude, longitude)
 
     # printing address
-    full_address_string = getLoc.address
+    full_address_string = getLoc["address"] if getLoc else None
     if full_address_string:
         return full_address_string
     else:
@@ -46,8 +43,13 @@ def get_street_address(business_name: str, city: str, state: str):
         "per_page": 10  # Get multiple results to filter by city
     }
     
-    response = requests.get(url, params=params)
-    data = response.json()
+    def search():
+        response = requests.get(url, params=params)
+        if response.status_code == 429:
+            raise RateLimitedError("opencorporates", parse_retry_after(response.headers.get("Retry-After")))
+        return response.json()
+    # Throttled to OpenCorporates' allowance; concurrent searches for the same company share one request
+    data = get_rate_limiter("opencorporates").call(("companies", business_name.lower(), state.lower()), search)
 
     if "results" in data and "companies" in data["results"]:
         for company_info in data["results"]["companies"]:
@@ -82,33 +84,45 @@ def get_gps_coordinates(image_path):
             image = Image.open(image_path)
         
         with image:
-            exif_data = image.getexif()
-            
-            if exif_data is None:
-                return None, None
-            
-            # Find GPS info in EXIF data
-            gps_info = None
-            for tag, value in exif_data.items():
-                tag_name = TAGS.get(tag, tag)
-                if tag_name == 'GPSInfo':
-                    # Get the GPS IFD (Image File Directory)
-                    gps_info = image.getexif().get_ifd(tag)
-                    break
-            
-            if gps_info is None:
-                return None, None
-            
-            # Parse GPS coordinates
-            lat = _get_decimal_from_dms(gps_info.get(2), gps_info.get(1))
-            lon = _get_decimal_from_dms(gps_info.get(4), gps_info.get(3))
-            
-            return lat, lon
+            return get_gps_coordinates_from_image(image)
             
     except Exception as e:
         print(f"Error reading GPS data from {image_path}: {e}")
         return None, None 
 
+def get_gps_coordinates_from_image(image):
+    """
+    Extract GPS coordinates (latitude, longitude) from an already opened PIL image.
+
+    Only the EXIF block is read, so this also works on an image opened from just the
+    first few kilobytes of a JPEG.
+
+    Returns:
+        tuple: (latitude, longitude) as floats, or (None, None) if no GPS data found
+    """
+    exif_data = image.getexif()
+    
+    if exif_data is None:
+        return None, None
+    
+    # Find GPS info in EXIF data
+    gps_info = None
+    for tag, value in exif_data.items():
+        tag_name = TAGS.get(tag, tag)
+        if tag_name == 'GPSInfo':
+            # Get the GPS IFD (Image File Directory)
+            gps_info = image.getexif().get_ifd(tag)
+            break
+    
+    if gps_info is None:
+        return None, None
+    
+    # Parse GPS coordinates
+    lat = _get_decimal_from_dms(gps_info.get(2), gps_info.get(1))
+    lon = _get_decimal_from_dms(gps_info.get(4), gps_info.get(3))
+    
+    return lat, lon
+
 def _get_decimal_from_dms(dms, ref):
     """
     Convert degrees, minutes, seconds to decimal degrees.
@@ -0,0 +1,222 @@
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+_EARTH_RADIUS_MILES = 3958.7613
+_VENUE_INDEX_EPOCH = datetime(1900, 1, 1)
+
+
+def venue_haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * _EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(h)))
+
+
+class VenueSpatialIndex:
+    """
+    In-memory copy of the venue table bucketed into a lat/lon grid, for radius + category + top-k lookups.
+
+    load_rows(since, full) returns venue dicts (venue, venue_name, full_address, category, latitude, longitude,
+    image_url, is_active, modified_datetime) changed at or after `since`, one row per venue and category.
+    Rows are merged by venue, so a venue listed under several categories is one entry that matches each of
+    them; an incremental row without a category keeps the categories the venue already had. The first load
+    and every later refresh run on a background thread: rows changed since the newest modified_datetime
+    seen are merged every refresh_seconds, and the whole table is reloaded every full_refresh_seconds so
+    deleted venues drop out. A failed load is retried after refresh_seconds, not on every query.
+
+    The database stays the source of truth: query() returns None, and the caller should use the stored
+    procedure, until the first load has finished or when the category is not one the index has seen.
+    """
+
+    def __init__(self, load_rows: Callable[[datetime, bool], list], refresh_seconds: float = 60.0,
+                 full_refresh_seconds: float = 3600.0, cell_degrees: float = 0.01):
+        self.load_rows = load_rows
+        self.refresh_seconds = refresh_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self.cell_degrees = cell_degrees
+        self._venues = {}      # venue -> record
+        self._cells = {}       # (row, col) -> {venue}
+        self._categories = {}  # category -> number of venues
+        self._pending = {}     # venue -> [(category, image_url)] written before the venue row was loaded
+        self._watermark = _VENUE_INDEX_EPOCH
+        self._loaded = False
+        self._refreshing = False
+        self._stale = True
+        self._last_refresh = 0.0
+        self._last_full_refresh = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "fallbacks": 0, "refreshes": 0, "full_refreshes": 0, "refresh_errors": 0}
+
+    @staticmethod
+    def _category_key(category: Optional[str]) -> Optional[str]:
+        return category.strip().lower() if category else None
+
+    def _cell(self, latitude: float, longitude: float):
+        return int(math.floor(latitude / self.cell_degrees)), int(math.floor(longitude / self.cell_degrees))
+
+    def _remove_locked(self, venue: str):
+        record = self._venues.pop(venue, None)
+        if record is None:
+            return
+        cell = self._cells.get(record["cell"])
+        if cell is not None:
+            cell.discard(venue)
+            if not cell:
+                del self._cells[record["cell"]]
+        for category_key in record["category_keys"]:
+            self._categories[category_key] -= 1
+            if not self._categories[category_key]:
+                del self._categories[category_key]
+        return record
+
+    def _add_locked(self, rows: list, previous: Optional[dict] = None):
+        # rows all belong to one venue - one per category it is listed under
+        row = rows[0]
+        latitude, longitude = row.get("latitude"), row.get("longitude")
+        if latitude is None or longitude is None or row.get("is_active") in (False, 0):
+            self._pending.pop(row["venue"], None)
+            return
+        latitude, longitude = float(latitude), float(longitude)
+        category_keys = {self._category_key(r.get("category")) for r in rows} - {None}
+        image_url = next((r.get("image_url") for r in rows if r.get("image_url")), None)
+        if not category_keys and previous is not None:
+            category_keys = set(previous["category_keys"])
+            image_url = image_url or previous["image_url"]
+        for category, pending_image_url in self._pending.pop(row["venue"], ()):
+            category_keys.add(self._category_key(category))
+            image_url = image_url or pending_image_url
+        record = {
+            "venue": row["venue"],
+            "venue_name": row.get("venue_name"),
+            "full_address": row.get("full_address"),
+            "image_url": image_url,
+            "latitude": latitude,
+            "longitude": longitude,
+            "category_keys": frozenset(category_keys),
+            "cell": self._cell(latitude, longitude),
+        }
+        self._insert_locked(record)
+
+    def _insert_locked(self, record: dict):
+        self._venues[record["venue"]] = record
+        self._cells.setdefault(record["cell"], set()).add(record["venue"])
+        for category_key in record["category_keys"]:
+            self._categories[category_key] = self._categories.get(category_key, 0) + 1
+
+    def refresh(self, full: bool = False):
+        """Loads rows changed since the last refresh (or every row when full) and merges them in."""
+        with self._lock:
+            full = full or not self._loaded
+            since = _VENUE_INDEX_EPOCH if full else self._watermark
+        rows = self.load_rows(since, full)
+        venue_rows = {}
+        for row in rows:
+            venue_rows.setdefault(row["venue"], []).append(row)
+        with self._lock:
+            if full:
+                self._venues, self._cells, self._categories = {}, {}, {}
+                self._last_full_refresh = time.monotonic()
+                self._stats["full_refreshes"] += 1
+            for venue, grouped_rows in venue_rows.items():
+                previous = self._remove_locked(venue)
+                self._add_locked(grouped_rows, previous)
+            for row in rows:
+                # The load bound is inclusive, so rows sharing the newest timestamp are read again next time
+                # rather than skipped; merging by venue makes the repeat harmless
+                modified = row.get("modified_datetime")
+                if modified is not None and modified > self._watermark:
+                    self._watermark = modified
+            self._loaded = True
+            self._last_refresh = time.monotonic()
+            self._stats["refreshes"] += 1
+
+    def _refresh_in_background(self, full: bool):
+        try:
+            self.refresh(full=full)
+        except Exception as e:
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+                # Try again after another refresh interval rather than on every query - the first load included
+                self._last_refresh = time.monotonic()
+            print(f"Venue index refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshing or (not self._stale and now - self._last_refresh < self.refresh_seconds):
+                return
+            full = not self._loaded or now - self._last_full_refresh >= self.full_refresh_seconds
+            self._refreshing = True
+            self._stale = False
+        threading.Thread(target=self._refresh_in_background, args=(full,), name="venue-index-refresh", daemon=True).start()
+
+    def mark_stale(self):
+        """Picks up a venue that was just written on the next query instead of after refresh_seconds."""
+        with self._lock:
+            self._stale = True
+
+    def add_venue_category(self, venue: str, category: Optional[str], image_url: Optional[str] = None):
+        """
+        Lists a venue under a category the database has just given it, so it is served before the next full
+        refresh (incremental loads only see the venue row, not its categories).
+        """
+        if not category:
+            return
+        with self._lock:
+            # Also kept until the venue's row is next loaded, so a full refresh already in flight cannot drop it
+            self._pending.setdefault(venue, []).append((category, image_url))
+            record = self._venues.get(venue)
+            if record is None:
+                return
+            self._remove_locked(venue)
+            self._insert_locked(dict(record, category_keys=record["category_keys"] | {self._category_key(category)},
+                                     image_url=record["image_url"] or image_url))
+
+    def query(self, category: Optional[str], latitude: float, longitude: float, radius_miles: float, return_count: int):
+        """Closest venues within radius_miles as [{"venue", "venue_name", "full_address", "distance", "image_url"}], or None to fall back."""
+        self._maybe_refresh()
+        category_key = self._category_key(category)
+        with self._lock:
+            if not self._loaded or (category_key is not None and category_key not in self._categories):
+                self._stats["fallbacks"] += 1
+                return None
+            lat_span = radius_miles / 69.0
+            lon_span = radius_miles / max(69.0 * math.cos(math.radians(latitude)), 1e-6)
+            min_row, min_col = self._cell(latitude - lat_span, longitude - lon_span)
+            max_row, max_col = self._cell(latitude + lat_span, longitude + lon_span)
+            if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+                # A very wide radius covers more grid cells than there are venues - just scan them
+                candidates = list(self._venues.values())
+            else:
+                candidates = [self._venues[venue]
+                              for row in range(min_row, max_row + 1)
+                              for col in range(min_col, max_col + 1)
+                              for venue in self._cells.get((row, col), ())]
+            self._stats["hits"] += 1
+        matches = []
+        for record in candidates:
+            if category_key is not None and category_key not in record["category_keys"]:
+                continue
+            distance = venue_haversine_miles(latitude, longitude, record["latitude"], record["longitude"])
+            if distance <= radius_miles:
+                matches.append((distance, record))
+        matches.sort(key=lambda match: match[0])
+        return [{"venue": record["venue"], "venue_name": record["venue_name"], "full_address": record["full_address"],
+                 "distance": round(distance, 4), "image_url": record["image_url"]}
+                for distance, record in matches[:return_count]]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["loaded"] = self._loaded
+            stats["venues"] = len(self._venues)
+            stats["categories"] = len(self._categories)
+            stats["cells"] = len(self._cells)
+            stats["watermark"] = self._watermark.isoformat() if self._watermark > _VENUE_INDEX_EPOCH else None
+            stats["seconds_since_refresh"] = round(time.monotonic() - self._last_refresh, 1) if self._loaded else None
+        return stats